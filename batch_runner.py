@@ -0,0 +1,180 @@
+"""Run a file of questions through JapanTourismChatbot without the Streamlit UI.
+
+Questions come from JSONL (one {"id": ..., "question": ...} object per line)
+or CSV (id and question columns). Results are appended to a JSONL file as
+they complete, and items already answered there are skipped, so an
+interrupted run picks up where it stopped:
+
+    python batch_runner.py questions.jsonl -o results.jsonl --workers 8 --concurrency 4
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from chatbot_engine import JapanTourismChatbot, OLLAMA_URLS
+
+def read_questions(path):
+    """Yield (id, question) pairs from a JSONL or CSV file without loading it all"""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for number, row in enumerate(rows, 1):
+            question = row.get("question") or row.get("prompt")
+            if question:
+                yield str(row.get("id") or number), question
+
+def finished_ids(path):
+    """IDs answered successfully by an earlier run into the same output file"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # The last line may have been cut off by the interruption
+                continue
+            if record.get("ok"):
+                done.add(record["id"])
+    return done
+
+class BatchRunner:
+    """Answers questions on a pool of worker threads, one chatbot session per thread"""
+    def __init__(self, chatbot_factory, output_path, workers=4, use_cache=True, progress_interval=5):
+        self.chatbot_factory = chatbot_factory
+        self.output_path = output_path
+        self.workers = workers
+        self.use_cache = use_cache
+        self.progress_interval = progress_interval
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.output = None
+        self.stats = {"ok": 0, "errors": 0, "skipped": 0}
+        self.started_at = None
+        self.last_progress = 0
+
+    def chatbot(self):
+        """This worker thread's chatbot, created on first use"""
+        chatbot = getattr(self.local, "chatbot", None)
+        if chatbot is None:
+            chatbot = self.local.chatbot = self.chatbot_factory()
+        return chatbot
+
+    def answer(self, item_id, question):
+        """Answer one standalone question and write its result line"""
+        chatbot = self.chatbot()
+        chatbot.reset_conversation()
+        start = time.perf_counter()
+        error = None
+        try:
+            answer = chatbot.generate_response(question, use_cache=self.use_cache)
+        except Exception as e:
+            answer = None
+            error = f"{type(e).__name__}: {e}"
+        stats = chatbot.last_stats
+
+        # Failed generations stream their error text as the answer
+        ok = error is None and bool(stats.get('total_time') or stats.get('cache_hit'))
+        record = {
+            "id": item_id,
+            "question": question,
+            "model": stats.get('model', chatbot.model),
+            "ok": ok,
+            "answer": answer if ok else None,
+            "error": None if ok else (error or answer),
+            "latency": time.perf_counter() - start,
+            "completed_at": time.time()
+        }
+        record.update({key: value for key, value in stats.items()
+                       if isinstance(value, (int, float, bool, str)) and key not in record})
+        self.write(record)
+
+    def write(self, record):
+        """Append one result and flush it, so an interruption loses nothing finished"""
+        with self.lock:
+            self.output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.output.flush()
+            self.stats["ok" if record["ok"] else "errors"] += 1
+            if time.monotonic() - self.last_progress >= self.progress_interval:
+                self.last_progress = time.monotonic()
+                self.report()
+
+    def report(self):
+        """Print a one-line progress summary to stderr"""
+        done = self.stats["ok"] + self.stats["errors"]
+        elapsed = time.monotonic() - self.started_at
+        print(f"{done} answered ({self.stats['errors']} errors, {self.stats['skipped']} skipped) "
+              f"in {elapsed:.0f}s - {done / elapsed if elapsed else 0:.2f}/s", file=sys.stderr)
+
+    def run(self, items, skip=()):
+        """Answer every (id, question) not in skip; returns the stats"""
+        self.started_at = self.last_progress = time.monotonic()
+        # Start on a fresh line if the previous run was cut off mid-write
+        if os.path.exists(self.output_path) and os.path.getsize(self.output_path):
+            with open(self.output_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        else:
+            needs_newline = False
+
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        with open(self.output_path, "a", encoding="utf-8") as self.output:
+            if needs_newline:
+                self.output.write("\n")
+            executor = ThreadPoolExecutor(max_workers=self.workers)
+            pending = set()
+            try:
+                for item_id, question in items:
+                    if item_id in skip:
+                        self.stats["skipped"] += 1
+                        continue
+                    # Keep only a couple of items per worker in memory
+                    while len(pending) >= self.workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    pending.add(executor.submit(self.answer, item_id, question))
+                wait(pending)
+            finally:
+                # On interruption, finish what is running and drop the rest
+                executor.shutdown(wait=True, cancel_futures=True)
+        self.report()
+        return self.stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of questions with the Japan tourism chatbot")
+    parser.add_argument("input", help="JSONL or CSV file with id and question fields")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file (appended to and resumed from)")
+    parser.add_argument("--workers", type=int, default=4, help="questions in flight at once")
+    parser.add_argument("--concurrency", type=int, default=4, help="generations per Ollama endpoint at once")
+    parser.add_argument("--ollama-url", default=OLLAMA_URLS, help="comma-separated Ollama endpoints")
+    parser.add_argument("--model", default="llama2")
+    parser.add_argument("--prompt-mode", default="chat", choices=["chat", "context", "generate"])
+    parser.add_argument("--no-cache", action="store_true", help="always generate instead of reusing cached answers")
+    parser.add_argument("--no-resume", action="store_true", help="answer items already in the output again")
+    args = parser.parse_args()
+
+    def chatbot_factory():
+        # Workers beyond the concurrency limit wait in the scheduler queue,
+        # which must not shed them the way it sheds interactive requests
+        return JapanTourismChatbot(args.ollama_url, args.model, prompt_mode=args.prompt_mode,
+                                   max_concurrency=args.concurrency, max_queue_age=24 * 3600)
+
+    skip = set() if args.no_resume else finished_ids(args.output)
+    runner = BatchRunner(chatbot_factory, args.output, workers=args.workers, use_cache=not args.no_cache)
+    try:
+        stats = runner.run(read_questions(args.input), skip)
+    except KeyboardInterrupt:
+        print("Interrupted; run again with the same output file to resume", file=sys.stderr)
+        sys.exit(130)
+    if stats["errors"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Matching throughput of IntentRouter vs the old linear substring scan.
+
+Run from the repository root:
+    python benchmarks/bench_intent_router.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import IntentRouter
+
+INTENT_COUNTS = [10, 100, 1000, 5000]
+QUERY_COUNT = 2000
+
+def make_intents(count, rng):
+    """Synthetic intents: two 3-word phrases and three keywords each"""
+    vocab = [f"w{i}" for i in range(count * 4)]
+    intents = []
+    for i in range(count):
+        intents.append({
+            "name": f"intent_{i}",
+            "phrases": [" ".join(rng.sample(vocab, 3)) for _ in range(2)],
+            "keywords": rng.sample(vocab, 3),
+            "response": f"response {i}"
+        })
+    return intents
+
+def make_queries(intents, rng):
+    """Mix of questions containing a phrase, a keyword, or nothing known"""
+    queries = []
+    for _ in range(QUERY_COUNT):
+        intent = rng.choice(intents)
+        kind = rng.random()
+        if kind < 0.4:
+            queries.append(f"please tell me about {rng.choice(intent['phrases'])} in japan")
+        elif kind < 0.8:
+            queries.append(f"is {rng.choice(intent['keywords'])} worth it")
+        else:
+            queries.append("something completely unrelated to any intent")
+    return queries
+
+def linear_scan(intents, question):
+    """The previous approach: substring checks over every intent in order"""
+    question = question.lower()
+    for intent in intents:
+        if any(phrase in question for phrase in intent["phrases"]):
+            return intent
+    for intent in intents:
+        if any(keyword in question for keyword in intent["keywords"]):
+            return intent
+    return None
+
+def measure(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    elapsed = time.perf_counter() - start
+    return len(queries) / elapsed
+
+def main():
+    rng = random.Random(42)
+    print(f"{'intents':>8} {'build ms':>9} {'router q/s':>12} {'linear q/s':>12} {'speedup':>8}")
+    for count in INTENT_COUNTS:
+        intents = make_intents(count, rng)
+        queries = make_queries(intents, rng)
+
+        start = time.perf_counter()
+        router = IntentRouter(intents)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        router_qps = measure(router.match, queries)
+        linear_qps = measure(lambda q: linear_scan(intents, q), queries)
+        print(f"{count:>8} {build_ms:>9.1f} {router_qps:>12,.0f} {linear_qps:>12,.0f} {router_qps / linear_qps:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
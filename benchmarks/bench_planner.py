@@ -0,0 +1,81 @@
+"""Planning questions answered with and without the computed travel plan.
+
+Times TravelPlanner on its own (cold and memoized), then asks each planning
+question through JapanTourismChatbot against benchmarks/fake_ollama.py twice:
+once with the model laying out the route itself (under its question type's
+generation profile) and once writing prose around the computed plan (the
+"planned" profile, or the question type's when that one's cap is lower).
+The fake server decodes at a fixed rate, so the
+difference is the decode time saved.
+
+    python benchmarks/bench_planner.py --token-rate 30 --response-tokens 600
+"""
+import argparse
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from chatbot_engine import JapanTourismChatbot
+from travel_planner import TravelPlanner, TravelGraph
+
+QUESTIONS = [
+    "Plan a 7-day Tokyo itinerary",
+    "Day trip from Tokyo",
+    "How do I get from Tokyo to Kyoto?",
+    "Is the JR Pass worth it for a Tokyo, Kyoto and Osaka trip?",
+    "Plan 2 weeks in Tokyo, Kyoto, Hiroshima, Nara and Osaka on a budget"
+]
+
+def time_planner(repeats):
+    """Microseconds per plan_text call, first call and memoized"""
+    start = time.perf_counter()
+    planner = TravelPlanner(TravelGraph())
+    load_ms = (time.perf_counter() - start) * 1000
+    rows = []
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        planner.plan_text(question)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(repeats):
+            planner.plan_text(question)
+        warm = (time.perf_counter() - start) / repeats
+        rows.append((question, cold * 1e6, warm * 1e6))
+    return load_ms, rows
+
+def ask(url, question, use_planner):
+    """Tokens generated and seconds taken for one uncached answer"""
+    bot = JapanTourismChatbot(url, model="llama2", use_planner=use_planner)
+    start = time.perf_counter()
+    bot.generate_response(question, use_cache=False)
+    return bot.last_stats.get('eval_count', 0), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the travel planner fast path")
+    parser.add_argument("--token-rate", type=float, default=200, help="fake server tokens per second")
+    parser.add_argument("--response-tokens", type=int, default=600, help="tokens the fake model writes when not capped")
+    parser.add_argument("--repeats", type=int, default=1000)
+    args = parser.parse_args()
+
+    load_ms, rows = time_planner(args.repeats)
+    print(f"Graph load and all-pairs routes: {load_ms:.1f} ms")
+    print(f"{'question':<70} {'first us':>9} {'memo us':>8}")
+    for question, cold, warm in rows:
+        print(f"{question:<70} {cold:>9.0f} {warm:>8.1f}")
+
+    config = FakeOllamaConfig(token_rate=args.token_rate, ttft=0.05, jitter=0, response_tokens=args.response_tokens)
+    server = FakeOllamaServer(config=config).start()
+    print(f"\n{'question':<70} {'LLM tokens':>10} {'LLM s':>7} {'plan tokens':>11} {'plan s':>7}")
+    for question in QUESTIONS:
+        llm_tokens, llm_time = ask(server.url, question, use_planner=False)
+        plan_tokens, plan_time = ask(server.url, question, use_planner=True)
+        print(f"{question:<70} {llm_tokens:>10} {llm_time:>7.2f} {plan_tokens:>11} {plan_time:>7.2f}")
+    server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Generation profiles against the fixed options they replace.
+
+Asks a mixed set of questions as one conversation per round through
+JapanTourismChatbot against benchmarks/fake_ollama.py. It runs twice: once
+with the old fixed options (no answer cap) and once with generation
+profiles. Each question has a natural answer length, but one answer in
+--ramble-every runs on to --ramble times that length, as an uncapped model's
+answers sometimes do. Rounds after the first let the profiles adapt
+num_predict to the answers they have seen.
+
+    python benchmarks/bench_profiles.py --rounds 12 --token-rate 30
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from chatbot_engine import JapanTourismChatbot
+from generation_profiles import GenerationProfiles
+
+# Question -> tokens a model would naturally answer with
+QUESTIONS = {
+    "Is tipping expected in Japan?": 90,
+    "What should I eat in Osaka?": 180,
+    "Plan a 7-day Tokyo itinerary": 260,
+    "How do I get from Tokyo to Kyoto?": 160,
+    "What is onsen etiquette?": 320,
+    "Budget for 2 weeks in Japan": 600,
+    "Do I need cash in Japan?": 110,
+    "Guide to Kyoto temples and gardens": 400,
+    "Plan 2 weeks in Tokyo, Kyoto, Hiroshima, Nara and Osaka on a budget": 300,
+    "Can I use my phone on the train?": 80
+}
+
+class AnswerLengths:
+    """Fake model answer length for a prompt: the question's natural length, with every nth answer rambling"""
+    def __init__(self, ramble, every):
+        self.ramble = ramble
+        self.every = every
+        self.answers = 0
+
+    def __call__(self, prompt_text):
+        question = prompt_text.rsplit("User Question: ", 1)[-1].split("\n")[0]
+        if question not in QUESTIONS:
+            # Conversation summaries
+            return 150
+        self.answers += 1
+        length = QUESTIONS[question]
+        return int(length * self.ramble) if self.answers % self.every == 0 else length
+
+def run(url, lengths, profiles, rounds):
+    """Per-profile tokens and seconds; profiles=None uses the fixed options"""
+    lengths.answers = 0
+    bot = JapanTourismChatbot(url, model="llama2", use_profiles=profiles is not None)
+    if profiles:
+        bot.profiles = profiles
+    grouping = profiles or GenerationProfiles.from_file()
+    totals = defaultdict(lambda: {"answers": 0, "tokens": 0, "seconds": 0.0, "truncated": 0})
+    for _ in range(rounds):
+        bot.reset_conversation()
+        for question in QUESTIONS:
+            profile = grouping.select(question, bot.router.classifier.score(question), planned=bool(bot.plan_for(question)))
+            start = time.perf_counter()
+            bot.generate_response(question, use_cache=False)
+            row = totals[profile.name]
+            row["answers"] += 1
+            row["seconds"] += time.perf_counter() - start
+            row["tokens"] += bot.last_stats.get('eval_count', 0)
+            row["truncated"] += bool(bot.last_stats.get('truncated'))
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generation profiles against fixed options")
+    parser.add_argument("--token-rate", type=float, default=300, help="fake server tokens per second")
+    parser.add_argument("--ramble", type=float, default=3.0, help="length multiple of a rambling answer")
+    parser.add_argument("--ramble-every", type=int, default=13, help="one answer in this many rambles")
+    parser.add_argument("--rounds", type=int, default=12, help="conversations of all questions")
+    parser.add_argument("--min-samples", type=int, help="answers before a profile adapts (default: the data file's)")
+    args = parser.parse_args()
+
+    lengths = AnswerLengths(args.ramble, args.ramble_every)
+    config = FakeOllamaConfig(token_rate=args.token_rate, ttft=0.05, jitter=0, response_tokens=lengths,
+                              prompt_eval_rate=5000)
+    server = FakeOllamaServer(config=config).start()
+
+    profiles = GenerationProfiles.from_file()
+    if args.min_samples:
+        profiles.min_samples = args.min_samples
+    fixed = run(server.url, lengths, None, args.rounds)
+    adaptive = run(server.url, lengths, profiles, args.rounds)
+    server.stop()
+
+    caps = {row["profile"]: row["num_predict"] for row in profiles.summary()}
+    print(f"{'profile':<8} {'answers':>7} {'fixed tokens':>12} {'profile tokens':>14} "
+          f"{'fixed s':>8} {'profile s':>9} {'cut':>4} {'num_predict':>11}")
+    for name in sorted(fixed, key=list(profiles.profiles).index):
+        old, new = fixed[name], adaptive[name]
+        count = old["answers"]
+        print(f"{name:<8} {count:>7} {old['tokens'] / count:>12.0f} {new['tokens'] / count:>14.0f} "
+              f"{old['seconds'] / count:>8.2f} {new['seconds'] / count:>9.2f} {new['truncated']:>4} {caps[name]:>11}")
+
+    old_tokens = sum(row["tokens"] for row in fixed.values())
+    new_tokens = sum(row["tokens"] for row in adaptive.values())
+    old_seconds = sum(row["seconds"] for row in fixed.values())
+    new_seconds = sum(row["seconds"] for row in adaptive.values())
+    print(f"\nTotal: {old_tokens} -> {new_tokens} tokens ({1 - new_tokens / old_tokens:.0%} fewer), "
+          f"{old_seconds:.1f}s -> {new_seconds:.1f}s ({old_seconds - new_seconds:.1f}s saved)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Server-side time per chat turn in the Streamlit app on long transcripts.
+
+A full-app turn re-executes the whole script: sidebar health checks,
+history and tips. Every turn cost that before the chat area became a
+fragment. A chat-region turn executes only chat_turns(), which is what a
+fragment rerun runs in the real server. AppTest always runs whole scripts,
+so the fragment is driven from a small wrapper script. Answers come from
+benchmarks/fake_ollama.py with near-zero delays, so the numbers are
+dominated by rendering.
+
+    python benchmarks/bench_render.py --messages 20,200,2000
+    python benchmarks/bench_render.py --app /path/to/older/japan_tourism_chatbot.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from streamlit.testing.v1 import AppTest
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from run_benchmarks import distribution
+from transcript_store import TranscriptStore
+
+CHAT_REGION_SCRIPT = """
+import sys
+sys.path.insert(0, {app_dir!r})
+import streamlit as st
+import japan_tourism_chatbot as app
+store = app.get_transcript_store(app.TRANSCRIPT_PATH)
+if 'transcript_id' not in st.session_state:
+    st.session_state.chatbot = app.JapanTourismChatbot({url!r})
+    st.session_state.live_messages = []
+    app.open_transcript(store, {transcript_id!r})
+app.chat_turns(store)
+"""
+
+def prefill(store, transcript_id, count):
+    """Store count alternating user/assistant messages of realistic length"""
+    answer = "Kyoto has over 1,600 temples; start with Fushimi Inari early in the morning. " * 6
+    for i in range(count):
+        if i % 2 == 0:
+            store.append(transcript_id, "user", f"Earlier question {i} about Japan")
+        else:
+            store.append(transcript_id, "assistant", answer, {"ttft": 0.4, "eval_count": 120, "eval_duration": 3.0})
+
+def time_turns(app_test, turns, label):
+    """Seconds per submitted chat message"""
+    samples = []
+    for i in range(turns):
+        app_test.chat_input[0].set_value(f"{label} question {i} about Osaka")
+        start = time.perf_counter()
+        app_test.run()
+        samples.append(time.perf_counter() - start)
+        if app_test.exception:
+            raise RuntimeError(app_test.exception[0].message)
+    return samples
+
+def bench(app_path, url, store, messages, turns):
+    """p50/p95 milliseconds per turn for the full app and, if available, the chat region"""
+    result = {"messages": messages}
+
+    transcript_id = f"bench-full-{messages}"
+    prefill(store, transcript_id, messages)
+    app_test = AppTest.from_file(app_path, default_timeout=60)
+    app_test.query_params["session"] = transcript_id
+    app_test.run()
+    result["full_app_ms"] = {k: v * 1000 for k, v in distribution(time_turns(app_test, turns, "full")).items()}
+
+    if "def chat_turns" in open(app_path, encoding="utf-8").read():
+        transcript_id = f"bench-chat-{messages}"
+        prefill(store, transcript_id, messages)
+        script = CHAT_REGION_SCRIPT.format(app_dir=os.path.dirname(os.path.abspath(app_path)),
+                                           url=url, transcript_id=transcript_id)
+        app_test = AppTest.from_string(script, default_timeout=60)
+        app_test.run()
+        result["chat_region_ms"] = {k: v * 1000 for k, v in distribution(time_turns(app_test, turns, "chat")).items()}
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-turn render time of the Streamlit app")
+    parser.add_argument("--app", default=os.path.join(REPO_DIR, "japan_tourism_chatbot.py"))
+    parser.add_argument("--messages", default="20,200,2000", help="comma-separated stored transcript lengths")
+    parser.add_argument("--turns", type=int, default=8, help="turns timed per transcript")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(token_rate=10000, ttft=0, jitter=0, response_tokens=20, prompt_eval_rate=1e9)
+    server = FakeOllamaServer(config=config).start()
+    os.environ["OLLAMA_URLS"] = server.url
+    app_path = os.path.abspath(args.app)
+
+    # The app keeps its transcripts and caches under ./.cache
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        store = TranscriptStore(os.path.join(".cache", "transcripts.db"))
+        print(f"{'messages':>9} {'app p50 ms':>11} {'app p95 ms':>11} {'chat p50 ms':>12} {'chat p95 ms':>12} {'speedup':>8}")
+        for messages in [int(count) for count in args.messages.split(",")]:
+            row = bench(app_path, server.url, store, messages, args.turns)
+            full, chat = row["full_app_ms"], row.get("chat_region_ms")
+            chat_cells = f"{chat['p50']:>12.1f} {chat['p95']:>12.1f} {full['p50'] / chat['p50']:>7.1f}x" if chat else f"{'-':>12} {'-':>12} {'-':>8}"
+            print(f"{messages:>9} {full['p50']:>11.1f} {full['p95']:>11.1f} {chat_cells}")
+    server.stop()
+
+if __name__ == "__main__":
+    main()
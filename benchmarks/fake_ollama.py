@@ -0,0 +1,241 @@
+"""Local stand-in for an Ollama server, for benchmarks and load tests.
+
+Implements /api/tags, /api/generate and /api/chat (streaming and not) with a
+configurable token rate, time to first token, jitter, parallel slots and
+error injection. Run standalone:
+    python benchmarks/fake_ollama.py --port 11434 --token-rate 30 --ttft 0.5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("Japan offers temples shrines ramen sushi trains onsen gardens castles "
+         "festivals markets mountains lakes islands museums neighbourhoods").split()
+
+class FakeOllamaConfig:
+    """Behaviour knobs for the fake server
+
+    Time to first token is ttft plus evaluated prompt tokens / prompt_eval_rate.
+    response_tokens is a fixed answer length or a function of the prompt
+    text returning one; num_predict cuts it short either way.
+    """
+    def __init__(self, models=("llama2", "phi3:mini"), token_rate=50.0, ttft=0.2,
+                 jitter=0.1, response_tokens=60, error_rate=0.0, parallel=4,
+                 prompt_eval_rate=500.0, load_time=0.0):
+        self.models = list(models)
+        self.token_rate = token_rate
+        self.ttft = ttft
+        self.jitter = jitter
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.parallel = parallel
+        self.prompt_eval_rate = prompt_eval_rate
+        self.load_time = load_time
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def jittered(self, seconds):
+        return max(0.0, seconds * (1 + random.uniform(-self.config.jitter, self.config.jitter)))
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/api/tags":
+            self.send_json(404, {"error": "not found"})
+            return
+        self.send_json(200, {"models": [{"name": name} for name in self.config.models]})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.record("requests")
+
+        if self.path not in ("/api/generate", "/api/chat"):
+            self.send_json(404, {"error": "not found"})
+            return
+        if request.get("model") not in self.config.models:
+            self.send_json(404, {"error": f"model '{request.get('model')}' not found"})
+            return
+        if random.random() < self.config.error_rate:
+            self.server.record("errors")
+            self.send_json(500, {"error": "injected failure"})
+            return
+
+        # Loading a model with an empty prompt returns immediately after the load
+        prompt_text = request.get("prompt", "") if self.path == "/api/generate" else \
+            "".join(message.get("content", "") for message in request.get("messages", []))
+        if self.path == "/api/generate" and not prompt_text and "context" not in request:
+            time.sleep(self.config.load_time)
+            self.send_json(200, {"model": request["model"], "response": "", "done": True,
+                                 "load_duration": int(self.config.load_time * 1e9)})
+            return
+
+        # Only `parallel` requests decode at once, like OLLAMA_NUM_PARALLEL
+        with self.server.slots:
+            self.generate(request, prompt_text)
+
+    def generate(self, request, prompt_text):
+        config = self.config
+        options = request.get("options", {})
+        max_tokens = options.get("num_predict", -1)
+        length = config.response_tokens
+        if callable(length):
+            length = length(prompt_text)
+        count = length if max_tokens is None or max_tokens < 0 else min(max_tokens, length)
+        prompt_tokens = max(1, len(prompt_text) // 4)
+        # Like Ollama's slot cache, only text after a cached prefix is evaluated
+        evaluated_tokens = max(1, (len(prompt_text) - self.server.cached_prefix(prompt_text)) // 4)
+        is_chat = self.path == "/api/chat"
+        stream = request.get("stream", True)
+
+        start = time.perf_counter()
+        time.sleep(self.jittered(config.ttft + evaluated_tokens / config.prompt_eval_rate))
+        prompt_eval_duration = time.perf_counter() - start
+
+        tokens = [random.choice(WORDS) + " " for _ in range(count)]
+
+        def chunk(text, done=False):
+            body = {"model": request["model"], "done": done}
+            if is_chat:
+                body["message"] = {"role": "assistant", "content": text}
+            else:
+                body["response"] = text
+            return body
+
+        if stream:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+        eval_start = time.perf_counter()
+        emitted = 0
+        try:
+            for token in tokens:
+                if stream:
+                    self.write_chunk(chunk(token))
+                emitted += 1
+                time.sleep(self.jittered(1.0 / config.token_rate))
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away: stop decoding, like Ollama does
+            self.server.record("cancelled_tokens", count - emitted)
+            return
+        eval_duration = time.perf_counter() - eval_start
+        self.server.record("tokens", emitted)
+
+        final = chunk("" if stream else "".join(tokens), done=True)
+        final.update({
+            "total_duration": int((time.perf_counter() - start) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": evaluated_tokens,
+            "prompt_eval_duration": int(prompt_eval_duration * 1e9),
+            "eval_count": emitted,
+            "eval_duration": int(eval_duration * 1e9)
+        })
+        if not is_chat:
+            final["context"] = list(request.get("context", [])) + list(range(prompt_tokens + emitted))
+
+        try:
+            if stream:
+                self.write_chunk(final)
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                self.send_json(200, final)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def write_chunk(self, body):
+        data = (json.dumps(body) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), config=None):
+        super().__init__(address, FakeOllamaHandler)
+        self.config = config or FakeOllamaConfig()
+        self.slots = threading.Semaphore(self.config.parallel)
+        self.stats = {"requests": 0, "errors": 0, "tokens": 0, "cancelled_tokens": 0}
+        self.stats_lock = threading.Lock()
+        self.recent_prompts = deque(maxlen=self.config.parallel)
+        self.thread = None
+
+    def cached_prefix(self, prompt_text):
+        """Characters of the prompt shared with a recently evaluated prompt"""
+        with self.stats_lock:
+            best = max((len(os.path.commonprefix([prompt_text, cached])) for cached in self.recent_prompts), default=0)
+            self.recent_prompts.append(prompt_text)
+        return best
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is expected noise
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+    def record(self, name, amount=1):
+        """Thread-safe counter update"""
+        with self.stats_lock:
+            self.stats[name] += amount
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve from a daemon thread; returns self"""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket"""
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", default="llama2,phi3:mini")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="tokens per second per request")
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.1, help="relative random jitter on delays")
+    parser.add_argument("--tokens", type=int, default=60, help="tokens per answer")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--parallel", type=int, default=4, help="requests decoded at once")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(args.models.split(","), args.token_rate, args.ttft, args.jitter,
+                              args.tokens, args.error_rate, args.parallel)
+    server = FakeOllamaServer((args.host, args.port), config)
+    print(f"Fake Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Concurrent scripted users against a Streamlit app in one process.
+
+Each simulated user is an AppTest session that loads the app, then asks
+typed questions and clicks quick topics with randomized think times in
+between. Every rerun re-executes the whole script, so sidebar probes,
+transcript rendering and st.rerun() all show up in the per-rerun time.
+Answers come from benchmarks/fake_ollama.py with near-zero delays.
+
+AppTest keeps the Streamlit runtime in a process-wide global, so the
+harness serializes every script run through one lock: the numbers describe
+a server that runs one script at a time. Time spent waiting for the lock is
+the queueing delay a user of such a server would see. The saturation point
+is the first session count where p95 rerun latency (lock wait plus script)
+exceeds --saturation-factor times the single-session p95. Because the lock
+is the bottleneck, that is where this single worker's queue builds up (the
+busy column nears 100%), not the limit of Streamlit's own server, which
+runs different sessions' reruns on separate threads. Read it together with
+the script time, which is what those threads contend for on the GIL. For
+the same reason a --budget file only limits what the app itself costs:
+per-rerun script time, memory per session and script errors.
+
+    python benchmarks/load_test_ui.py --sessions 1,4,16,32 --turns 6 --think-time 2
+    python benchmarks/load_test_ui.py --app cloud --budget benchmarks/ui_budget.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from streamlit.testing.v1 import AppTest
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from run_benchmarks import distribution, RESULTS_DIR
+from chatbot_engine import QUICK_QUESTIONS
+
+APPS = {
+    "ollama": os.path.join(REPO_DIR, "japan_tourism_chatbot.py"),
+    "cloud": os.path.join(REPO_DIR, "japan_tourism_chatbot_cloud.py")
+}
+
+TYPED_QUESTIONS = [
+    "What should I eat in Osaka?",
+    "How do I get from Tokyo to Kyoto?",
+    "Is Nara worth a day trip?",
+    "Where can I see Mount Fuji?",
+    "What is onsen etiquette?",
+    "How much cash should I carry?",
+    "Plan 3 days in Kyoto",
+    "Best neighbourhoods to stay in Tokyo"
+]
+
+def rss_bytes():
+    """Resident memory of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Not Linux: peak RSS is the closest portable figure
+        import resource
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+class MemorySampler(threading.Thread):
+    """Tracks peak resident memory between resets"""
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_bytes()
+        self.stopped = threading.Event()
+
+    def reset(self):
+        """Start a new peak from the current memory; returns it"""
+        self.peak = rss_bytes()
+        return self.peak
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def stop(self):
+        self.stopped.set()
+
+class ScriptedUser:
+    """One browser session: loads the app, then asks a question after each think time"""
+    def __init__(self, app_path, run_lock, rng, think_time, timeout=60):
+        self.app_test = AppTest.from_file(app_path, default_timeout=timeout)
+        self.run_lock = run_lock
+        self.rng = rng
+        self.think_time = think_time
+        self.samples = []
+        self.errors = []
+
+    def rerun(self, action):
+        """Run the script once; records queueing, script and wall seconds"""
+        requested = time.perf_counter()
+        with self.run_lock:
+            started = time.perf_counter()
+            action()
+            finished = time.perf_counter()
+            state = self.app_test.session_state
+            # The Ollama app records how long it waited on the model
+            stream_time = state["stream_time"] if "stream_time" in state else 0
+            if self.app_test.exception:
+                self.errors.append(self.app_test.exception[0].message)
+        self.samples.append({
+            "queue": started - requested,
+            "script": finished - started - stream_time,
+            "latency": finished - requested
+        })
+
+    def next_action(self):
+        """A typed question most of the time, otherwise a quick topic button"""
+        if self.rng.random() < 0.3:
+            question = self.rng.choice(QUICK_QUESTIONS)
+            return lambda: self.app_test.button(key=question).click().run()
+        question = self.rng.choice(TYPED_QUESTIONS)
+        return lambda: self.app_test.chat_input[0].set_value(question).run()
+
+    def think(self):
+        """Exponential think times: most users reply quickly, a few linger"""
+        if self.think_time:
+            time.sleep(min(self.rng.expovariate(1 / self.think_time), self.think_time * 4))
+
+    def run(self, turns):
+        # Users arrive spread over one think time rather than all at once
+        time.sleep(self.rng.uniform(0, self.think_time))
+        self.rerun(self.app_test.run)
+        for _ in range(turns):
+            if self.errors:
+                return
+            self.think()
+            self.rerun(self.next_action())
+
+def run_level(app_path, sessions, turns, think_time, sampler, seed):
+    """Run `sessions` scripted users at once; returns a result row"""
+    run_lock = threading.Lock()
+    baseline = sampler.reset()
+    users = [ScriptedUser(app_path, run_lock, random.Random(seed + index), think_time) for index in range(sessions)]
+    threads = [threading.Thread(target=user.run, args=(turns,)) for user in users]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - start
+
+    samples = [sample for user in users for sample in user.samples]
+    errors = [error for user in users for error in user.errors]
+    busy = sum(sample["script"] for sample in samples)
+    return {
+        "sessions": sessions,
+        "reruns": len(samples),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "script_ms": {k: v * 1000 for k, v in distribution([s["script"] for s in samples]).items()},
+        "queue_ms": {k: v * 1000 for k, v in distribution([s["queue"] for s in samples]).items()},
+        "latency_ms": {k: v * 1000 for k, v in distribution([s["latency"] for s in samples]).items()},
+        "reruns_per_sec": len(samples) / wall_time,
+        "utilization": busy / wall_time,
+        "memory_mb_per_session": (sampler.peak - baseline) / sessions / 2 ** 20
+    }
+
+def saturation_point(rows, factor):
+    """First session count whose p95 latency exceeds factor x the first level's, or None"""
+    base = rows[0]["latency_ms"]["p95"]
+    for row in rows[1:]:
+        if row["errors"] or row["latency_ms"]["p95"] > base * factor:
+            return row["sessions"]
+    return None
+
+def check_budget(results, budget):
+    """Budget violations as messages (empty when within budget)"""
+    rows = results["levels"]
+    violations = []
+    single = rows[0]["script_ms"]["p95"]
+    if "script_p95_ms" in budget and single > budget["script_p95_ms"]:
+        violations.append(f"single-session p95 script time {single:.0f} ms > {budget['script_p95_ms']} ms")
+    memory = max(row["memory_mb_per_session"] for row in rows)
+    if "memory_mb_per_session" in budget and memory > budget["memory_mb_per_session"]:
+        violations.append(f"peak memory {memory:.1f} MB per session > {budget['memory_mb_per_session']} MB")
+    errors = sum(row["errors"] for row in rows)
+    if errors > budget.get("max_errors", 0):
+        violations.append(f"{errors} script errors, first: {next(r['first_error'] for r in rows if r['errors'])}")
+    return violations
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a Streamlit app with concurrent scripted sessions")
+    parser.add_argument("--app", default="ollama", choices=sorted(APPS), help="which app to drive")
+    parser.add_argument("--sessions", default="1,4,8,16", help="comma-separated concurrent session counts")
+    parser.add_argument("--turns", type=int, default=5, help="questions per session after the first load")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds between a user's questions")
+    parser.add_argument("--saturation-factor", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--budget", help="JSON budget file; exits non-zero when the app is over budget")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/ui-<app>-<time>.json)")
+    args = parser.parse_args()
+    # The runs below change into a scratch directory
+    args.budget = args.budget and os.path.abspath(args.budget)
+    args.output = args.output and os.path.abspath(args.output)
+
+    config = FakeOllamaConfig(token_rate=10000, ttft=0, jitter=0, response_tokens=40, prompt_eval_rate=1e9, parallel=16)
+    server = FakeOllamaServer(config=config).start()
+    os.environ["OLLAMA_URLS"] = server.url
+    sampler = MemorySampler()
+    sampler.start()
+
+    rows = []
+    # The app keeps its transcripts and caches under ./.cache
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            # Imports, caches and the first model probe are not per-session costs
+            ScriptedUser(APPS[args.app], threading.Lock(), random.Random(args.seed), 0).run(1)
+            print(f"{'sessions':>8} {'reruns':>6} {'err':>4} {'script p50':>10} {'script p95':>10} "
+                  f"{'queue p95':>9} {'latency p95':>11} {'reruns/s':>8} {'busy':>5} {'MB/session':>10}")
+            for sessions in [int(count) for count in args.sessions.split(",")]:
+                row = run_level(APPS[args.app], sessions, args.turns, args.think_time, sampler, args.seed)
+                rows.append(row)
+                print(f"{sessions:>8} {row['reruns']:>6} {row['errors']:>4} {row['script_ms']['p50']:>10.1f} "
+                      f"{row['script_ms']['p95']:>10.1f} {row['queue_ms']['p95']:>9.1f} {row['latency_ms']['p95']:>11.1f} "
+                      f"{row['reruns_per_sec']:>8.1f} {row['utilization']:>5.0%} {row['memory_mb_per_session']:>10.2f}")
+        finally:
+            # Never leave the process in the scratch directory being removed
+            os.chdir(cwd)
+    sampler.stop()
+    server.stop()
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "config": vars(args),
+        "levels": rows,
+        "saturation_sessions": saturation_point(rows, args.saturation_factor)
+    }
+    saturation = results["saturation_sessions"]
+    print(f"\nSaturation: {f'{saturation} sessions' if saturation else 'not reached'} "
+          f"(p95 latency over {args.saturation_factor:g}x the single-session p95, "
+          f"with script runs serialized by the harness)")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"ui-{args.app}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {output}")
+
+    if args.budget:
+        with open(args.budget, encoding="utf-8") as f:
+            budget = json.load(f)[args.app]
+        violations = check_budget(results, budget)
+        for violation in violations:
+            print(f"OVER BUDGET: {violation}")
+        if violations:
+            sys.exit(1)
+        print("Within budget")
+
+if __name__ == "__main__":
+    main()
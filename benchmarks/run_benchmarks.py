@@ -0,0 +1,206 @@
+"""End-to-end latency and throughput benchmarks against a local fake Ollama.
+
+Drives JapanTourismChatbot (through benchmarks/fake_ollama.py) and
+CloudJapanTourismChatbot at several concurrency levels and saves the results
+as JSON so runs can be compared:
+
+    python benchmarks/run_benchmarks.py --concurrency 1,4,16,32
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<earlier run>.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from chatbot_engine import JapanTourismChatbot, QUICK_QUESTIONS
+from japan_tourism_chatbot_cloud import CloudJapanTourismChatbot
+from resilience import percentile
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+def distribution(values):
+    """p50/p95/p99/mean summary"""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": sum(values) / len(values)
+    }
+
+def run_workers(concurrency, worker):
+    """Run worker(index) on `concurrency` threads; returns wall time"""
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+def bench_ollama(url, concurrency, requests_per_worker, use_cache):
+    """Concurrent sessions asking questions through JapanTourismChatbot"""
+    samples = []
+    lock = threading.Lock()
+
+    def worker(index):
+        bot = JapanTourismChatbot(url, model="llama2")
+        for i in range(requests_per_worker):
+            question = QUICK_QUESTIONS[(index + i) % len(QUICK_QUESTIONS)]
+            if not use_cache:
+                # Unique wording so neither the cache nor single-flight kicks in
+                question = f"{question} (session {index} request {i})"
+            bot.reset_conversation()
+
+            build_start = time.perf_counter()
+            bot.build_request(question)
+            build_time = time.perf_counter() - build_start
+
+            start = time.perf_counter()
+            answer = "".join(bot.generate_response_stream(question, use_cache=use_cache))
+            latency = time.perf_counter() - start
+
+            stats = bot.last_stats
+            ok = bool(stats.get('total_time') or stats.get('cache_hit'))
+            with lock:
+                samples.append({
+                    "ok": ok,
+                    "latency": latency,
+                    "ttft": stats.get('ttft'),
+                    "eval_count": stats.get('eval_count', 0),
+                    "eval_duration": stats.get('eval_duration', 0),
+                    "build_time": build_time,
+                    "chars": len(answer)
+                })
+
+    wall_time = run_workers(concurrency, worker)
+    ok_samples = [s for s in samples if s["ok"]]
+    eval_time = sum(s["eval_duration"] for s in ok_samples)
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": len(samples) - len(ok_samples),
+        "latency": distribution([s["latency"] for s in ok_samples]),
+        "ttft": distribution([s["ttft"] for s in ok_samples if s["ttft"] is not None]),
+        "tokens_per_sec": sum(s["eval_count"] for s in ok_samples) / eval_time if eval_time else None,
+        "prompt_build_ms": distribution([s["build_time"] * 1000 for s in samples]),
+        "requests_per_sec": len(ok_samples) / wall_time
+    }
+
+def bench_cloud(concurrency, requests_per_worker):
+    """Concurrent sessions answered by the canned-response demo chatbot"""
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(index):
+        bot = CloudJapanTourismChatbot()
+        for i in range(requests_per_worker):
+            question = QUICK_QUESTIONS[(index + i) % len(QUICK_QUESTIONS)]
+            start = time.perf_counter()
+            bot.generate_response(question)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    wall_time = run_workers(concurrency, worker)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "latency": distribution(latencies),
+        "requests_per_sec": len(latencies) / wall_time
+    }
+
+def compare(current, baseline_path, tolerance):
+    """Print metric changes against an earlier run; returns True if nothing regressed"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    passed = True
+    for suite in ("ollama", "cloud"):
+        previous = {row["concurrency"]: row for row in baseline.get(suite, [])}
+        for row in current.get(suite, []):
+            old = previous.get(row["concurrency"])
+            if not old:
+                continue
+            checks = [("p95 latency", row["latency"]["p95"], old["latency"]["p95"], False),
+                      ("requests/s", row["requests_per_sec"], old["requests_per_sec"], True)]
+            for name, new_value, old_value, higher_is_better in checks:
+                if not new_value or not old_value:
+                    continue
+                change = (new_value - old_value) / old_value
+                regressed = change < -tolerance if higher_is_better else change > tolerance
+                passed = passed and not regressed
+                flag = "REGRESSION" if regressed else "ok"
+                print(f"{suite:>6} c={row['concurrency']:<3} {name:<12} {old_value:10.4f} -> {new_value:10.4f} ({change:+.1%}) {flag}")
+    return passed
+
+def print_table(title, rows):
+    """Print one suite's results (times in milliseconds)"""
+    print(f"\n{title}")
+    print(f"{'conc':>5} {'reqs':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ttft ms':>8} {'tok/s':>7} {'build ms':>9} {'req/s':>8}")
+    for row in rows:
+        latency = row["latency"]
+        ttft = row.get("ttft", {}).get("p50")
+        tokens_per_sec = row.get("tokens_per_sec")
+        build = row.get("prompt_build_ms", {}).get("p50")
+        print(f"{row['concurrency']:>5} {row['requests']:>5} {row.get('errors', 0):>4} "
+              f"{(latency['p50'] or 0) * 1000:>9.2f} {(latency['p95'] or 0) * 1000:>9.2f} {(latency['p99'] or 0) * 1000:>9.2f} "
+              f"{ttft * 1000 if ttft is not None else float('nan'):>8.0f} "
+              f"{tokens_per_sec if tokens_per_sec else float('nan'):>7.1f} "
+              f"{build if build is not None else float('nan'):>9.2f} {row['requests_per_sec']:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Japan tourism chatbots")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated session counts")
+    parser.add_argument("--requests", type=int, default=4, help="requests per session")
+    parser.add_argument("--token-rate", type=float, default=50.0)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--parallel", type=int, default=4, help="fake server decode slots")
+    parser.add_argument("--cache", action="store_true", help="repeat quick questions and allow cache hits")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/bench-<time>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(token_rate=args.token_rate, ttft=args.ttft, jitter=args.jitter,
+                              response_tokens=args.tokens, error_rate=args.error_rate,
+                              parallel=args.parallel)
+    server = FakeOllamaServer(config=config).start()
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "config": vars(args),
+        "ollama": [bench_ollama(server.url, level, args.requests, args.cache) for level in levels],
+        "cloud": [bench_cloud(level, args.requests * 50) for level in levels],
+        "server": server.stats
+    }
+    server.stop()
+
+    print_table("JapanTourismChatbot (fake Ollama)", results["ollama"])
+    print_table("CloudJapanTourismChatbot", results["cloud"])
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        print()
+        if not compare(results, args.compare, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,517 @@
+"""Standalone asyncio HTTP API for JapanTourismChatbot with server-sent-event streaming.
+
+Every connection is handled on one event loop, so an open or idle
+connection costs a coroutine rather than a thread and one process holds
+hundreds of them. Each answer runs JapanTourismChatbot's own pipeline
+(response cache, single-flight sharing of identical requests, hedging and
+the shared request scheduler). A message waiting for a scheduler slot is a
+coroutine too; only an answer actually being generated holds a thread,
+which relays its tokens to the loop.
+Sessions are keyed by ID and keep their conversation on the server, so the
+mobile app and the Streamlit thin client (japan_tourism_chatbot_client.py)
+use the same engine:
+
+    python chat_api.py --port 8000 --ollama-url http://localhost:11434
+
+    POST   /sessions                 {"model", "prompt_mode", "prefetch"} -> {"session_id"}
+    GET    /sessions/<id>            turns and summary
+    PATCH  /sessions/<id>            change the session's settings
+    DELETE /sessions/<id>
+    POST   /sessions/<id>/turns      {"user", "assistant"} restores an earlier turn
+    POST   /sessions/<id>/messages   {"message", "stream": true, "use_cache": true}
+                                     -> SSE events: queued, token, then done, error or cancelled
+
+A new message supersedes one the session is still answering, and deleting a
+session cancels its answer; either way the Ollama request is closed so the
+server stops decoding it.
+    GET    /models
+    GET    /health
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from contextlib import aclosing, closing
+from urllib.parse import urlsplit
+
+from chatbot_engine import (
+    JapanTourismChatbot, QUICK_QUESTIONS, OLLAMA_URLS,
+    RESPONSE_CACHE_PATH, METRICS_PATH, REQUEST_LOG_PATH
+)
+
+MAX_BODY = 64 * 1024
+MAX_HEADERS = 100
+REASONS = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"
+}
+
+# Chatbot attributes a client may set on its session
+SESSION_SETTINGS = ("model", "prompt_mode", "prefetch")
+
+class HTTPError(Exception):
+    """Ends a request with an HTTP error status and a JSON {"error": message} body"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+async def read_headers(reader, timeout):
+    """Header lines up to the blank line, as a dict with lowercase names"""
+    headers = {}
+    for _ in range(MAX_HEADERS):
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        if not line:
+            raise asyncio.IncompleteReadError(b"", None)
+        if line in (b"\r\n", b"\n"):
+            return headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raise HTTPError(400, "Too many headers")
+
+class Request:
+    """One parsed HTTP request"""
+    def __init__(self, method, path, version, headers, body):
+        self.method = method
+        self.path = path
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self):
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self):
+        """The body as a JSON object ({} when empty)"""
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return data
+
+async def read_request(reader, timeout):
+    """Parse one request from a connection; None once the client has closed it"""
+    line = await asyncio.wait_for(reader.readline(), timeout)
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = await read_headers(reader, timeout)
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(400, "Chunked request bodies are not supported")
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "Content-Length is not a number")
+    if length < 0:
+        raise HTTPError(400, "Content-Length is negative")
+    if length > MAX_BODY:
+        raise HTTPError(413, f"Request body over {MAX_BODY} bytes")
+    body = await asyncio.wait_for(reader.readexactly(length), timeout) if length else b""
+    return Request(method.upper(), urlsplit(target).path, version.upper(), headers, body)
+
+class Session:
+    """One conversation: its chatbot and a lock so its turns run one at a time"""
+    def __init__(self, session_id, chatbot):
+        self.id = session_id
+        self.chatbot = chatbot
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        # Task answering the newest message, and how many messages were sent
+        self.task = None
+        self.latest = 0
+
+class ChatService:
+    """JapanTourismChatbot sessions served over HTTP from a single asyncio event loop"""
+    def __init__(self, ollama_url=OLLAMA_URLS, model="llama2", session_ttl=3600, max_sessions=1000,
+                 idle_timeout=75, queue_poll=0.5, **chatbot_settings):
+        self.ollama_url = ollama_url
+        self.model = model
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.queue_poll = queue_poll
+        self.chatbot_settings = chatbot_settings
+        self.sessions = OrderedDict()
+        self.stats = {"connections": 0, "open_connections": 0, "requests": 0, "disconnects": 0, "cancelled": 0}
+        # Tasks cancelled by cancel_turn -> reason sent to their client
+        self.cancelling = {}
+
+        # Shares the process-wide pool, scheduler and caches with every session
+        self.default_chatbot = self.new_chatbot(model)
+
+        session_path = r"^/sessions/(?P<session_id>[\w-]+)"
+        self.routes = [
+            ("POST", re.compile(r"^/sessions$"), self.create_session),
+            ("GET", re.compile(session_path + "$"), self.get_session),
+            ("PATCH", re.compile(session_path + "$"), self.update_session),
+            ("DELETE", re.compile(session_path + "$"), self.delete_session),
+            ("POST", re.compile(session_path + "/turns$"), self.add_turn),
+            ("POST", re.compile(session_path + "/messages$"), self.send_message),
+            ("GET", re.compile(r"^/models$"), self.models),
+            ("GET", re.compile(r"^/health$"), self.health)
+        ]
+
+    def new_chatbot(self, model):
+        return JapanTourismChatbot(self.ollama_url, model, **self.chatbot_settings)
+
+    def session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(404, f"Unknown session '{session_id}'")
+        session.last_used = time.monotonic()
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def configure(self, chatbot, settings):
+        """Apply the client-settable settings in a request body"""
+        for name in SESSION_SETTINGS:
+            if name in settings:
+                setattr(chatbot, name, settings[name])
+
+    def evict_sessions(self):
+        """Drop sessions idle past session_ttl, then the least recently used over max_sessions"""
+        now = time.monotonic()
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if now - session.last_used < self.session_ttl and len(self.sessions) < self.max_sessions:
+                break
+            del self.sessions[session_id]
+            # As for a deleted session: queued messages see they were superseded
+            session.latest += 1
+            self.cancel_turn(session, "session expired")
+
+    def cancel_turn(self, session, reason):
+        """Cancel the answer a session is streaming; returns True if one was running"""
+        task = session.task
+        if not session.lock.locked() or task is None or task.done() or task in self.cancelling:
+            return False
+        self.cancelling[task] = reason
+        task.add_done_callback(lambda done: self.cancelling.pop(done, None))
+        task.cancel()
+        self.stats["cancelled"] += 1
+        return True
+
+    def cancel_reason(self):
+        """Reason the current task was cancelled by cancel_turn, un-cancelling it; None otherwise"""
+        task = asyncio.current_task()
+        reason = self.cancelling.pop(task, None)
+        if reason:
+            task.uncancel()
+        return reason
+
+    async def create_session(self, request):
+        settings = request.json()
+        self.evict_sessions()
+        session_id = uuid.uuid4().hex
+        chatbot = self.new_chatbot(settings.get("model") or self.model)
+        # The scheduler takes turns between sessions by this ID
+        chatbot.session_id = session_id
+        self.configure(chatbot, settings)
+        self.sessions[session_id] = Session(session_id, chatbot)
+        return 201, {"session_id": session_id}
+
+    async def get_session(self, request, session_id):
+        chatbot = self.session(session_id).chatbot
+        return 200, {
+            "session_id": session_id,
+            "model": chatbot.model,
+            "prompt_mode": chatbot.prompt_mode,
+            "prefetch": chatbot.prefetch,
+            "turns": [{"user": turn['user'], "assistant": turn['assistant']} for turn in chatbot.conversation_history],
+            "summary": chatbot.memory.summary
+        }
+
+    async def update_session(self, request, session_id):
+        self.configure(self.session(session_id).chatbot, request.json())
+        return await self.get_session(request, session_id)
+
+    async def delete_session(self, request, session_id):
+        session = self.session(session_id)
+        del self.sessions[session_id]
+        # Messages still waiting for the lock see they were superseded
+        session.latest += 1
+        self.cancel_turn(session, "session closed")
+        return 200, {"deleted": session_id}
+
+    async def add_turn(self, request, session_id):
+        data = request.json()
+        if not data.get("user") or not data.get("assistant"):
+            raise HTTPError(400, "user and assistant are required")
+        self.session(session_id).chatbot.add_to_history(data["user"], data["assistant"])
+        return 201, {"turns": len(self.session(session_id).chatbot.conversation_history)}
+
+    async def send_message(self, request, session_id):
+        session = self.session(session_id)
+        data = request.json()
+        message = str(data.get("message") or "").strip()
+        if not message:
+            raise HTTPError(400, "message is required")
+        self.cancel_turn(session, "superseded by a newer message")
+        events = self.answer(session, message, data.get("use_cache", True))
+        if data.get("stream", True):
+            return 200, events
+
+        try:
+            async with aclosing(events):
+                async for event, payload in events:
+                    if event == "done":
+                        return 200, payload
+                    if event == "error":
+                        return 503, payload
+                    if event == "cancelled":
+                        return 409, payload
+        except asyncio.CancelledError:
+            reason = self.cancel_reason()
+            if not reason:
+                raise
+            return 409, {"reason": reason}
+
+    async def models(self, request):
+        # Endpoint probes block, so they run off the event loop
+        return 200, {
+            "models": await asyncio.to_thread(self.default_chatbot.get_available_models),
+            "default": self.model,
+            "quick_questions": QUICK_QUESTIONS
+        }
+
+    async def health(self, request):
+        chatbot = self.default_chatbot
+        return 200, {
+            "status": "ok" if await asyncio.to_thread(chatbot.check_ollama_connection) else "degraded",
+            "endpoints": chatbot.pool.snapshot(),
+            "scheduler": chatbot.scheduler.snapshot(),
+            "sessions": len(self.sessions),
+            "prefetch": chatbot.prefetcher.summary(),
+            **self.stats
+        }
+
+    async def answer(self, session, message, use_cache=True):
+        """Yield (event, data) for one turn: queued updates and tokens, then done, error or cancelled"""
+        chatbot = session.chatbot
+        session.latest += 1
+        turn = session.latest
+        async with session.lock:
+            if turn != session.latest:
+                yield "cancelled", {"reason": "superseded by a newer message"}
+                return
+            session.task = asyncio.current_task()
+            answer = ""
+            error = None
+            async with aclosing(self.turn_events(chatbot, message, use_cache)) as events:
+                async for event, data in events:
+                    if event == "queued":
+                        yield "queued", {"position": data.position, "estimated_wait": data.estimated_wait()}
+                    elif event == "token":
+                        answer += data
+                        yield "token", {"token": data}
+                    elif event == "error":
+                        error = data
+            if error:
+                yield "error", {"error": error}
+            elif chatbot.last_stats.get('cancelled'):
+                yield "cancelled", {"reason": "the answer was cancelled"}
+            else:
+                yield "done", await asyncio.to_thread(self.finish_turn, chatbot, message, answer)
+
+    async def turn_events(self, chatbot, message, use_cache):
+        """chatbot.generate_response_events for one message, driven without blocking the loop
+
+        Routing, the cache lookup and joining a shared request run in the
+        default executor a step at a time, and a queued request waits for its
+        scheduler slot here as a coroutine. Only once the request is admitted
+        (or follows an identical one) does a thread of its own read from
+        Ollama. Closing this generator cancels the answer.
+        """
+        loop = asyncio.get_running_loop()
+        events = chatbot.generate_response_events(message, use_cache)
+        step = None
+        relaying = finished = False
+        try:
+            while True:
+                step = asyncio.ensure_future(asyncio.to_thread(next, events, None))
+                item = await asyncio.shield(step)
+                if item is None:
+                    return
+                event, data = item
+                if event == "started":
+                    break
+                yield event, data
+                if event == "queued" and not data.admitted.is_set():
+                    await asyncio.sleep(self.queue_poll)
+
+            queue = asyncio.Queue()
+            def put(item):
+                try:
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+                except RuntimeError:
+                    # A cancelled turn can outlive the loop at shutdown
+                    pass
+
+            def relay():
+                try:
+                    for item in events:
+                        put(item)
+                except Exception:
+                    traceback.print_exc()
+                    put(("error", "Sorry, I could not generate a response."))
+                finally:
+                    put(None)
+
+            relaying = True
+            threading.Thread(target=relay, daemon=True).start()
+            while True:
+                item = await queue.get()
+                if item is None:
+                    finished = True
+                    return
+                yield item
+        finally:
+            if relaying:
+                if not finished:
+                    # The relay thread notices and closes the stream to Ollama itself
+                    chatbot.cancel_generation()
+            elif step is not None and not step.done():
+                # A generator can only be closed once its current step has returned
+                step.add_done_callback(lambda _: loop.run_in_executor(None, events.close))
+            else:
+                await asyncio.to_thread(events.close)
+
+    def finish_turn(self, chatbot, message, answer):
+        """Record a finished turn in the session; returns the done event's data"""
+        chatbot.add_to_history(message, answer)
+        stats = dict(chatbot.last_stats, caption=chatbot.format_stats(chatbot.last_stats))
+        return {"answer": answer, "stats": stats, "follow_ups": chatbot.prefetch_follow_ups()}
+
+    async def dispatch(self, request):
+        """Route a request to its handler; returns (status, JSON body or async event stream)"""
+        self.stats["requests"] += 1
+        allowed = []
+        for method, pattern, handler in self.routes:
+            match = pattern.match(request.path)
+            if not match:
+                continue
+            if method != request.method:
+                allowed.append(method)
+                continue
+            try:
+                return await handler(request, **match.groupdict())
+            except HTTPError as e:
+                return e.status, {"error": str(e)}
+            except Exception:
+                traceback.print_exc()
+                return 500, {"error": "Internal server error"}
+        if allowed:
+            return 405, {"error": f"Use {', '.join(allowed)} for {request.path}"}
+        return 404, {"error": f"No route for {request.path}"}
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until it closes or a stream ends"""
+        self.stats["connections"] += 1
+        self.stats["open_connections"] += 1
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, self.idle_timeout)
+                except HTTPError as e:
+                    write_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    await writer.drain()
+                    return
+                if request is None:
+                    return
+                status, body = await self.dispatch(request)
+                if hasattr(body, "__aiter__"):
+                    await self.write_events(reader, writer, body)
+                    return
+                write_json(writer, status, body, request.keep_alive)
+                await writer.drain()
+                if not request.keep_alive:
+                    return
+        except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.stats["open_connections"] -= 1
+            writer.close()
+
+    async def write_events(self, reader, writer, events):
+        """Send an event stream as SSE, cancelling it if the client disconnects first"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        # The client sends nothing more, so a finished read means it has gone away
+        task = asyncio.current_task()
+        disconnected = asyncio.ensure_future(reader.read(1))
+        disconnected.add_done_callback(lambda future: future.cancelled() or task.cancel())
+        try:
+            async with aclosing(events):
+                async for event, data in events:
+                    writer.write(format_event(event, data))
+                    await writer.drain()
+        except asyncio.CancelledError:
+            # Closing the stream above already stopped the generation upstream
+            reason = self.cancel_reason()
+            if reason:
+                writer.write(format_event("cancelled", {"reason": reason}))
+                await writer.drain()
+                return
+            if not disconnected.done() or disconnected.cancelled():
+                raise
+            self.stats["disconnects"] += 1
+        finally:
+            disconnected.cancel()
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        """Listen until cancelled"""
+        # The first endpoint probe blocks, so do it off the event loop
+        await asyncio.to_thread(self.default_chatbot.check_ollama_connection)
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        print(f"Serving the chat API on http://{host}:{port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+def format_event(event, data):
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n".encode()
+
+def write_json(writer, status, body, keep_alive=True):
+    data = json.dumps(body, ensure_ascii=False, default=str).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Japan tourism chatbot over HTTP with SSE streaming")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--ollama-url", default=OLLAMA_URLS, help="comma-separated Ollama endpoints")
+    parser.add_argument("--model", default="llama2")
+    parser.add_argument("--concurrency", type=int, default=4, help="generations per Ollama endpoint at once")
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--session-ttl", type=int, default=3600, help="seconds before an idle session is dropped")
+    args = parser.parse_args()
+
+    service = ChatService(args.ollama_url, args.model, session_ttl=args.session_ttl, max_sessions=args.max_sessions,
+                          max_concurrency=args.concurrency, response_cache_path=RESPONSE_CACHE_PATH,
+                          metrics_path=METRICS_PATH, request_log_path=REQUEST_LOG_PATH)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
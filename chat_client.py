@@ -0,0 +1,155 @@
+import json
+import os
+import requests
+
+from ollama_client import CachedProbe
+
+CHAT_API_URL = os.environ.get("CHAT_API_URL", "http://localhost:8000")
+
+def read_events(response):
+    """Yield (event, data) from a server-sent-event response"""
+    # SSE is always UTF-8
+    response.encoding = "utf-8"
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line:
+            field, _, value = line.partition(": ")
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+        elif data:
+            yield event, json.loads("\n".join(data))
+            event, data = "message", []
+
+class ChatAPIClient:
+    """A chat_api.py session with the parts of JapanTourismChatbot's interface the chat UI uses
+
+    The conversation lives on the service; this object only holds the
+    session ID, the settings to re-apply if the service loses the session,
+    and the stats and follow-ups of the last answer. The health report and
+    model catalog are cached for status_ttl seconds, since Streamlit asks for
+    both on every rerun.
+    """
+    def __init__(self, base_url=CHAT_API_URL, timeout=(5, 300), status_ttl=15, **settings):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.settings = settings
+        self.health_probe = CachedProbe(self.fetch_health, ttl=status_ttl)
+        self.catalog_probe = CachedProbe(self.fetch_models, ttl=status_ttl)
+        self.last_stats = {}
+        self.follow_ups = []
+        self.last_exchange = None
+        self.session_id = self.open_session()
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def open_session(self):
+        """Start a session on the service with this client's settings"""
+        response = self.http.post(self.url("/sessions"), json=self.settings, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["session_id"]
+
+    def configure(self, **settings):
+        """Change session settings (model, prompt_mode, prefetch) if they differ"""
+        changed = {name: value for name, value in settings.items() if self.settings.get(name) != value}
+        if not changed:
+            return
+        self.settings.update(changed)
+        response = self.http.patch(self.url(f"/sessions/{self.session_id}"), json=changed, timeout=self.timeout)
+        if response.status_code == 404:
+            self.session_id = self.open_session()
+
+    def health(self):
+        """Last-known health report, refreshed in the background after the TTL"""
+        return self.health_probe.get(default={"status": "unreachable"})
+
+    def models(self):
+        """Last-known installed models, default model and quick questions"""
+        return self.catalog_probe.get() or {"models": [], "default": None, "quick_questions": []}
+
+    def fetch_health(self):
+        """The service's health report, or {"status": "unreachable"}"""
+        try:
+            response = self.http.get(self.url("/health"), timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except requests.RequestException:
+            return {"status": "unreachable"}
+
+    def fetch_models(self):
+        """Installed models, the service's default model and its quick questions; None if unreachable"""
+        try:
+            response = self.http.get(self.url("/models"), timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError):
+            return None
+
+    def generate_response_stream(self, user_input, on_wait=None, use_cache=True):
+        """Ask the service, yielding tokens as they arrive
+
+        on_wait(position, estimated_wait) is called while the request is queued.
+        Closing the generator early drops the connection, which cancels the answer.
+        """
+        self.last_stats = {}
+        self.follow_ups = []
+        body = {"message": user_input, "use_cache": use_cache}
+        try:
+            response = self.http.post(self.url(f"/sessions/{self.session_id}/messages"),
+                                      json=body, stream=True, timeout=self.timeout)
+            if response.status_code == 404:
+                # The service restarted or expired the session; the answer starts a new one
+                response.close()
+                self.session_id = self.open_session()
+                response = self.http.post(self.url(f"/sessions/{self.session_id}/messages"),
+                                          json=body, stream=True, timeout=self.timeout)
+            with response:
+                if response.status_code != 200:
+                    yield f"Error: {response.status_code} - {response.text}"
+                    return
+                for event, data in read_events(response):
+                    if event == "queued":
+                        if on_wait:
+                            on_wait(data["position"], data["estimated_wait"])
+                    elif event == "token":
+                        yield data["token"]
+                    elif event == "error":
+                        yield data["error"]
+                    elif event == "cancelled":
+                        # A newer message or a reset from elsewhere took over the session
+                        self.last_stats = {"cancelled": True, "caption": f"🛑 Cancelled: {data['reason']}"}
+                    elif event == "done":
+                        self.last_stats = data["stats"]
+                        self.follow_ups = data["follow_ups"]
+                        self.last_exchange = (user_input, data["answer"])
+        except requests.RequestException as e:
+            yield f"Connection error: {str(e)}"
+
+    def format_stats(self, stats):
+        """The caption the service formatted for an answer"""
+        return (stats or {}).get("caption", "")
+
+    def add_to_history(self, user_input, assistant_response):
+        """Record an exchange the service has not seen, such as a restored transcript"""
+        # Answers from the service are already in its history
+        if (user_input, assistant_response) == self.last_exchange:
+            self.last_exchange = None
+            return
+        self.http.post(self.url(f"/sessions/{self.session_id}/turns"),
+                       json={"user": user_input, "assistant": assistant_response}, timeout=self.timeout)
+
+    def prefetch_follow_ups(self, limit=2):
+        """Follow-ups the service predicted (and is prefetching) for the last answer"""
+        return self.follow_ups[:limit]
+
+    def reset_conversation(self):
+        """Drop the session on the service and start a new one"""
+        try:
+            self.http.delete(self.url(f"/sessions/{self.session_id}"), timeout=self.timeout)
+        except requests.RequestException:
+            pass
+        self.last_exchange = None
+        self.session_id = self.open_session()
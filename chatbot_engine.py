@@ -0,0 +1,698 @@
+import requests
+import os
+import time
+import hashlib
+import threading
+import uuid
+from contextlib import closing
+from endpoint_pool import get_pool, parse_urls, HedgedRequest, NoEndpointAvailable, EndpointError
+from response_cache import get_response_cache, ResponseCache
+from knowledge_base import get_knowledge_base
+from conversation_memory import ConversationMemory, estimate_tokens
+from request_scheduler import get_scheduler, QueueTimeout
+from singleflight import get_single_flight, request_key
+from metrics import get_metrics
+from model_router import ModelRouter, QuestionClassifier
+from prefetch import get_prefetcher, get_follow_up_predictor
+from travel_planner import get_travel_planner
+from generation_profiles import get_generation_profiles
+
+# Comma-separated list of Ollama servers to spread generations across
+OLLAMA_URLS = os.environ.get("OLLAMA_URLS", "http://localhost:11434")
+RESPONSE_CACHE_PATH = ".cache/responses.json"
+METRICS_PATH = ".cache/metrics.prom"
+REQUEST_LOG_PATH = ".cache/request_log.jsonl"
+
+QUICK_QUESTIONS = [
+    "Plan a 7-day Tokyo itinerary",
+    "Best time to visit Japan?",
+    "How to use JR Pass?",
+    "Traditional Japanese food to try",
+    "Cherry blossom viewing spots",
+    "Cultural etiquette tips",
+    "Budget for 2 weeks in Japan",
+    "Day trip from Tokyo"
+]
+
+class Generation:
+    """One answer a session is streaming; cancel() may be called from any thread
+    
+    Cancelling closes the connection to Ollama so it stops decoding and frees
+    the scheduler slot. When identical requests from other sessions follow
+    this one's flight, the leader only stops reading and the flight runs on
+    for them.
+    """
+    def __init__(self, single_flight, key, flight, leader, stats):
+        self.single_flight = single_flight
+        self.key = key
+        self.flight = flight
+        self.leader = leader
+        self.stats = stats
+        self.request = None
+        self.ticket = None
+        self.tokens = 0
+        self.cancelled = False
+        # True once the upstream generation has actually been stopped
+        self.stopped = False
+        self.lock = threading.Lock()
+    
+    def attach(self, request, ticket):
+        """Set the request and slot serving this answer; False if it was cancelled first"""
+        with self.lock:
+            self.request = request
+            self.ticket = ticket
+            return not self.cancelled
+    
+    def cancel(self):
+        """Stop the answer; returns True if Ollama was told to stop generating it"""
+        with self.lock:
+            if self.cancelled:
+                return self.stopped
+            self.cancelled = True
+            if not self.leader or not self.single_flight.abandon(self.key, self.flight):
+                return False
+            self.stopped = True
+            request, ticket = self.request, self.ticket
+        if request:
+            request.cancel()
+        if ticket:
+            ticket.release()
+        return True
+
+class JapanTourismChatbot:
+    def __init__(self, ollama_url="http://localhost:11434", model="llama2",
+                 pool_size=10, connect_timeout=5, read_timeout=30, keep_alive=True,
+                 prompt_mode="chat", model_keep_alive="30m", response_cache_path=None,
+                 knowledge_top_k=4, num_ctx=4096, max_concurrency=4, max_queue_age=60,
+                 metrics_path=None, request_log_path=None, hedge_percentile=95, min_read_timeout=5,
+                 small_model=None, routing_policy="balanced", prefetch=False, prefetch_concurrency=1,
+                 use_planner=True, plan_num_predict=None, use_profiles=True):
+        # One URL, a comma-separated string or a list of URLs
+        self.ollama_urls = parse_urls(ollama_url)
+        self.ollama_url = ",".join(self.ollama_urls)
+        self.model = model
+        
+        # "chat" sends a stable system message to /api/chat, "context" carries
+        # Ollama's returned context array, "generate" re-sends the full prompt
+        self.prompt_mode = prompt_mode
+        self.model_keep_alive = model_keep_alive
+        self.context = None
+        self.context_model = None
+        self.prompt_savings = {'tokens': 0, 'seconds': 0}
+        
+        # Answers to repeated questions are shared across sessions
+        self.response_cache = get_response_cache(response_cache_path)
+        
+        # Per-request timing spans, aggregated process-wide and exported
+        self.metrics = get_metrics(metrics_path, request_log_path)
+        
+        # Shared connection pools, one per endpoint, reused across reruns and
+        # sessions; each generation goes to the least-loaded healthy endpoint
+        self.pool = get_pool(self.ollama_urls, pool_size=pool_size, connect_timeout=connect_timeout,
+                             read_timeout=read_timeout, keep_alive=keep_alive)
+        
+        # Process-wide admission control: max_concurrency is per endpoint and
+        # should match each server's parallel slots (OLLAMA_NUM_PARALLEL)
+        self.scheduler = get_scheduler(self.ollama_url, max_concurrency * len(self.ollama_urls), max_queue_age)
+        
+        # Read timeouts adapt to each endpoint's observed TTFT and token gaps
+        # (between min_read_timeout and read_timeout); a generation with no
+        # token after the p<hedge_percentile> TTFT is duplicated on another
+        # endpoint (None disables hedging)
+        self.hedge_percentile = hedge_percentile
+        self.min_read_timeout = min_read_timeout
+        self.session_id = uuid.uuid4().hex
+        self.single_flight = get_single_flight()
+        self.last_stats = {}
+    
+        # The answer this session is streaming: a new question, Clear Chat or
+        # an abandoned stream cancels it so Ollama stops decoding it
+        self.generation = None
+        
+        # Recent turns verbatim within a num_ctx-based token budget, older
+        # turns folded into a summary by a background thread
+        self.memory = ConversationMemory(num_ctx=num_ctx, summarizer=self.summarize)
+        
+        # Japan tourism knowledge base: a short stable instruction block plus a
+        # chunked corpus, of which only the relevant parts go into each prompt
+        self.knowledge_base = get_knowledge_base()
+        self.knowledge_top_k = knowledge_top_k
+        self.tourism_context = self.knowledge_base.instructions
+        
+        # Short factual questions can go to a small fast model, keeping the
+        # selected model for itineraries and budgets (see model_router.POLICIES)
+        self.router = ModelRouter(QuestionClassifier(self.knowledge_base), small_model, routing_policy)
+        
+        # Routes, day trips and itineraries are computed from the travel graph;
+        # the model only writes the prose around them, so it needs fewer tokens
+        # (the "planned" generation profile, or plan_num_predict if given)
+        self.planner = get_travel_planner() if use_planner else None
+        self.plan_num_predict = plan_num_predict
+        
+        # Answer length cap, prompt budget and stop sequences per kind of
+        # question, adapted process-wide from observed answer lengths
+        self.profiles = get_generation_profiles() if use_profiles else None
+        
+        # Opt-in: while the backend is idle after an answer, likely follow-ups
+        # are answered ahead of time into a per-conversation cache
+        self.prefetch = prefetch
+        self.prefetcher = get_prefetcher(self.ollama_url, self.scheduler, prefetch_concurrency)
+        self.prefetch_cache = ResponseCache(max_entries=8, ttl=3600)
+    
+    @property
+    def conversation_history(self):
+        """Turns still kept verbatim (older ones live in memory.summary)"""
+        return self.memory.turns
+    
+    def context_fingerprint(self):
+        """Hash of the knowledge context, so cached answers expire when it changes"""
+        context = f"{self.tourism_context}{self.knowledge_base.version}{self.planner.graph.version if self.planner else ''}"
+        return hashlib.sha1(context.encode()).hexdigest()[:12]
+    
+    def conversation_fingerprint(self):
+        """Hash of the knowledge context and the conversation so far, for answers that depend on both"""
+        turns = "".join(f"{item['user']}\n{item['assistant']}\n" for item in self.conversation_history)
+        state = f"{self.context_fingerprint()}{self.prompt_mode}{self.memory.summary}\n{turns}"
+        return hashlib.sha1(state.encode()).hexdigest()[:12]
+    
+    def is_cacheable(self, user_input):
+        """Only standalone questions can be answered from the shared cache"""
+        return self.is_standalone() or user_input in QUICK_QUESTIONS
+    
+    def is_standalone(self):
+        """True while prompts carry no conversation, so answers may be shared with other sessions"""
+        return not self.conversation_history and not self.memory.summary and self.context is None
+    
+    def check_ollama_connection(self):
+        """Check if any Ollama endpoint is running and accessible (cached, see OllamaClient.status)"""
+        return self.pool.is_connected()
+    
+    def get_available_models(self):
+        """Get models available on the healthy endpoints (cached, see OllamaClient.status)"""
+        return self.pool.available_models()
+    
+    def plan_for(self, user_input):
+        """Computed route, day-trip or itinerary facts for the question, or None"""
+        return self.planner.plan_text(user_input) if self.planner else None
+    
+    def profile_for(self, user_input):
+        """Generation profile for a question (see generation_profiles), or None when disabled"""
+        if not self.profiles:
+            return None
+        return self.profiles.select(user_input, self.router.classifier.score(user_input),
+                                    planned=bool(self.plan_for(user_input)))
+    
+    def retrieve_knowledge(self, user_input):
+        """Computed plan (if any) and top-k knowledge base chunks for the question, formatted for the prompt"""
+        knowledge = ""
+        plan = self.plan_for(user_input)
+        if plan:
+            knowledge = f"Computed Plan (exact times and fares - describe it, do not recalculate):\n{plan}\n\n"
+        chunks = self.knowledge_base.search(user_input, top_k=self.knowledge_top_k)
+        if chunks:
+            knowledge += f"Relevant Information:\n{self.knowledge_base.format_chunks(chunks)}\n\n"
+        return knowledge
+    
+    def build_prompt(self, user_input, num_ctx=None):
+        """Build the full prompt from tourism context, history and question"""
+        knowledge = self.retrieve_knowledge(user_input)
+        full_prompt = f"{self.tourism_context}\n\n{knowledge}User Question: {user_input}\n\nResponse:"
+        
+        # Add conversation history for context
+        recent_turns = self.memory.recent_turns(num_ctx)
+        if recent_turns or self.memory.summary:
+            history_text = "\n".join([
+                f"User: {item['user']}\nAssistant: {item['assistant']}" 
+                for item in recent_turns
+            ])
+            if self.memory.summary:
+                history_text = f"(Earlier: {self.memory.summary})\n{history_text}"
+            full_prompt = f"{self.tourism_context}\n\n{knowledge}Conversation History:\n{history_text}\n\nUser Question: {user_input}\n\nResponse:"
+        
+        return full_prompt
+    
+    def route_model(self, user_input):
+        """Pick the model for a question; returns (model, tier)"""
+        turns = self.conversation_history
+        previous_question = turns[-1]['user'] if turns else None
+        model, tier, score = self.router.route(
+            user_input, self.model, previous_question,
+            is_available=lambda model: bool(self.pool.endpoints_with(model))
+        )
+        return model, tier
+    
+    def build_request(self, user_input, model=None):
+        """Build the Ollama endpoint and payload for the current prompt mode"""
+        model = model or self.model
+        # num_ctx stays the same for every request: Ollama reloads the model
+        # when it changes, so a profile's smaller num_ctx only trims history
+        options = {
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "num_ctx": self.memory.num_ctx
+        }
+        profile = self.profile_for(user_input)
+        history_ctx = None
+        if profile:
+            options.update(self.profiles.options(profile))
+            history_ctx = profile.num_ctx
+        if self.plan_num_predict and self.plan_for(user_input):
+            options["num_predict"] = self.plan_num_predict
+        
+        # The carried context grows every turn; once it nears num_ctx start
+        # again from the summarized history
+        # The carried context is only valid for the model that produced it
+        context_fits = (self.context and self.context_model == model
+                        and len(self.context) < self.memory.num_ctx * 0.75)
+        
+        if self.prompt_mode == "chat":
+            # Stable system message first so the server can reuse its KV cache
+            messages = [{"role": "system", "content": self.tourism_context}]
+            if self.memory.summary:
+                messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.memory.summary}"})
+            for item in self.memory.recent_turns(history_ctx):
+                messages.append({"role": "user", "content": item['user']})
+                messages.append({"role": "assistant", "content": item['assistant']})
+            # Retrieved knowledge goes with the new question, not the system message
+            knowledge = self.retrieve_knowledge(user_input)
+            messages.append({"role": "user", "content": f"{knowledge}User Question: {user_input}"})
+            payload = {"model": model, "messages": messages}
+            path = "/api/chat"
+        elif self.prompt_mode == "context" and context_fits:
+            # Previous turns are already encoded in the returned context array
+            payload = {
+                "model": model,
+                "prompt": f"\n\n{self.retrieve_knowledge(user_input)}User Question: {user_input}\n\nResponse:",
+                "context": self.context
+            }
+            path = "/api/generate"
+        else:
+            payload = {"model": model, "prompt": self.build_prompt(user_input, history_ctx)}
+            path = "/api/generate"
+        
+        payload.update({"stream": True, "keep_alive": self.model_keep_alive, "options": options})
+        return path, payload
+    
+    def generate_response_stream(self, user_input, on_wait=None, use_cache=True):
+        """Generate response using Ollama, yielding tokens as they arrive
+        
+        on_wait(position, estimated_wait) is called while the request is queued.
+        use_cache=False skips the cache lookup but still stores the new answer.
+        Closing the generator early cancels the generation, as does a new call
+        or reset_conversation() while it is still running. A failed request
+        yields its error message as the answer.
+        """
+        with closing(self.generate_response_events(user_input, use_cache)) as events:
+            for event, data in events:
+                if event == "queued":
+                    if on_wait:
+                        on_wait(data.position, data.estimated_wait())
+                    data.admitted.wait(0.5)
+                elif event in ("token", "error"):
+                    yield data
+    
+    def generate_response_events(self, user_input, use_cache=True):
+        """generate_response_stream as (event, data) pairs, for callers that wait for a slot themselves
+        
+        ("queued", ticket) comes while the request waits for a scheduler slot:
+        resume the generator once ticket.admitted is set, or after a while to
+        check again. ("started", None) comes when the request is admitted or
+        follows an identical one, then ("token", text) per token; a failed
+        request ends with ("error", message). Only after "started" does the
+        generator block on Ollama.
+        """
+        self.cancel_generation()
+        start_time = time.perf_counter()
+        first_token_time = None
+        model, tier = self.route_model(user_input)
+        self.last_stats = {'model': model, 'tier': tier}
+        
+        cacheable = self.is_cacheable(user_input)
+        # A quick question asked mid-conversation is answered with this
+        # session's history in the prompt: read the shared cache, never fill it
+        shareable = cacheable and self.is_standalone()
+        if use_cache:
+            cached = self.cached_answer(user_input, model, cacheable, start_time)
+            if cached is not None:
+                yield "token", cached
+                return
+        
+        # Identical requests already running in another session are shared
+        path, payload = self.prepare_request(user_input, model)
+        key = request_key(path, payload)
+        flight, leader = self.single_flight.join(key)
+        generation = Generation(self.single_flight, key, flight, leader, self.last_stats)
+        self.generation = generation
+        if leader:
+            events = self.run_flight(generation, path, payload)
+        else:
+            self.last_stats['coalesced'] = True
+            events = self.follow_flight(flight)
+        
+        answer = ""
+        complete = False
+        failed = False
+        try:
+            for event, data in events:
+                if generation.cancelled:
+                    break
+                if event == "token":
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+                        generation.stats['ttft'] = first_token_time - start_time
+                    answer += data
+                    generation.tokens += 1
+                failed = failed or event == "error"
+                yield event, data
+            else:
+                # A cancel from another thread also ends the stream early
+                complete = not generation.cancelled
+        finally:
+            if self.generation is generation:
+                self.generation = None
+            if not complete:
+                # Superseded, cleared or abandoned by the caller: never cached
+                generation.cancel()
+                events.close()
+                self.record_cancellation(model, generation.stats, generation.tokens, start_time, generation.stopped)
+        if not complete:
+            return
+        
+        # No final chunk means the request failed
+        final = flight.final
+        if final is None:
+            if not failed:
+                yield "error", "Sorry, I could not generate a response."
+            self.metrics.record(model, "error", dict(self.last_stats, total_time=time.perf_counter() - start_time))
+            return
+        
+        self.record_generation(user_input, model, tier, final, start_time, "ok" if leader else "coalesced")
+        if leader and shareable and answer:
+            self.response_cache.store(
+                model, user_input, self.context_fingerprint(),
+                answer, self.last_stats['total_time']
+            )
+    
+    def cached_answer(self, user_input, model, cacheable, start_time):
+        """Answer from the shared or prefetch cache, recorded in last_stats; None on a miss"""
+        if not cacheable and not self.prefetch:
+            return None
+        # Follow-ups only match answers prefetched for this exact conversation
+        if cacheable:
+            cache, fingerprint = self.response_cache, self.context_fingerprint()
+        else:
+            cache, fingerprint = self.prefetch_cache, self.conversation_fingerprint()
+        # An answer cached from the large model is good enough for a small-tier question
+        for cache_model in dict.fromkeys([model, self.model]):
+            cached = cache.lookup(cache_model, user_input, fingerprint)
+            if cached:
+                self.last_stats.update({
+                    'cache_hit': True,
+                    'prefetched': not cacheable,
+                    'ttft': time.perf_counter() - start_time,
+                    'time_saved': cached['generation_time']
+                })
+                if not cacheable:
+                    self.prefetcher.record_hit(cached['generation_time'])
+                self.metrics.record(model, "cache_hit", self.last_stats)
+                return cached['response']
+        return None
+    
+    def prepare_request(self, user_input, model):
+        """build_request plus its timing and plan flag in last_stats"""
+        build_start = time.perf_counter()
+        path, payload = self.build_request(user_input, model)
+        self.last_stats['prompt_build'] = time.perf_counter() - build_start
+        if self.plan_for(user_input):
+            self.last_stats['planned'] = True
+        profile = self.profile_for(user_input)
+        if profile:
+            self.last_stats['profile'] = profile.name
+        self.last_stats['num_predict'] = payload['options'].get('num_predict')
+        return path, payload
+    
+    def record_generation(self, user_input, model, tier, final, start_time, outcome="ok"):
+        """Fold a finished generation's final chunk into last_stats, metrics, routing stats and context"""
+        self.last_stats.update({
+            'total_time': time.perf_counter() - start_time,
+            'eval_count': final.get('eval_count', 0),
+            'eval_duration': final.get('eval_duration', 0) / 1e9,
+            'prompt_eval_count': final.get('prompt_eval_count', 0),
+            'prompt_eval_duration': final.get('prompt_eval_duration', 0) / 1e9,
+            'load_duration': final.get('load_duration', 0) / 1e9
+        })
+        # Followers of a shared request would count the leader's answer again
+        profile = self.profiles.profiles.get(self.last_stats.get('profile')) if self.profiles else None
+        if profile and outcome == "ok":
+            self.last_stats['truncated'] = self.profiles.observe(
+                profile, self.last_stats['eval_count'], self.last_stats['num_predict'], final.get('done_reason'))
+        self.metrics.record(model, outcome, self.last_stats)
+        self.router.stats.record(tier, self.last_stats)
+        if 'context' in final:
+            self.context = final['context']
+            self.context_model = model
+        self.record_prompt_savings(user_input)
+    
+    def record_cancellation(self, model, stats, tokens, start_time, stopped=True):
+        """Record an answer abandoned after `tokens` tokens, estimating the tokens Ollama was spared
+
+        The estimate is the profile's median answer length minus `tokens`, so
+        it is only made once the profile has enough answers; the num_predict
+        cap alone would overstate it.
+        """
+        stats.update({'cancelled': True, 'total_time': time.perf_counter() - start_time})
+        if stopped:
+            stats['eval_count'] = tokens
+            profile = self.profiles.profiles.get(stats.get('profile')) if self.profiles else None
+            expected = self.profiles.expected_tokens(profile) if profile else None
+            if expected is not None:
+                stats['cancelled_tokens'] = max(0, expected - tokens)
+        self.metrics.record(model, "cancelled", stats)
+    
+    def cancel_generation(self):
+        """Stop this session's unfinished answer so Ollama stops decoding it; returns True if one was running"""
+        generation = self.generation
+        if generation is None or generation.cancelled:
+            return False
+        generation.cancel()
+        return True
+    
+    def run_flight(self, generation, path, payload):
+        """Run a request against Ollama, publishing each token to the generation's flight
+        
+        Yields the events of generate_response_events, from "queued" on.
+        """
+        flight = generation.flight
+        stats = generation.stats
+        def fail(message):
+            flight.fail(message)
+            return "error", message
+        
+        ticket = None
+        chunks = None
+        try:
+            # Fail fast instead of queueing while every endpoint's circuit is open
+            if not self.pool.endpoints_with(payload['model']):
+                yield fail(f"Sorry, the model '{payload['model']}' is unavailable right now. Please try again shortly.")
+                return
+            
+            # The caller waits for the slot, so this generator never blocks on it
+            ticket = self.scheduler.submit(self.session_id)
+            try:
+                while not ticket.wait(0):
+                    if generation.cancelled:
+                        return
+                    yield "queued", ticket
+            except QueueTimeout:
+                yield fail("Sorry, the assistant is very busy right now. Please try again in a moment.")
+                return
+            stats['queue_time'] = ticket.queue_time
+            
+            # Hedging adds load, so only do it while nobody is waiting for a slot
+            hedge_percentile = self.hedge_percentile if not self.scheduler.snapshot()['queued'] else None
+            request = HedgedRequest(self.pool, payload['model'], path, payload,
+                                    hedge_percentile=hedge_percentile, min_timeout=self.min_read_timeout)
+            if not generation.attach(request, ticket):
+                return
+            chunks = request.chunks()
+            yield "started", None
+            
+            # Ollama streams one JSON object per line (NDJSON)
+            for chunk in chunks:
+                if chunk.get('error'):
+                    yield fail(f"Error: {chunk['error']}")
+                    return
+                # /api/generate streams "response", /api/chat streams "message"
+                token = chunk.get('response') or chunk.get('message', {}).get('content', '')
+                if token:
+                    flight.publish(token)
+                    yield "token", token
+                if chunk.get('done'):
+                    flight.finish(chunk)
+                    break
+            
+        except NoEndpointAvailable as e:
+            yield fail(f"Error: {e}")
+        except EndpointError as e:
+            yield fail(str(e))
+        except requests.RequestException as e:
+            yield fail(f"Connection error: {str(e)}")
+        finally:
+            if chunks:
+                # Serving endpoint, connect time, read timeout, hedging
+                stats.update(request.stats)
+            if chunks and generation.cancelled and not generation.stopped and not flight.done:
+                # Other sessions still follow this answer: finish it for them
+                threading.Thread(target=self.drain_flight, args=(generation, chunks, ticket), daemon=True).start()
+            else:
+                self.release_flight(generation, chunks, ticket)
+    
+    def follow_flight(self, flight):
+        """Events for a request sharing an identical one's flight"""
+        yield "started", None
+        with closing(flight.follow()) as tokens:
+            for token in tokens:
+                yield "token", token
+        if flight.error:
+            yield "error", flight.error
+    
+    def drain_flight(self, generation, chunks, ticket):
+        """Publish the rest of an answer its leader stopped reading, for the requests following it"""
+        flight = generation.flight
+        try:
+            for chunk in chunks:
+                if chunk.get('error'):
+                    flight.fail(f"Error: {chunk['error']}")
+                    return
+                token = chunk.get('response') or chunk.get('message', {}).get('content', '')
+                if token:
+                    flight.publish(token)
+                if chunk.get('done'):
+                    flight.finish(chunk)
+                    return
+        except Exception as e:
+            flight.fail(f"Error: {e}")
+        finally:
+            self.release_flight(generation, chunks, ticket)
+    
+    def release_flight(self, generation, chunks, ticket):
+        """Close the upstream stream, free the scheduler slot and settle the flight"""
+        if chunks:
+            chunks.close()
+        if ticket:
+            ticket.release()
+        # Followers must never wait on a flight whose leader has gone away
+        if not generation.flight.done:
+            generation.flight.finish(None)
+        self.single_flight.forget(generation.key, generation.flight)
+    
+    def record_prompt_savings(self, user_input):
+        """Compare evaluated prompt tokens with a full re-send of the prompt"""
+        stats = self.last_stats
+        full_tokens = estimate_tokens(self.build_prompt(user_input))
+        saved_tokens = max(0, full_tokens - stats['prompt_eval_count'])
+        saved_time = 0
+        if stats['prompt_eval_count'] and stats['prompt_eval_duration']:
+            saved_time = saved_tokens * stats['prompt_eval_duration'] / stats['prompt_eval_count']
+        
+        stats['prompt_tokens_saved'] = saved_tokens
+        stats['prompt_time_saved'] = saved_time
+        self.prompt_savings['tokens'] += saved_tokens
+        self.prompt_savings['seconds'] += saved_time
+    
+    def generate_response(self, user_input, use_cache=True):
+        """Generate response using Ollama"""
+        response = "".join(self.generate_response_stream(user_input, use_cache=use_cache))
+        return response or 'Sorry, I could not generate a response.'
+    
+    def format_stats(self, stats):
+        """Format generation stats as a short caption"""
+        if not stats or 'ttft' not in stats:
+            return ""
+        if stats.get('prefetched'):
+            return f"🔮 Answered from a prefetched follow-up in {stats['ttft']:.2f}s (saved ~{stats['time_saved']:.1f}s)"
+        if stats.get('cache_hit'):
+            return f"⚡ Answered from cache in {stats['ttft']:.2f}s (saved ~{stats['time_saved']:.1f}s)"
+        caption = f"⏱️ First token {stats['ttft']:.2f}s"
+        if stats.get('queue_time', 0) >= 0.5:
+            caption += f" (queued {stats['queue_time']:.1f}s)"
+        if stats.get('coalesced'):
+            caption += " · 🔗 shared with an identical request"
+        if stats.get('planned'):
+            caption += " · 🗺️ route computed"
+        if stats.get('truncated'):
+            caption += f" · ✂️ cut at {stats['num_predict']} tokens"
+        if stats.get('tier') == "small":
+            caption += f" · 🪶 fast model ({stats['model']})"
+        if stats.get('hedge_won'):
+            caption += " · 🔀 answered by a backup server"
+        if stats.get('eval_duration'):
+            tokens_per_sec = stats['eval_count'] / stats['eval_duration']
+            caption += f" · {stats['eval_count']} tokens in {stats['eval_duration']:.1f}s ({tokens_per_sec:.1f} tok/s)"
+        if 'prompt_eval_count' in stats:
+            caption += f" · prompt {stats['prompt_eval_count']} tokens evaluated"
+            if stats.get('prompt_tokens_saved'):
+                caption += f", ~{stats['prompt_tokens_saved']} reused ({stats['prompt_time_saved']:.2f}s saved)"
+        return caption
+    
+    def summarize(self, previous_summary, turns):
+        """Fold older turns into the running summary using the current model"""
+        transcript = "\n".join(f"User: {item['user']}\nAssistant: {item['assistant']}" for item in turns)
+        prompt = (
+            "Summarize this Japan travel conversation in at most 5 short bullet points, "
+            "keeping destinations, dates, budgets and preferences the user mentioned.\n\n"
+            f"Existing summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}\n\nSummary:"
+        )
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.model_keep_alive,
+            "options": {"temperature": 0.2, "num_predict": 200, "num_ctx": self.memory.num_ctx}
+        }
+        with self.scheduler.slot(self.session_id):
+            endpoint = self.pool.acquire(self.model)
+            try:
+                response = endpoint.client.post("/api/generate", json=payload)
+            except requests.RequestException:
+                self.pool.release(endpoint, ok=False)
+                raise
+            self.pool.release(endpoint, ok=response.status_code < 500)
+        response.raise_for_status()
+        return response.json()['response'].strip()
+    
+    def load_model(self):
+        """Load the model (and the small routing model) on every endpoint that has it; returns seconds taken"""
+        start_time = time.perf_counter()
+        models = [self.model] + ([self.router.small_model] if self.router.small_model else [])
+        for model in dict.fromkeys(models):
+            payload = {"model": model, "prompt": "", "keep_alive": self.model_keep_alive}
+            endpoints = self.pool.endpoints_with(model)
+            if not endpoints:
+                raise NoEndpointAvailable(f"No healthy Ollama endpoint has model '{model}'")
+            for endpoint in endpoints:
+                # Loading a large model from disk can take minutes
+                response = endpoint.client.post("/api/generate", json=payload, timeout=(endpoint.client.timeout[0], 300))
+                response.raise_for_status()
+        return time.perf_counter() - start_time
+    
+    def reset_conversation(self):
+        """Cancel any unfinished answer, then forget history and cached Ollama context for this session"""
+        self.cancel_generation()
+        self.memory.reset()
+        self.context = None
+        self.context_model = None
+        self.prefetch_cache.clear()
+    
+    def prefetch_follow_ups(self, limit=2):
+        """Predict the next questions and answer them in the background; returns the predictions"""
+        if not self.prefetch or not self.conversation_history:
+            return []
+        questions = get_follow_up_predictor().predict(self.conversation_history, limit)
+        if questions:
+            self.prefetcher.submit(self, questions)
+        return questions
+    
+    def add_to_history(self, user_input, assistant_response):
+        """Add exchange to conversation history (older turns are summarized in the background)"""
+        self.memory.add(user_input, assistant_response)
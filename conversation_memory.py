@@ -0,0 +1,98 @@
+import threading
+from datetime import datetime
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English)"""
+    return len(text) // 4
+
+def extractive_summary(previous_summary, turns, max_chars=600):
+    """Fallback summary: the questions asked and the start of each answer"""
+    lines = [previous_summary] if previous_summary else []
+    for turn in turns:
+        answer = " ".join(turn['assistant'].split())
+        lines.append(f"User asked: {turn['user']} / Assistant: {answer[:120]}")
+    summary = "\n".join(lines)
+    return summary[-max_chars:]
+
+class ConversationMemory:
+    """Token-budgeted history: recent turns verbatim, older ones in a running summary"""
+    def __init__(self, num_ctx=4096, history_share=0.35, min_recent=1, summarizer=None):
+        self.num_ctx = num_ctx
+        self.history_share = history_share
+        self.min_recent = min_recent
+        self.summarizer = summarizer or extractive_summary
+        self.turns = []
+        self.summary = ""
+        self.lock = threading.Lock()
+        self.compacting = False
+        self.generation = 0
+
+    @property
+    def budget(self):
+        """Tokens available for summary plus verbatim history"""
+        return int(self.num_ctx * self.history_share)
+
+    def turn_tokens(self, turn):
+        """Estimated tokens for one exchange"""
+        return estimate_tokens(turn['user']) + estimate_tokens(turn['assistant'])
+
+    def add(self, user_input, assistant_response):
+        """Record an exchange and compact older turns in the background if needed"""
+        with self.lock:
+            self.turns.append({
+                'user': user_input,
+                'assistant': assistant_response,
+                'timestamp': datetime.now().isoformat()
+            })
+            overflow = self.overflow_turns()
+            if overflow and not self.compacting:
+                self.compacting = True
+                threading.Thread(
+                    target=self.compact, args=(overflow, self.generation), daemon=True
+                ).start()
+
+    def recent_turns(self, num_ctx=None):
+        """Newest turns that fit the budget left after the summary (of a smaller num_ctx if given)"""
+        budget = int(min(num_ctx, self.num_ctx) * self.history_share) if num_ctx else self.budget
+        with self.lock:
+            return self.turns[len(self.turns) - self.fitting_count(budget):]
+
+    def fitting_count(self, budget=None):
+        # Caller holds the lock
+        remaining = (self.budget if budget is None else budget) - estimate_tokens(self.summary)
+        count = 0
+        for turn in reversed(self.turns):
+            remaining -= self.turn_tokens(turn)
+            if remaining < 0 and count >= self.min_recent:
+                break
+            count += 1
+        return count
+
+    def overflow_turns(self):
+        # Caller holds the lock
+        return self.turns[:len(self.turns) - self.fitting_count()]
+
+    def compact(self, turns, generation):
+        """Fold turns that no longer fit into the running summary"""
+        try:
+            try:
+                summary = self.summarizer(self.summary, turns)
+            except Exception:
+                summary = extractive_summary(self.summary, turns)
+
+            with self.lock:
+                # A reset while summarizing makes this result stale
+                if generation != self.generation:
+                    return
+                self.summary = summary
+                self.turns = self.turns[len(turns):]
+        finally:
+            with self.lock:
+                self.compacting = False
+
+    def reset(self):
+        """Forget all turns and the summary"""
+        with self.lock:
+            self.turns = []
+            self.summary = ""
+            self.generation += 1
@@ -0,0 +1,301 @@
+import itertools
+import json
+import queue
+import threading
+import time
+from ollama_client import get_client
+from resilience import LatencyTracker, CircuitBreaker
+
+class NoEndpointAvailable(Exception):
+    """Raised when no healthy endpoint serves the requested model"""
+
+class EndpointError(Exception):
+    """Non-200 response from an Ollama endpoint"""
+
+def parse_urls(ollama_url):
+    """Accept one URL, a comma-separated string or a list of URLs"""
+    if isinstance(ollama_url, str):
+        ollama_url = ollama_url.split(",")
+    return [url.strip().rstrip("/") for url in ollama_url if url.strip()]
+
+class Endpoint:
+    """One Ollama server with its health, models, latency and in-flight request count"""
+    def __init__(self, url, client, breaker):
+        self.url = url
+        self.client = client
+        self.breaker = breaker
+        self.latency = LatencyTracker()
+        self.outstanding = 0
+
+    @property
+    def status(self):
+        return self.client.cached_status()
+
+    def is_available(self):
+        """Healthy by the last probe and its circuit lets requests through"""
+        return self.breaker.allows() and self.status["connected"]
+
+class EndpointPool:
+    """Routes each request to the least-loaded healthy endpoint that has the model"""
+    def __init__(self, urls, client_settings=None, failure_threshold=3, reset_timeout=30):
+        client_settings = client_settings or {}
+        self.endpoints = [
+            Endpoint(url, get_client(url, **client_settings), CircuitBreaker(failure_threshold, reset_timeout))
+            for url in urls
+        ]
+        self.lock = threading.Lock()
+        self.round_robin = itertools.count()
+
+    def is_connected(self):
+        """True if any endpoint is reachable"""
+        return any(endpoint.status["connected"] for endpoint in self.endpoints)
+
+    def available_models(self):
+        """Models installed on at least one healthy endpoint, in first-seen order"""
+        models = []
+        for endpoint in self.endpoints:
+            if endpoint.is_available():
+                models.extend(model for model in endpoint.status["models"] if model not in models)
+        return models
+
+    def endpoints_with(self, model, exclude=()):
+        """Available endpoints that have the model installed"""
+        return [endpoint for endpoint in self.endpoints
+                if endpoint not in exclude and endpoint.is_available() and model in endpoint.status["models"]]
+
+    def acquire(self, model, exclude=()):
+        """Pick an endpoint for a request and count it as outstanding"""
+        candidates = self.endpoints_with(model, exclude)
+        with self.lock:
+            # Re-check under the lock so only one request becomes the half-open trial
+            candidates = [endpoint for endpoint in candidates if endpoint.breaker.allows()]
+            if not candidates:
+                raise NoEndpointAvailable(f"No healthy Ollama endpoint has model '{model}'")
+            # Least outstanding requests first; rotate between equally loaded ones
+            offset = next(self.round_robin) % len(candidates)
+            rotated = candidates[offset:] + candidates[:offset]
+            endpoint = min(rotated, key=lambda e: e.outstanding)
+            endpoint.breaker.before_request()
+            endpoint.outstanding += 1
+            return endpoint
+
+    def release(self, endpoint, ok=True):
+        """Finish a request; ok=False counts towards opening the endpoint's circuit"""
+        with self.lock:
+            endpoint.outstanding -= 1
+        endpoint.breaker.record(ok)
+        if ok is False:
+            # Re-probe so the endpoint drops out as soon as /api/tags stops answering
+            endpoint.client.status.invalidate()
+
+    def snapshot(self):
+        """Per-endpoint state for display"""
+        return [{
+            "url": endpoint.url,
+            "healthy": endpoint.is_available(),
+            "circuit": endpoint.breaker.state,
+            "outstanding": endpoint.outstanding,
+            "ttft_p95": endpoint.latency.ttft_percentile(95),
+            "models": endpoint.status["models"]
+        } for endpoint in self.endpoints]
+
+class Attempt:
+    """One streamed POST to one endpoint, read on its own thread into a shared queue"""
+    def __init__(self, pool, endpoint, events):
+        self.pool = pool
+        self.endpoint = endpoint
+        self.events = events
+        self.response = None
+        self.cancelled = False
+        self.finished = False
+        self.connect_time = None
+
+    def start(self, path, payload, min_timeout):
+        client = self.endpoint.client
+        timeout = (client.timeout[0], self.endpoint.latency.read_timeout(min_timeout, client.timeout[1]))
+        threading.Thread(target=self.run, args=(path, payload, timeout), daemon=True).start()
+        return timeout[1]
+
+    def run(self, path, payload, timeout):
+        ok = True
+        outcome = None
+        start = time.perf_counter()
+        try:
+            response = self.endpoint.client.post(path, json=payload, stream=True, timeout=timeout)
+            self.response = response
+            self.connect_time = time.perf_counter() - start
+            if self.cancelled:
+                response.close()
+                return
+            if response.status_code != 200:
+                # Server errors count against the endpoint, client errors do not
+                ok = response.status_code < 500
+                outcome = EndpointError(f"Error: {response.status_code} - {response.text}")
+                return
+
+            with response:
+                ttft = None
+                last = None
+                max_gap = 0
+                for line in response.iter_lines():
+                    if self.cancelled:
+                        return
+                    if not line:
+                        continue
+                    now = time.perf_counter()
+                    if ttft is None:
+                        ttft = now - start
+                    else:
+                        max_gap = max(max_gap, now - last)
+                    last = now
+                    chunk = json.loads(line)
+                    self.events.put((self, chunk))
+                    if chunk.get("done"):
+                        self.endpoint.latency.observe(ttft, max_gap)
+                        break
+        except Exception as e:
+            # Includes reads failing on purpose once cancel() closes the connection
+            ok = False
+            outcome = e
+        finally:
+            # Release before signalling the end so the caller sees settled counts
+            self.finished = True
+            self.pool.release(self.endpoint, None if self.cancelled else ok)
+            if not self.cancelled:
+                self.events.put((self, outcome))
+
+    def cancel(self):
+        """Stop reading and close the connection so the server stops generating"""
+        if self.finished:
+            return
+        self.cancelled = True
+        response = self.response
+        if response is not None:
+            # urllib3 2.3+ can interrupt a read blocked on another thread
+            shutdown = getattr(response.raw, "shutdown", None)
+            try:
+                if shutdown:
+                    shutdown()
+                response.close()
+            except OSError:
+                pass
+
+class HedgedRequest:
+    """Streams one generation, duplicating it on a second endpoint when the first is slow
+
+    If no token has arrived after the primary endpoint's hedge_percentile TTFT,
+    the same request goes to another endpoint; the first to produce output wins
+    and the other is cancelled. An attempt that fails before producing output
+    fails over to another endpoint the same way.
+    """
+    def __init__(self, pool, model, path, payload, hedge_percentile=95, max_attempts=2, min_timeout=5):
+        self.pool = pool
+        self.model = model
+        self.path = path
+        self.payload = payload
+        self.hedge_percentile = hedge_percentile
+        self.max_attempts = max_attempts
+        self.min_timeout = min_timeout
+        self.events = queue.Queue()
+        self.attempts = []
+        self.winner = None
+        self.cancelled = False
+        self.stats = {}
+
+    def launch(self):
+        """Start an attempt on an endpoint not tried yet"""
+        endpoint = self.pool.acquire(self.model, exclude=[attempt.endpoint for attempt in self.attempts])
+        attempt = Attempt(self.pool, endpoint, self.events)
+        self.attempts.append(attempt)
+        self.stats.setdefault('read_timeout', attempt.start(self.path, self.payload, self.min_timeout))
+        return attempt
+
+    def try_launch(self):
+        """Launch a backup attempt if the budget and another endpoint allow it"""
+        if len(self.attempts) >= self.max_attempts:
+            return False
+        try:
+            self.launch()
+        except NoEndpointAvailable:
+            return False
+        return True
+
+    def chunks(self):
+        """Yield the winning attempt's NDJSON chunks; raises its error if every attempt fails"""
+        if self.cancelled:
+            return
+        primary = self.launch()
+        delay = primary.endpoint.latency.ttft_percentile(self.hedge_percentile) if self.hedge_percentile else None
+        hedge_at = time.monotonic() + delay if delay is not None else None
+        running = 1
+        try:
+            while True:
+                timeout = None
+                if self.winner is None and hedge_at is not None:
+                    timeout = max(0, hedge_at - time.monotonic())
+                try:
+                    attempt, item = self.events.get(timeout=timeout)
+                except queue.Empty:
+                    hedge_at = None
+                    if self.try_launch():
+                        running += 1
+                        self.stats['hedged'] = True
+                    continue
+
+                if attempt is None:
+                    # cancel() from another thread
+                    return
+                if attempt.cancelled or (self.winner is not None and attempt is not self.winner):
+                    continue
+
+                if not isinstance(item, dict):
+                    # Attempt finished: None after a normal end, or an exception
+                    running -= 1
+                    if self.winner is None and isinstance(item, Exception):
+                        if running:
+                            continue
+                        if self.try_launch():
+                            running += 1
+                            hedge_at = None
+                            self.stats['failed_over'] = True
+                            continue
+                    if isinstance(item, Exception):
+                        raise item
+                    return
+
+                if self.winner is None:
+                    self.winner = attempt
+                    for other in self.attempts:
+                        if other is not attempt:
+                            other.cancel()
+                    self.stats.update({
+                        'endpoint': attempt.endpoint.url,
+                        'connect_time': attempt.connect_time,
+                        'hedge_won': attempt is not primary
+                    })
+                yield item
+        finally:
+            # Covers the caller abandoning the stream as well as losing attempts
+            for attempt in self.attempts:
+                attempt.cancel()
+
+    def cancel(self):
+        """Abandon the request from another thread; chunks() then ends without an error"""
+        self.cancelled = True
+        for attempt in list(self.attempts):
+            attempt.cancel()
+        self.events.put((None, None))
+
+# One pool per endpoint list, shared by every session in the process
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(urls, **client_settings):
+    """Return the shared pool for a list of endpoint URLs"""
+    key = (tuple(urls), tuple(sorted(client_settings.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = EndpointPool(urls, client_settings)
+            _pools[key] = pool
+        return pool
@@ -0,0 +1,145 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import deque
+from resilience import percentile
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "generation_profiles.json")
+
+class GenerationProfile:
+    """Answer length and context budget for one kind of question
+
+    num_predict caps the answer; num_ctx is the context the prompt may use
+    (history is trimmed to fit it); stop ends a generation that starts
+    writing the next turn itself. questions is a pattern for the kind of
+    question the profile answers; min_score picks it by planning score instead.
+    """
+    def __init__(self, name, num_predict, num_ctx, stop=(), min_score=None, questions=None, min_predict=64,
+                 max_predict=2048, description="", window=200):
+        self.name = name
+        self.num_predict = num_predict
+        self.num_ctx = num_ctx
+        self.stop = list(stop)
+        self.min_score = min_score
+        self.questions = re.compile(questions, re.IGNORECASE) if questions else None
+        self.min_predict = min_predict
+        self.max_predict = max_predict
+        self.description = description
+        self.lengths = deque(maxlen=window)
+        self.truncated = deque(maxlen=window)
+
+class GenerationProfiles:
+    """Named generation profiles whose num_predict follows the answers they actually produce
+
+    Once a profile has min_samples answers, num_predict becomes the
+    percentile length of the answers that finished on their own times
+    headroom, within [min_predict, max_predict]. Occasional runaway answers
+    are cut off without moving the cap; if more answers are cut than the
+    percentile allows, the cap is too tight and grows by headroom instead.
+    """
+    def __init__(self, profiles, percentile=90, headroom=1.25, min_samples=20, default=None):
+        self.profiles = {profile.name: profile for profile in profiles}
+        # Answers questions no profile's pattern or score picks
+        self.default = self.profiles[default] if default else profiles[0]
+        self.percentile = percentile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+        # Scored profiles from the highest min_score down
+        self.by_score = sorted((profile for profile in profiles if profile.min_score is not None),
+                               key=lambda profile: profile.min_score, reverse=True)
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_PATH):
+        """Load the profiles from a JSON data file"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        profiles = [GenerationProfile(name, **settings) for name, settings in data["profiles"].items()]
+        return cls(profiles, data.get("percentile", 90), data.get("headroom", 1.25), data.get("min_samples", 20),
+                   data.get("default"))
+
+    def select(self, question, score, planned=False):
+        """Profile for a question's type, given its planning score (see model_router.QuestionClassifier)
+
+        Itineraries and budgets are recognized by score (min_score), other
+        questions by the first profile whose questions pattern matches, in
+        file order, falling back to the default profile. A question with a
+        computed plan gets the "planned" profile unless its type has a
+        smaller cap: a plan shortens the answer, it never needs a longer one.
+        """
+        typed = next((profile for profile in self.by_score if score >= profile.min_score), None)
+        if typed is None:
+            typed = next((profile for profile in self.profiles.values()
+                          if profile.questions and profile.questions.search(question)), self.default)
+        planned_profile = self.profiles.get("planned") if planned else None
+        if planned_profile and self.num_predict(planned_profile) < self.num_predict(typed):
+            return planned_profile
+        return typed
+
+    def num_predict(self, profile):
+        """Current answer cap for a profile"""
+        with self.lock:
+            lengths = list(profile.lengths)
+            truncated = list(profile.truncated)
+        if len(lengths) < self.min_samples:
+            return profile.num_predict
+        complete = [length for length, cut in zip(lengths, truncated) if not cut]
+        if not complete or sum(truncated) / len(lengths) > 1 - self.percentile / 100:
+            # Cut answers stopped at the cap they were given
+            adapted = math.ceil(max(lengths) * self.headroom)
+        else:
+            adapted = math.ceil(percentile(complete, self.percentile) * self.headroom)
+        return max(profile.min_predict, min(profile.max_predict, adapted))
+
+    def expected_tokens(self, profile):
+        """Typical answer length for a profile: the median complete answer, None before min_samples answers"""
+        with self.lock:
+            if len(profile.lengths) < self.min_samples:
+                return None
+            complete = [length for length, cut in zip(profile.lengths, profile.truncated) if not cut]
+        return percentile(complete, 50)
+
+    def options(self, profile):
+        """Ollama options for a profile: num_predict and stop"""
+        options = {"num_predict": self.num_predict(profile)}
+        if profile.stop:
+            options["stop"] = profile.stop
+        return options
+
+    def observe(self, profile, eval_count, num_predict, done_reason=None):
+        """Record one finished answer; returns True if it was cut off at num_predict"""
+        truncated = done_reason == "length" or (num_predict is not None and eval_count >= num_predict)
+        with self.lock:
+            profile.lengths.append(eval_count)
+            profile.truncated.append(truncated)
+        return truncated
+
+    def summary(self):
+        """Per-profile answer count, current cap, observed percentile length and truncation rate"""
+        rows = []
+        for profile in self.profiles.values():
+            with self.lock:
+                lengths = list(profile.lengths)
+                truncated = sum(profile.truncated)
+            rows.append({
+                "profile": profile.name,
+                "answers": len(lengths),
+                "num_predict": self.num_predict(profile),
+                "num_ctx": profile.num_ctx,
+                f"p{self.percentile}_tokens": percentile(lengths, self.percentile),
+                "truncated": truncated / len(lengths) if lengths else 0
+            })
+        return rows
+
+_profiles = None
+_profiles_lock = threading.Lock()
+
+def get_generation_profiles():
+    """Return the process-wide generation profiles"""
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            _profiles = GenerationProfiles.from_file()
+        return _profiles
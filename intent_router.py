@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from tokenizer import tokenize as tokenize_words
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "intents.json")
+
+def tokenize(text):
+    """Lowercase word tokens with naive plural folding (stopwords are kept for phrases)"""
+    return tuple(tokenize_words(text, stopwords=(), hyphenated=True))
+
+class IntentRouter:
+    """Precompiled multi-pattern intent matcher with confidence scoring
+
+    Every phrase and keyword of every intent is compiled once into a single
+    table keyed by its token sequence. Matching looks up each n-gram of the
+    question (n up to the longest pattern), so the cost depends on the length
+    of the question, not on how many intents are loaded.
+    """
+    def __init__(self, intents, fallback="", threshold=0.3, phrase_weight=2.0):
+        self.intents = intents
+        self.fallback = fallback
+        self.threshold = threshold
+        self.patterns = defaultdict(list)
+        self.max_pattern_length = 1
+
+        for intent_id, intent in enumerate(intents):
+            # Whole phrases are stronger evidence than single keywords
+            for phrase in intent.get("phrases", []):
+                tokens = tokenize(phrase)
+                self.add_pattern(tokens, intent_id, phrase_weight + len(tokens))
+            for keyword in intent.get("keywords", []):
+                self.add_pattern(tokenize(keyword), intent_id, 1.0)
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_PATH, **settings):
+        """Load intents from a JSON data file"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["intents"], data.get("fallback", ""), **settings)
+
+    def add_pattern(self, tokens, intent_id, weight):
+        """Register a token sequence as evidence for an intent"""
+        if not tokens:
+            return
+        # Keep the strongest weight if an intent lists the same pattern twice
+        for index, (existing_id, existing_weight) in enumerate(self.patterns[tokens]):
+            if existing_id == intent_id:
+                self.patterns[tokens][index] = (intent_id, max(weight, existing_weight))
+                return
+        self.patterns[tokens].append((intent_id, weight))
+        self.max_pattern_length = max(self.max_pattern_length, len(tokens))
+
+    def score(self, question):
+        """Score every intent in one pass; returns {intent_id: score}"""
+        tokens = tokenize(question)
+        scores = defaultdict(float)
+        seen = set()
+        for start in range(len(tokens)):
+            for length in range(1, min(self.max_pattern_length, len(tokens) - start) + 1):
+                ngram = tokens[start:start + length]
+                if ngram in seen:
+                    continue
+                matches = self.patterns.get(ngram)
+                if matches:
+                    seen.add(ngram)
+                    for intent_id, weight in matches:
+                        scores[intent_id] += weight
+        return scores
+
+    def match(self, question):
+        """Return (intent, confidence) for the best intent, or (None, 0.0)"""
+        scores = self.score(question)
+        if not scores:
+            return None, 0.0
+        # Highest score wins; earlier intents win ties
+        intent_id = max(scores, key=lambda i: (scores[i], -i))
+        score = scores[intent_id]
+        confidence = score / (score + 2.0)
+        if confidence < self.threshold:
+            return None, confidence
+        return self.intents[intent_id], confidence
+
+    def respond(self, question):
+        """Canned response for a question, or the fallback text"""
+        intent, _ = self.match(question)
+        if intent is None:
+            return self.fallback.replace("{question}", question)
+        return intent["response"]
+
+# Compiled once per process and shared by every session
+_routers = {}
+_routers_lock = threading.Lock()
+
+def get_intent_router(path=DEFAULT_PATH):
+    """Return the shared router for an intents file"""
+    with _routers_lock:
+        router = _routers.get(path)
+        if router is None:
+            router = IntentRouter.from_file(path)
+            _routers[path] = router
+        return router
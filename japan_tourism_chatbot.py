@@ -1,131 +1,136 @@
-import requests
-import json
-import streamlit as st
-from datetime import datetime
 import time
+import uuid
+from collections import deque
+from contextlib import closing
+from statistics import median
+import streamlit as st
+from chatbot_engine import (
+    JapanTourismChatbot, QUICK_QUESTIONS, OLLAMA_URLS,
+    RESPONSE_CACHE_PATH, METRICS_PATH, REQUEST_LOG_PATH
+)
+from prewarm import start_prewarm, stop_prewarm
+from transcript_store import get_transcript_store
+from model_router import POLICIES
 
-class JapanTourismChatbot:
-    def __init__(self, ollama_url="http://localhost:11434", model="llama2"):
-        self.ollama_url = ollama_url
-        self.model = model
-        self.conversation_history = []
-        
-        # Japan tourism knowledge base
-        self.tourism_context = """
-        You are a helpful Japan tourism assistant with extensive knowledge about:
-        
-        DESTINATIONS:
-        - Tokyo: Shibuya, Harajuku, Asakusa, Ginza, Akihabara, Tokyo Skytree, Imperial Palace
-        - Kyoto: Fushimi Inari, Kiyomizu-dera, Arashiyama Bamboo Grove, Gion District
-        - Osaka: Osaka Castle, Dotonbori, Universal Studios Japan, Kuromon Market
-        - Hiroshima: Peace Memorial Park, Miyajima Island, Itsukushima Shrine
-        - Nara: Todai-ji Temple, Nara Park, Kasuga Taisha Shrine
-        - Mount Fuji: Kawaguchi Lake, Hakone, climbing seasons
-        - Nikko: Toshogu Shrine, Lake Chuzenji, Kegon Falls
-        
-        TRANSPORTATION:
-        - JR Pass types and costs
-        - Shinkansen (bullet train) routes and reservations
-        - Local trains and subway systems
-        - IC cards (Suica, Pasmo)
-        - Bus systems and highway buses
-        
-        ACCOMMODATION:
-        - Ryokan (traditional inns) vs hotels
-        - Capsule hotels, business hotels
-        - Booking platforms and etiquette
-        - Peak seasons and pricing
-        
-        FOOD & CULTURE:
-        - Sushi, ramen, tempura, kaiseki dining
-        - Restaurant etiquette and customs
-        - Food markets and street food
-        - Seasonal specialties
-        
-        PRACTICAL INFO:
-        - Visa requirements for different countries
-        - Currency (Yen) and payment methods
-        - Language tips and useful phrases
-        - Cultural etiquette and customs
-        - Best times to visit (seasons, festivals)
-        - Weather patterns throughout the year
-        
-        Always provide specific, actionable advice with costs when possible.
-        Be enthusiastic but informative about Japan's unique culture and attractions.
-        """
+TRANSCRIPT_PATH = ".cache/transcripts.db"
+
+# Messages kept in session state and rendered on each rerun; older ones stay
+# in the transcript store and are paged in on request
+MESSAGE_WINDOW = 20
+PAGE_SIZE = 20
+
+def open_transcript(store, transcript_id):
+    """Make transcript_id the session's transcript and load its recent messages"""
+    # The ID lives in the URL so a reload or server restart resumes it
+    st.query_params["session"] = transcript_id
+    st.session_state.transcript_id = transcript_id
+    st.session_state.messages = store.recent(transcript_id, MESSAGE_WINDOW)
+    st.session_state.earlier_pages = 0
     
-    def check_ollama_connection(self):
-        """Check if Ollama is running and accessible"""
-        try:
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
-            return response.status_code == 200
-        except requests.RequestException:
-            return False
+    # Give the model the restored turns as conversation history
+    messages = st.session_state.messages
+    for question, answer in zip(messages, messages[1:]):
+        if question["role"] == "user" and answer["role"] == "assistant":
+            st.session_state.chatbot.add_to_history(question["content"], answer["content"])
+
+def remember_message(store, role, content, stats=None):
+    """Persist a message and keep only the last MESSAGE_WINDOW in session state"""
+    message = store.append(st.session_state.transcript_id, role, content, stats)
+    st.session_state.messages = (st.session_state.messages + [message])[-MESSAGE_WINDOW:]
+    st.session_state.live_messages.append(message)
+    st.session_state.earlier_pages = 0
+
+def show_earlier_messages():
+    """Page one more batch of older messages into view"""
+    st.session_state.earlier_pages += 1
+
+def clear_chat(store):
+    """Start a new transcript; the old one stays in the store"""
+    st.session_state.chatbot.reset_conversation()
+    open_transcript(store, uuid.uuid4().hex)
+
+def ask_question(question):
+    """Button callback: ask a question on the next run of chat_turns"""
+    st.session_state.current_question = question
+
+def render_message(chatbot, message):
+    """Show one chat message with its stats caption"""
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"])
+        if message.get("stats"):
+            st.caption(chatbot.format_stats(message["stats"]))
+
+def record_render_time(scope, seconds):
+    """Keep recent server-side render times for a "full" run or a "chat" turn"""
+    if 'render_times' not in st.session_state:
+        st.session_state.render_times = {"full": deque(maxlen=50), "chat": deque(maxlen=50)}
+    st.session_state.render_times[scope].append(seconds)
+
+@st.fragment
+def chat_turns(store):
+    """Chat input and the turns since the last full run; reruns on its own for each turn"""
+    start = time.perf_counter()
+    stream_time = 0
+    chatbot = st.session_state.chatbot
+    for message in st.session_state.live_messages:
+        render_message(chatbot, message)
     
-    def get_available_models(self):
-        """Get list of available models from Ollama"""
-        try:
-            response = requests.get(f"{self.ollama_url}/api/tags")
-            if response.status_code == 200:
-                models = response.json()
-                return [model['name'] for model in models.get('models', [])]
-        except requests.RequestException:
-            pass
-        return []
+    # The new turn goes above the input box, which must render on every run
+    turn_area = st.container()
+    user_input = st.chat_input("Ask me anything about traveling to Japan...")
+    # Quick topics are asked through the same path as typed questions
+    if 'current_question' in st.session_state:
+        user_input = st.session_state.current_question
+        del st.session_state.current_question
     
-    def generate_response(self, user_input):
-        """Generate response using Ollama"""
-        # Prepare the prompt with tourism context
-        full_prompt = f"{self.tourism_context}\n\nUser Question: {user_input}\n\nResponse:"
-        
-        # Add conversation history for context
-        if self.conversation_history:
-            history_text = "\n".join([
-                f"User: {item['user']}\nAssistant: {item['assistant']}" 
-                for item in self.conversation_history[-3:]  # Last 3 exchanges
-            ])
-            full_prompt = f"{self.tourism_context}\n\nConversation History:\n{history_text}\n\nUser Question: {user_input}\n\nResponse:"
-        
-        payload = {
-            "model": self.model,
-            "prompt": full_prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "max_tokens": 500
-            }
-        }
-        
-        try:
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
-                json=payload,
-                timeout=30
-            )
+    if user_input:
+        with turn_area:
+            # Add user message to chat history
+            remember_message(store, "user", user_input)
+            with st.chat_message("user"):
+                st.markdown(user_input)
             
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('response', 'Sorry, I could not generate a response.')
-            else:
-                return f"Error: {response.status_code} - {response.text}"
-                
-        except requests.RequestException as e:
-            return f"Connection error: {str(e)}"
+            # Stream assistant response token by token
+            with st.chat_message("assistant"):
+                placeholder = st.empty()
+                placeholder.markdown("Thinking...")
+                response = ""
+                def show_queue(position, estimated_wait):
+                    placeholder.markdown(f"⏳ Busy right now - you are #{position} in line (about {estimated_wait:.0f}s)")
+            
+                stream_start = time.perf_counter()
+                # A click or closed tab interrupts this run at the next
+                # placeholder update; closing the stream then cancels the generation
+                with closing(chatbot.generate_response_stream(user_input, on_wait=show_queue)) as stream:
+                    for token in stream:
+                        response += token
+                        placeholder.markdown(response + "▌")
+                stream_time = time.perf_counter() - stream_start
+                if not response:
+                    response = 'Sorry, I could not generate a response.'
+                placeholder.markdown(response)
+                stats = chatbot.last_stats
+                if stats:
+                    st.caption(chatbot.format_stats(stats))
+            
+            # Add assistant response to chat history
+            remember_message(store, "assistant", response, stats)
+            chatbot.add_to_history(user_input, response)
+            
+            # Suggested follow-ups are answered in the background while the user reads
+            for index, question in enumerate(chatbot.prefetch_follow_ups()):
+                st.button(f"💬 {question}", key=f"follow_up_{index}", on_click=ask_question, args=(question,))
     
-    def add_to_history(self, user_input, assistant_response):
-        """Add exchange to conversation history"""
-        self.conversation_history.append({
-            'user': user_input,
-            'assistant': assistant_response,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        # Keep only last 10 exchanges to manage memory
-        if len(self.conversation_history) > 10:
-            self.conversation_history = self.conversation_history[-10:]
+    # Render time excludes waiting for the model
+    st.session_state.stream_time = stream_time
+    record_render_time("chat", time.perf_counter() - start - stream_time)
+    
+    # Fold a long run of turns back into the bounded history view
+    if len(st.session_state.live_messages) >= MESSAGE_WINDOW:
+        st.rerun()
 
 def main():
+    run_start = time.perf_counter()
     st.set_page_config(
         page_title="Japan Tourism Assistant", 
         page_icon="🗾",
@@ -137,10 +142,20 @@ def main():
     
     # Initialize chatbot
     if 'chatbot' not in st.session_state:
-        st.session_state.chatbot = JapanTourismChatbot()
+        st.session_state.chatbot = JapanTourismChatbot(
+            OLLAMA_URLS,
+            response_cache_path=RESPONSE_CACHE_PATH,
+            metrics_path=METRICS_PATH,
+            request_log_path=REQUEST_LOG_PATH
+        )
     
-    if 'messages' not in st.session_state:
-        st.session_state.messages = []
+    store = get_transcript_store(TRANSCRIPT_PATH)
+    if 'transcript_id' not in st.session_state:
+        open_transcript(store, st.query_params.get("session") or uuid.uuid4().hex)
+    
+    # A full run renders every stored message in the window below; only turns
+    # added by chat_turns after it are rendered by the fragment
+    st.session_state.live_messages = []
     
     # Sidebar for configuration
     with st.sidebar:
@@ -159,27 +174,125 @@ def main():
                     index=0 if available_models else 0
                 )
                 st.session_state.chatbot.model = selected_model
+                
+                # Simple factual questions can go to a smaller, faster model
+                router = st.session_state.chatbot.router
+                fast_options = ["(none)"] + [model for model in available_models if model != selected_model]
+                fast_model = st.selectbox(
+                    "Fast Model for Simple Questions:",
+                    fast_options,
+                    index=fast_options.index(router.small_model) if router.small_model in fast_options else 0,
+                    help="Short factual questions go here; itineraries and budgets stay on the selected model"
+                )
+                router.small_model = None if fast_model == "(none)" else fast_model
+                if router.small_model:
+                    policies = list(POLICIES)
+                    router.policy = st.selectbox(
+                        "Routing Policy:",
+                        policies,
+                        index=policies.index(router.policy),
+                        help="quality sends more questions to the selected model, speed more to the fast one"
+                    )
+                    routing = router.stats.summary()
+                    if routing['requests']:
+                        caption = f"🧭 {routing['small']['share']:.0%} of answers from the fast model"
+                        if routing['seconds_saved_per_small'] is not None:
+                            caption += f" · ~{routing['seconds_saved_per_small']:.1f}s saved each"
+                        st.caption(caption)
+                
+                # Load the model and precompute quick answers once per process
+                ollama_url = st.session_state.chatbot.ollama_url
+                previous_model = st.session_state.get('prewarm_model')
+                if previous_model and previous_model != selected_model:
+                    # A session still using the old model restarts its prewarmer on its next run
+                    stop_prewarm(ollama_url, previous_model)
+                st.session_state.prewarm_model = selected_model
+                prewarmer = start_prewarm(
+                    lambda: JapanTourismChatbot(ollama_url, selected_model, response_cache_path=RESPONSE_CACHE_PATH),
+                    ollama_url, selected_model, QUICK_QUESTIONS
+                )
+                warm = prewarmer.status
+                if warm['state'] == "ready":
+                    st.caption(f"🔥 Model warm · {warm['ready']}/{warm['total']} quick answers ready")
+                else:
+                    st.caption(f"🔥 Warming up: {warm['state']} ({warm['ready']}/{warm['total']})")
+                
+                prompt_modes = ["chat", "context", "generate"]
+                st.session_state.chatbot.prompt_mode = st.selectbox(
+                    "Prompt Mode:",
+                    prompt_modes,
+                    index=prompt_modes.index(st.session_state.chatbot.prompt_mode),
+                    help="chat/context let Ollama reuse the cached tourism context instead of re-evaluating it every turn"
+                )
+                savings = st.session_state.chatbot.prompt_savings
+                if savings['tokens']:
+                    st.caption(f"♻️ ~{savings['tokens']} prompt tokens reused ({savings['seconds']:.1f}s saved)")
+                
+                cache = st.session_state.chatbot.response_cache
+                if cache.stats['lookups']:
+                    st.caption(
+                        f"⚡ Cache hit rate {cache.hit_rate():.0%} "
+                        f"({cache.stats['hits']}/{cache.stats['lookups']}) · "
+                        f"{cache.stats['seconds_saved']:.0f}s saved"
+                    )
+                
+                st.session_state.chatbot.prefetch = st.checkbox(
+                    "🔮 Prefetch likely follow-ups",
+                    value=st.session_state.chatbot.prefetch,
+                    help="Suggests follow-up questions and answers them while the server is idle, using spare compute"
+                )
+                prefetch = st.session_state.chatbot.prefetcher.summary()
+                if prefetch['predicted']:
+                    caption = (f"🔮 {prefetch['hits']}/{prefetch['prefetched']} prefetched answers used · "
+                               f"{prefetch['seconds']:.0f}s compute, {prefetch['tokens']} tokens")
+                    if prefetch['preempted']:
+                        caption += f" · {prefetch['preempted']} preempted"
+                    st.caption(caption)
             else:
                 st.warning("No models found. Please pull a model first.")
         else:
             st.error("❌ Ollama not connected")
-            st.info("Make sure Ollama is running on http://localhost:11434")
+            st.info(f"Make sure Ollama is running on {st.session_state.chatbot.ollama_url}")
+        
+        endpoints = st.session_state.chatbot.pool.snapshot()
+        if len(endpoints) > 1:
+            for endpoint in endpoints:
+                icon = "🟢" if endpoint['healthy'] else ("⏸️" if endpoint['circuit'] != "closed" else "🔴")
+                latency = f" · p95 TTFT {endpoint['ttft_p95']:.1f}s" if endpoint['ttft_p95'] is not None else ""
+                st.caption(f"{icon} {endpoint['url']} · {endpoint['outstanding']} active{latency}")
+        
+        load = st.session_state.chatbot.scheduler.snapshot()
+        st.caption(f"🚦 {load['running']}/{load['max_concurrency']} generating · {load['queued']} waiting")
+        
+        if st.checkbox("📊 Show performance metrics"):
+            metrics_rows = st.session_state.chatbot.metrics.summary()
+            if metrics_rows:
+                st.table(metrics_rows)
+                st.caption(f"Exported to {METRICS_PATH} and {REQUEST_LOG_PATH}")
+            else:
+                st.caption("No requests yet")
+            totals = st.session_state.chatbot.metrics.totals()
+            cancelled = totals['requests'].get('cancelled')
+            if cancelled:
+                # Estimated from typical answer lengths once enough answers were seen
+                spared = totals['tokens'].get('cancelled_tokens')
+                st.caption(f"🛑 {cancelled} superseded answers cancelled"
+                           + (f" · ~{spared} tokens not generated" if spared else ""))
+            profiles = st.session_state.chatbot.profiles
+            if profiles and metrics_rows:
+                # Answer caps adapt from these observed lengths
+                st.table(profiles.summary())
+            render_times = st.session_state.get('render_times')
+            if render_times and render_times['chat']:
+                st.caption(
+                    f"🖥️ Render p50: full run {median(render_times['full'] or [0]) * 1000:.0f} ms · "
+                    f"chat turn {median(render_times['chat']) * 1000:.0f} ms"
+                )
         
         st.markdown("---")
         st.header("🎌 Quick Topics")
         
-        quick_questions = [
-            "Plan a 7-day Tokyo itinerary",
-            "Best time to visit Japan?",
-            "How to use JR Pass?",
-            "Traditional Japanese food to try",
-            "Cherry blossom viewing spots",
-            "Cultural etiquette tips",
-            "Budget for 2 weeks in Japan",
-            "Day trip from Tokyo"
-        ]
-        
-        for question in quick_questions:
+        for question in QUICK_QUESTIONS:
             if st.button(question, key=question):
                 st.session_state.current_question = question
     
@@ -187,36 +300,24 @@ def main():
     col1, col2 = st.columns([3, 1])
     
     with col1:
-        # Display chat messages
-        for message in st.session_state.messages:
-            with st.chat_message(message["role"]):
-                st.markdown(message["content"])
+        # Older messages are read from the store only while the user asks for them
+        messages = st.session_state.messages
+        earlier = []
+        if messages:
+            oldest_id = messages[0]["id"]
+            if st.session_state.earlier_pages:
+                earlier = store.recent(st.session_state.transcript_id,
+                                       st.session_state.earlier_pages * PAGE_SIZE, before_id=oldest_id)
+            hidden = store.count(st.session_state.transcript_id, before_id=oldest_id) - len(earlier)
+            if hidden > 0:
+                st.button(f"⬆️ Load earlier messages ({hidden} more)", on_click=show_earlier_messages)
         
-        # Handle quick questions
-        if 'current_question' in st.session_state:
-            user_input = st.session_state.current_question
-            del st.session_state.current_question
-        else:
-            user_input = st.chat_input("Ask me anything about traveling to Japan...")
+        # Display chat messages
+        for message in earlier + messages:
+            render_message(st.session_state.chatbot, message)
         
-        if user_input:
-            # Add user message to chat history
-            st.session_state.messages.append({"role": "user", "content": user_input})
-            with st.chat_message("user"):
-                st.markdown(user_input)
-            
-            # Generate and display assistant response
-            with st.chat_message("assistant"):
-                with st.spinner("Thinking..."):
-                    response = st.session_state.chatbot.generate_response(user_input)
-                st.markdown(response)
-            
-            # Add assistant response to chat history
-            st.session_state.messages.append({"role": "assistant", "content": response})
-            st.session_state.chatbot.add_to_history(user_input, response)
-            
-            # Rerun to clear input
-            st.rerun()
+        # New turns rerun only this region, not the sidebar, history or tips
+        chat_turns(store)
     
     with col2:
         st.header("📱 Travel Tips")
@@ -236,10 +337,9 @@ def main():
             st.info(tip)
         
         # Clear chat button
-        if st.button("🗑️ Clear Chat", type="secondary"):
-            st.session_state.messages = []
-            st.session_state.chatbot.conversation_history = []
-            st.rerun()
+        st.button("🗑️ Clear Chat", type="secondary", on_click=clear_chat, args=(store,))
+    
+    record_render_time("full", time.perf_counter() - run_start - st.session_state.stream_time)
 
 if __name__ == "__main__":
     # Check if running as Streamlit app
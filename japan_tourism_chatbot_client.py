@@ -0,0 +1,105 @@
+import time
+import uuid
+import requests
+import streamlit as st
+from chat_client import ChatAPIClient, CHAT_API_URL
+from japan_tourism_chatbot import (
+    TRANSCRIPT_PATH, PAGE_SIZE, open_transcript, show_earlier_messages,
+    clear_chat, render_message, chat_turns, record_render_time
+)
+from transcript_store import get_transcript_store
+
+# Thin client: the chatbot runs in chat_api.py (CHAT_API_URL) and this app
+# only renders the conversation, so many Streamlit users share one engine
+
+def main():
+    run_start = time.perf_counter()
+    st.set_page_config(
+        page_title="Japan Tourism Assistant",
+        page_icon="🗾",
+        layout="wide"
+    )
+
+    st.title("🗾 Japan Tourism Assistant")
+    st.subheader("Your AI guide to exploring Japan with Ollama")
+
+    if 'chatbot' not in st.session_state:
+        try:
+            st.session_state.chatbot = ChatAPIClient(CHAT_API_URL)
+        except requests.RequestException:
+            st.error(f"❌ Chat service not reachable at {CHAT_API_URL}")
+            st.info("Start it with: python chat_api.py --port 8000")
+            st.stop()
+    chatbot = st.session_state.chatbot
+
+    store = get_transcript_store(TRANSCRIPT_PATH)
+    if 'transcript_id' not in st.session_state:
+        open_transcript(store, st.query_params.get("session") or uuid.uuid4().hex)
+    st.session_state.live_messages = []
+
+    with st.sidebar:
+        st.header("⚙️ Configuration")
+
+        health = chatbot.health()
+        if health['status'] == "unreachable":
+            st.error(f"❌ Chat service not reachable at {CHAT_API_URL}")
+            quick_questions = []
+        else:
+            if health['status'] == "ok":
+                st.success("✅ Chat service and Ollama connected")
+            else:
+                st.warning("⚠️ Chat service up, Ollama not connected")
+
+            catalog = chatbot.models()
+            quick_questions = catalog['quick_questions']
+            if catalog['models']:
+                models = catalog['models']
+                current = chatbot.settings.get('model') or catalog['default']
+                selected_model = st.selectbox(
+                    "Select Model:",
+                    models,
+                    index=models.index(current) if current in models else 0
+                )
+                prefetch = st.checkbox(
+                    "🔮 Prefetch likely follow-ups",
+                    value=chatbot.settings.get('prefetch', False),
+                    help="Suggests follow-up questions and answers them while the server is idle, using spare compute"
+                )
+                chatbot.configure(model=selected_model, prefetch=prefetch)
+            else:
+                st.warning("No models found. Please pull a model first.")
+
+            load = health['scheduler']
+            st.caption(f"🚦 {load['running']}/{load['max_concurrency']} generating · {load['queued']} waiting")
+            st.caption(f"👥 {health['sessions']} sessions · {health['open_connections']} open connections")
+
+        st.markdown("---")
+        st.header("🎌 Quick Topics")
+
+        for question in quick_questions:
+            if st.button(question, key=question):
+                st.session_state.current_question = question
+
+        st.button("🗑️ Clear Chat", type="secondary", on_click=clear_chat, args=(store,))
+
+    # Older messages are read from the store only while the user asks for them
+    messages = st.session_state.messages
+    earlier = []
+    if messages:
+        oldest_id = messages[0]["id"]
+        if st.session_state.earlier_pages:
+            earlier = store.recent(st.session_state.transcript_id,
+                                   st.session_state.earlier_pages * PAGE_SIZE, before_id=oldest_id)
+        hidden = store.count(st.session_state.transcript_id, before_id=oldest_id) - len(earlier)
+        if hidden > 0:
+            st.button(f"⬆️ Load earlier messages ({hidden} more)", on_click=show_earlier_messages)
+
+    for message in earlier + messages:
+        render_message(chatbot, message)
+
+    chat_turns(store)
+
+    record_render_time("full", time.perf_counter() - run_start - st.session_state.stream_time)
+
+if __name__ == "__main__":
+    main()
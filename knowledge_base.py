@@ -0,0 +1,82 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import Counter, defaultdict
+from tokenizer import tokenize
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "knowledge_base.json")
+
+class KnowledgeBase:
+    """Chunked Japan tourism knowledge with an in-process BM25 index"""
+    def __init__(self, path=DEFAULT_PATH, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = json.loads(raw)
+        self.version = hashlib.sha1(raw).hexdigest()[:12]
+        self.instructions = "\n".join(data["instructions"])
+        self.chunks = data["chunks"]
+        self.build_index()
+
+    def build_index(self):
+        """Build the inverted index, document lengths and IDF table once"""
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+        for doc_id, chunk in enumerate(self.chunks):
+            # Titles and keywords count twice so they outrank passing mentions
+            text = " ".join([chunk["title"], " ".join(chunk.get("keywords", []))] * 2 + [chunk["text"]])
+            counts = Counter(tokenize(text))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((doc_id, tf))
+
+        total_docs = len(self.chunks)
+        self.avg_length = sum(self.doc_lengths) / max(total_docs, 1)
+        self.idf = {
+            term: math.log(1 + (total_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def search(self, query, top_k=4, min_score=0.5):
+        """Return the top-k chunks for a query, best first"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [self.chunks[doc_id] for doc_id, score in ranked[:top_k] if score >= min_score]
+
+    def format_chunks(self, chunks):
+        """Render retrieved chunks as prompt text"""
+        return "\n".join(f"- {chunk['title']} ({chunk['section']}): {chunk['text']}" for chunk in chunks)
+
+    def full_context(self):
+        """The whole corpus as one block of text, grouped by section"""
+        sections = defaultdict(list)
+        for chunk in self.chunks:
+            sections[chunk["section"]].append(f"- {chunk['title']}: {chunk['text']}")
+        body = "\n\n".join(f"{section}:\n" + "\n".join(lines) for section, lines in sections.items())
+        return f"{self.instructions}\n\n{body}"
+
+# Loaded once per process and shared by every session
+_knowledge_bases = {}
+_knowledge_bases_lock = threading.Lock()
+
+def get_knowledge_base(path=DEFAULT_PATH):
+    """Return the shared knowledge base for a data file"""
+    with _knowledge_bases_lock:
+        kb = _knowledge_bases.get(path)
+        if kb is None:
+            kb = KnowledgeBase(path)
+            _knowledge_bases[path] = kb
+        return kb
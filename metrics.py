@@ -0,0 +1,206 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+# Seconds; the same buckets serve every latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+# Span name -> help text, in display order
+SPANS = {
+    "queue_time": "Time waiting for a scheduler slot",
+    "prompt_build": "Time building the prompt (retrieval, history, payload)",
+    "connect_time": "Time from sending the request to receiving response headers",
+    "ttft": "Time to first token as seen by the user",
+    "total_time": "Total request time",
+    "load_duration": "Ollama model load time",
+    "prompt_eval_duration": "Ollama prompt evaluation time",
+    "eval_duration": "Ollama token generation time"
+}
+
+TOKEN_COUNTERS = {
+    "prompt_eval_count": "Prompt tokens evaluated by Ollama",
+    "eval_count": "Tokens generated by Ollama",
+    "cancelled_tokens": "Estimated tokens Ollama did not generate because the answer was cancelled "
+                        "(median answer length minus tokens generated; counted once a profile has enough answers)"
+}
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Add one measurement"""
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-quantile (None when empty)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        for bound, cumulative in zip(self.buckets, self.counts):
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+class RequestMetrics:
+    """Aggregates per-request timing spans and exports them for monitoring"""
+    def __init__(self, prometheus_path=None, log_path=None, export_interval=5):
+        self.prometheus_path = prometheus_path
+        self.log_path = log_path
+        self.export_interval = export_interval
+        self.histograms = {}
+        self.tokens = {}
+        self.requests = {}
+        self.lock = threading.Lock()
+        self.export_lock = threading.Lock()
+        self.export_timer = None
+        self.dirty = False
+        if prometheus_path:
+            # Write the last interval's requests out on shutdown too
+            atexit.register(self.flush)
+
+    def record(self, model, outcome, stats):
+        """Record one request: outcome is ok, error, cache_hit, coalesced or cancelled"""
+        with self.lock:
+            self.requests[(model, outcome)] = self.requests.get((model, outcome), 0) + 1
+            for span in SPANS:
+                if stats.get(span) is not None:
+                    self.histograms.setdefault((model, span), Histogram()).observe(stats[span])
+            # A coalesced answer's tokens were already counted for the request that generated them
+            for counter in TOKEN_COUNTERS if outcome != "coalesced" else ():
+                if stats.get(counter):
+                    self.tokens[(model, counter)] = self.tokens.get((model, counter), 0) + stats[counter]
+
+        if self.log_path:
+            entry = {"time": time.time(), "model": model, "outcome": outcome}
+            entry.update({key: value for key, value in stats.items() if isinstance(value, (int, float, bool))})
+            with self.lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+        if self.prometheus_path:
+            self.schedule_export()
+
+    def schedule_export(self):
+        """Export at most once per interval, after the requests that changed the metrics"""
+        with self.lock:
+            self.dirty = True
+            if self.export_timer is None:
+                self.export_timer = threading.Timer(self.export_interval, self.flush)
+                self.export_timer.daemon = True
+                self.export_timer.start()
+
+    def flush(self):
+        """Write pending changes to the Prometheus file now"""
+        with self.lock:
+            if self.export_timer is not None:
+                self.export_timer.cancel()
+                self.export_timer = None
+            if not self.dirty:
+                return
+            self.dirty = False
+        try:
+            self.export_prometheus()
+        except OSError:
+            with self.lock:
+                self.dirty = True
+            raise
+
+    def summary(self):
+        """Per-span count, mean and bucketed p50/p95 across all models"""
+        with self.lock:
+            merged = {}
+            for (model, span), histogram in self.histograms.items():
+                total = merged.setdefault(span, Histogram())
+                total.count += histogram.count
+                total.sum += histogram.sum
+                total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+        rows = []
+        for span in SPANS:
+            histogram = merged.get(span)
+            if histogram and histogram.count:
+                rows.append({
+                    "span": span,
+                    "count": histogram.count,
+                    "mean_s": round(histogram.sum / histogram.count, 3),
+                    "p50_s": histogram.quantile(0.5),
+                    "p95_s": histogram.quantile(0.95)
+                })
+        return rows
+
+    def totals(self):
+        """Request counts by outcome and token counters, summed across models"""
+        with self.lock:
+            requests = {}
+            for (model, outcome), count in self.requests.items():
+                requests[outcome] = requests.get(outcome, 0) + count
+            tokens = {}
+            for (model, counter), value in self.tokens.items():
+                tokens[counter] = tokens.get(counter, 0) + value
+        return {"requests": requests, "tokens": tokens}
+
+    def to_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            lines.append("# HELP tourism_chatbot_requests_total Chat requests by outcome")
+            lines.append("# TYPE tourism_chatbot_requests_total counter")
+            for (model, outcome), count in sorted(self.requests.items()):
+                lines.append(f'tourism_chatbot_requests_total{{model="{model}",outcome="{outcome}"}} {count}')
+
+            for counter, help_text in TOKEN_COUNTERS.items():
+                name = f"tourism_chatbot_{counter}_total"
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for (model, key), value in sorted(self.tokens.items()):
+                    if key == counter:
+                        lines.append(f'{name}{{model="{model}"}} {value}')
+
+            for span, help_text in SPANS.items():
+                name = f"tourism_chatbot_{span}_seconds"
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (model, key), histogram in sorted(self.histograms.items()):
+                    if key != span:
+                        continue
+                    for bound, cumulative in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{model="{model}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{model="{model}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{model="{model}"}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{model="{model}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, path=None):
+        """Atomically write the text file (e.g. for node_exporter's textfile collector)"""
+        path = path or self.prometheus_path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with self.export_lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+
+# Shared by every session in the process
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+def get_metrics(prometheus_path=None, log_path=None):
+    """Return the process-wide metrics registry for a pair of export paths"""
+    key = (prometheus_path, log_path)
+    with _metrics_lock:
+        metrics = _metrics.get(key)
+        if metrics is None:
+            if log_path:
+                os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+            metrics = RequestMetrics(prometheus_path, log_path)
+            _metrics[key] = metrics
+        return metrics
@@ -0,0 +1,139 @@
+import re
+import threading
+from tokenizer import tokenize
+
+# Words that mark a request for a plan rather than a fact (after tokenize's plural folding)
+PLANNING_TERMS = {
+    "plan", "planning", "itinerary", "budget", "schedule", "route", "day", "week", "night",
+    "spend", "total", "compare", "combine", "split", "honeymoon", "family"
+}
+# Planning phrases tokenize would split into common words, matched on the raw text
+PLANNING_PHRASES = re.compile(r"\bfirst[\s-]+time(r)?\b", re.IGNORECASE)
+DURATION = re.compile(r"\b\d+\s*-?\s*(day|night|week)", re.IGNORECASE)
+
+# Routing policy -> planning score at which a question goes to the large model
+POLICIES = {
+    "quality": 1.0,
+    "balanced": 2.0,
+    "speed": 3.0
+}
+
+class QuestionClassifier:
+    """Cheap planning-vs-factual scorer built on the knowledge base's topic sections
+
+    A question that pulls in several sections (destinations, transportation,
+    accommodation...) or several destinations, names a duration, or uses
+    planning words needs the large model; a question about one fact does not.
+    """
+    def __init__(self, knowledge_base, top_k=4):
+        self.knowledge_base = knowledge_base
+        self.top_k = top_k
+
+    def score(self, question):
+        """Planning score of one question; 0 for a single-topic factual question"""
+        tokens = tokenize(question)
+        score = float(sum(1 for token in set(tokens) if token in PLANNING_TERMS))
+        score += len(PLANNING_PHRASES.findall(question))
+        if DURATION.search(question):
+            score += 1
+        if len(tokens) > 20:
+            score += 1
+
+        chunks = self.knowledge_base.search(question, top_k=self.top_k)
+        sections = {chunk["section"] for chunk in chunks}
+        destinations = {chunk["title"] for chunk in chunks if chunk["section"] == "DESTINATIONS"}
+        score += 0.5 * max(0, len(sections) - 1)
+        score += 0.5 * max(0, len(destinations) - 1)
+        return score
+
+    def classify(self, question, previous_question=None, threshold=POLICIES["balanced"]):
+        """Return ("small" or "large", score); follow-ups inherit half the previous question's score"""
+        score = self.score(question)
+        if previous_question:
+            score += 0.5 * self.score(previous_question)
+        return ("large" if score >= threshold else "small"), score
+
+class TierStats:
+    """Process-wide traffic split and latency per model tier"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tiers = {tier: {"requests": 0, "seconds": 0.0, "eval_count": 0, "eval_duration": 0.0}
+                      for tier in ("small", "large")}
+        self.fallbacks = 0
+
+    def record(self, tier, stats):
+        """Add one finished generation"""
+        with self.lock:
+            totals = self.tiers[tier]
+            totals["requests"] += 1
+            totals["seconds"] += stats.get('total_time', 0)
+            totals["eval_count"] += stats.get('eval_count', 0)
+            totals["eval_duration"] += stats.get('eval_duration', 0)
+
+    def record_fallback(self):
+        with self.lock:
+            self.fallbacks += 1
+
+    def summary(self):
+        """Share, mean latency and token rate per tier, plus estimated seconds saved per small-tier answer"""
+        with self.lock:
+            tiers = {tier: dict(totals) for tier, totals in self.tiers.items()}
+            fallbacks = self.fallbacks
+        total = sum(totals["requests"] for totals in tiers.values())
+        summary = {"requests": total, "fallbacks": fallbacks}
+        for tier, totals in tiers.items():
+            count = totals["requests"]
+            summary[tier] = {
+                "requests": count,
+                "share": count / total if total else 0,
+                "avg_latency": totals["seconds"] / count if count else None,
+                "tokens_per_sec": totals["eval_count"] / totals["eval_duration"] if totals["eval_duration"] else None,
+                "avg_tokens": totals["eval_count"] / count if count else 0
+            }
+
+        # The same tokens decoded at the large model's observed rate instead
+        small, large = summary["small"], summary["large"]
+        summary["seconds_saved_per_small"] = None
+        if small["tokens_per_sec"] and large["tokens_per_sec"]:
+            summary["seconds_saved_per_small"] = small["avg_tokens"] * (1 / large["tokens_per_sec"] - 1 / small["tokens_per_sec"])
+        return summary
+
+class ModelRouter:
+    """Chooses the small or large model for each question under a routing policy"""
+    def __init__(self, classifier, small_model=None, policy="balanced"):
+        self.classifier = classifier
+        self.small_model = small_model
+        self.policy = policy
+        self.stats = get_tier_stats()
+
+    def route(self, question, large_model, previous_question=None, is_available=None):
+        """Return (model, tier, score)
+
+        Without a small model or under an unknown policy everything goes to
+        the large model. If the chosen model has no healthy endpoint
+        (is_available(model) is False), the other tier is used instead.
+        """
+        threshold = POLICIES.get(self.policy)
+        if not self.small_model or self.small_model == large_model or threshold is None:
+            return large_model, "large", None
+
+        tier, score = self.classifier.classify(question, previous_question, threshold)
+        model = self.small_model if tier == "small" else large_model
+        if is_available and not is_available(model):
+            fallback_tier = "large" if tier == "small" else "small"
+            fallback_model = large_model if tier == "small" else self.small_model
+            if is_available(fallback_model):
+                self.stats.record_fallback()
+                return fallback_model, fallback_tier, score
+        return model, tier, score
+
+_tier_stats = None
+_tier_stats_lock = threading.Lock()
+
+def get_tier_stats():
+    """Return the process-wide tier statistics"""
+    global _tier_stats
+    with _tier_stats_lock:
+        if _tier_stats is None:
+            _tier_stats = TierStats()
+        return _tier_stats
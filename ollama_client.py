@@ -0,0 +1,112 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+class CachedProbe:
+    """TTL cache around a probe function, refreshed in a background thread"""
+    def __init__(self, probe, ttl=15, first_wait=5):
+        self.probe = probe
+        self.ttl = ttl
+        self.first_wait = first_wait
+        self.value = None
+        self.updated_at = 0
+        self.refreshing = False
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def get(self, default=None):
+        """Return the last-known value, starting a refresh if it is stale"""
+        with self.lock:
+            stale = time.monotonic() - self.updated_at > self.ttl
+            if stale and not self.refreshing:
+                self.refreshing = True
+                threading.Thread(target=self._refresh, daemon=True).start()
+
+        # Only the very first call has nothing to serve and has to wait
+        if not self.ready.is_set():
+            self.ready.wait(self.first_wait)
+        return self.value if self.ready.is_set() else default
+
+    def invalidate(self):
+        """Mark the cached value stale so the next get() refreshes it"""
+        with self.lock:
+            self.updated_at = 0
+
+    def _refresh(self):
+        try:
+            value = self.probe()
+            with self.lock:
+                self.value = value
+                self.updated_at = time.monotonic()
+            self.ready.set()
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+class OllamaClient:
+    """Connection-pooled, keep-alive HTTP client for one Ollama endpoint"""
+    def __init__(self, base_url, pool_size=10, connect_timeout=5, read_timeout=30, keep_alive=True,
+                 status_ttl=15):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+
+        # One session per endpoint so TCP connections are reused across calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+        # Health and model list come from the same /api/tags call
+        self.status = CachedProbe(self.fetch_status, ttl=status_ttl)
+
+    def url(self, path):
+        """Build the full URL for an API path"""
+        return f"{self.base_url}{path}"
+
+    def get(self, path, **kwargs):
+        """Send a GET request through the pooled session"""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(self.url(path), **kwargs)
+
+    def post(self, path, **kwargs):
+        """Send a POST request through the pooled session"""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(self.url(path), **kwargs)
+
+    def fetch_status(self):
+        """Probe /api/tags for connectivity and the installed models"""
+        try:
+            response = self.get("/api/tags", timeout=5)
+            if response.status_code == 200:
+                models = response.json()
+                return {"connected": True, "models": [model["name"] for model in models.get("models", [])]}
+        except (requests.RequestException, ValueError):
+            pass
+        return {"connected": False, "models": []}
+
+    def cached_status(self):
+        """Last-known endpoint status, refreshed in the background after the TTL"""
+        return self.status.get(default={"connected": False, "models": []})
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+# Process-wide registry: Streamlit re-executes the app script on every rerun,
+# but imported modules stay loaded, so clients kept here are shared by all
+# reruns and all sessions in the same process.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(base_url, pool_size=10, connect_timeout=5, read_timeout=30, keep_alive=True, status_ttl=15):
+    """Return the shared client for an endpoint, creating it on first use"""
+    key = (base_url.rstrip("/"), pool_size, connect_timeout, read_timeout, keep_alive, status_ttl)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OllamaClient(base_url, pool_size, connect_timeout, read_timeout, keep_alive, status_ttl)
+            _clients[key] = client
+        return client
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+import requests
+from endpoint_pool import HedgedRequest, NoEndpointAvailable, EndpointError
+from intent_router import get_intent_router
+from response_cache import question_vector, cosine_similarity
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "follow_ups.json")
+
+class FollowUpPredictor:
+    """Predicts the next questions from the topic of the last exchange
+
+    The topic is the intent (see intent_router) matched by the last question,
+    or by its answer when the question alone matches nothing. Each topic lists
+    its likely follow-ups, most likely first: an itinerary is followed by cost
+    and JR Pass questions, food by etiquette.
+    """
+    def __init__(self, follow_ups, default, intent_router, similarity_threshold=0.85):
+        self.follow_ups = follow_ups
+        self.default = default
+        self.intent_router = intent_router
+        self.similarity_threshold = similarity_threshold
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_PATH, **settings):
+        """Load the follow-up table from a JSON data file"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["follow_ups"], data.get("default", []), get_intent_router(), **settings)
+
+    def topic(self, turn):
+        """Intent name of one exchange, or None"""
+        intent, _ = self.intent_router.match(turn['user'])
+        if intent is None:
+            intent, _ = self.intent_router.match(turn['assistant'])
+        return intent["name"] if intent else None
+
+    def predict(self, turns, limit=2):
+        """Top follow-up questions for a conversation, skipping ones already asked"""
+        if not turns:
+            return []
+        candidates = self.follow_ups.get(self.topic(turns[-1]), []) + self.default
+        asked = [question_vector(turn['user']) for turn in turns]
+        predictions = []
+        for question in candidates:
+            vector = question_vector(question)
+            if question in predictions or any(cosine_similarity(vector, other) >= self.similarity_threshold for other in asked):
+                continue
+            predictions.append(question)
+            if len(predictions) == limit:
+                break
+        return predictions
+
+class Prefetcher:
+    """Answers predicted follow-ups in the background while the Ollama backend is idle
+
+    Prefetches never take a scheduler slot from a real request. Each one
+    starts only when the scheduler has nothing running or waiting, at most
+    max_concurrent run at once, and a running prefetch is cancelled as soon
+    as a real request is admitted or queued.
+    """
+    def __init__(self, scheduler, max_concurrent=1, idle_wait=60, poll_interval=0.1):
+        self.scheduler = scheduler
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.idle_wait = idle_wait
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.stats = {"predicted": 0, "prefetched": 0, "preempted": 0, "dropped": 0,
+                      "hits": 0, "seconds": 0.0, "tokens": 0, "seconds_saved": 0.0}
+
+    def submit(self, chatbot, questions):
+        """Prefetch answers for chatbot's current conversation on a background thread"""
+        with self.lock:
+            self.stats["predicted"] += len(questions)
+        thread = threading.Thread(target=self.run, args=(chatbot, list(questions), chatbot.conversation_fingerprint()),
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def run(self, chatbot, questions, fingerprint):
+        for index, question in enumerate(questions):
+            # Give up once the backend stays busy or the conversation has moved on
+            acquired = self.wait_for_slot()
+            try:
+                if not acquired or chatbot.conversation_fingerprint() != fingerprint:
+                    with self.lock:
+                        self.stats["dropped"] += len(questions) - index
+                    return
+                self.prefetch(chatbot, question, fingerprint)
+            finally:
+                if acquired:
+                    self.slots.release()
+
+    def wait_for_slot(self):
+        """Block until the backend is idle and a prefetch slot is free; False after idle_wait"""
+        deadline = time.monotonic() + self.idle_wait
+        while time.monotonic() < deadline:
+            if self.scheduler.is_idle() and self.slots.acquire(blocking=False):
+                return True
+            time.sleep(self.poll_interval)
+        return False
+
+    def prefetch(self, chatbot, question, fingerprint):
+        """Generate one answer into chatbot.prefetch_cache unless preempted"""
+        model, _ = chatbot.route_model(question)
+        path, payload = chatbot.build_request(question, model)
+        request = HedgedRequest(chatbot.pool, model, path, payload, hedge_percentile=None,
+                                max_attempts=1, min_timeout=chatbot.min_read_timeout)
+        preempted = threading.Event()
+        done = threading.Event()
+        threading.Thread(target=self.watch, args=(request, preempted, done, chatbot, fingerprint), daemon=True).start()
+
+        start = time.perf_counter()
+        answer = ""
+        tokens = 0
+        final = None
+        try:
+            for chunk in request.chunks():
+                if chunk.get('error'):
+                    break
+                token = chunk.get('response') or chunk.get('message', {}).get('content', '')
+                if token:
+                    answer += token
+                    tokens += 1
+                if chunk.get('done'):
+                    final = chunk
+                    break
+        except (NoEndpointAvailable, EndpointError, requests.RequestException):
+            pass
+        finally:
+            done.set()
+        seconds = time.perf_counter() - start
+
+        if final and not preempted.is_set():
+            tokens = final.get('eval_count', tokens)
+        stored = bool(final and answer) and not preempted.is_set()
+        if stored:
+            chatbot.prefetch_cache.store(model, question, fingerprint, answer, seconds)
+        with self.lock:
+            self.stats["seconds"] += seconds
+            self.stats["tokens"] += tokens
+            if stored:
+                self.stats["prefetched"] += 1
+            elif preempted.is_set():
+                self.stats["preempted"] += 1
+
+    def watch(self, request, preempted, done, chatbot, fingerprint):
+        """Cancel a running prefetch when a real request needs the backend or the conversation moves on"""
+        while not done.wait(self.poll_interval):
+            # A summary folded in meanwhile changes the prompt as well
+            if not self.scheduler.is_idle() or chatbot.conversation_fingerprint() != fingerprint:
+                preempted.set()
+                request.cancel()
+                return
+
+    def record_hit(self, seconds_saved):
+        """A question was answered from a prefetched answer"""
+        with self.lock:
+            self.stats["hits"] += 1
+            self.stats["seconds_saved"] += seconds_saved
+
+    def summary(self):
+        """Counts plus prediction hit rate and compute spent per hit"""
+        with self.lock:
+            stats = dict(self.stats)
+        stats["hit_rate"] = stats["hits"] / stats["prefetched"] if stats["prefetched"] else None
+        stats["seconds_per_hit"] = stats["seconds"] / stats["hits"] if stats["hits"] else None
+        return stats
+
+_predictor = None
+_predictor_lock = threading.Lock()
+
+def get_follow_up_predictor():
+    """Return the process-wide follow-up predictor"""
+    global _predictor
+    with _predictor_lock:
+        if _predictor is None:
+            _predictor = FollowUpPredictor.from_file()
+        return _predictor
+
+# One prefetcher per scheduler, shared by every session in the process
+_prefetchers = {}
+_prefetchers_lock = threading.Lock()
+
+def get_prefetcher(key, scheduler, max_concurrent=1):
+    """Return the shared prefetcher for an endpoint list"""
+    with _prefetchers_lock:
+        prefetcher = _prefetchers.get(key)
+        if prefetcher is None:
+            prefetcher = Prefetcher(scheduler, max_concurrent)
+            _prefetchers[key] = prefetcher
+        return prefetcher
@@ -0,0 +1,80 @@
+import threading
+import time
+
+class Prewarmer:
+    """Loads a model and pre-answers the quick questions in a background thread"""
+    def __init__(self, chatbot, questions, refresh_interval=6 * 3600):
+        self.chatbot = chatbot
+        self.questions = list(questions)
+        self.refresh_interval = refresh_interval
+        self.stop_event = threading.Event()
+        self.status = {"state": "starting", "ready": 0, "total": len(self.questions),
+                       "load_time": None, "last_run": None}
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        """Start the background thread"""
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Ask the background thread to exit, abandoning the answer it is generating"""
+        self.stop_event.set()
+        self.chatbot.cancel_generation()
+
+    def run(self):
+        refresh = False
+        while not self.stop_event.is_set():
+            self.warm(refresh)
+            if self.status["state"] == "ready":
+                # Later rounds regenerate answers so they never reach the cache TTL
+                refresh = True
+                delay = self.refresh_interval
+            else:
+                delay = 60
+            if self.stop_event.wait(delay):
+                break
+
+    def warm(self, refresh):
+        """Load the model, then answer every quick question into the response cache"""
+        self.status.update(state="loading model", ready=0)
+        try:
+            self.status["load_time"] = self.chatbot.load_model()
+        except Exception:
+            self.status["state"] = "model load failed"
+            return
+
+        self.status["state"] = "precomputing answers"
+        for question in self.questions:
+            if self.stop_event.is_set():
+                return
+            self.chatbot.reset_conversation()
+            for _ in self.chatbot.generate_response_stream(question, use_cache=not refresh):
+                pass
+            stats = self.chatbot.last_stats
+            # A cancelled answer records total_time too but leaves nothing cached
+            if (stats.get('total_time') or stats.get('cache_hit')) and not stats.get('cancelled'):
+                self.status["ready"] += 1
+
+        self.status.update(state="ready", last_run=time.time())
+
+# One prewarmer per (endpoint, model), shared by every session in the process
+_prewarmers = {}
+_prewarmers_lock = threading.Lock()
+
+def start_prewarm(chatbot_factory, ollama_url, model, questions, refresh_interval=6 * 3600):
+    """Start warming a model if it is not already being warmed; returns its Prewarmer"""
+    key = (ollama_url, model)
+    with _prewarmers_lock:
+        prewarmer = _prewarmers.get(key)
+        if prewarmer is None or prewarmer.stop_event.is_set() or not prewarmer.thread.is_alive():
+            prewarmer = Prewarmer(chatbot_factory(), questions, refresh_interval).start()
+            _prewarmers[key] = prewarmer
+        return prewarmer
+
+def stop_prewarm(ollama_url, model):
+    """Stop warming a model, so it is no longer reloaded and refreshed"""
+    with _prewarmers_lock:
+        prewarmer = _prewarmers.pop((ollama_url, model), None)
+    if prewarmer:
+        prewarmer.stop()
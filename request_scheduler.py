@@ -0,0 +1,190 @@
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+class QueueTimeout(Exception):
+    """Raised when a queued request waited longer than max_queue_age and was shed"""
+
+class Ticket:
+    """A request's place in the scheduler queue"""
+    def __init__(self, scheduler, session_id):
+        self.scheduler = scheduler
+        self.session_id = session_id
+        self.created = time.monotonic()
+        self.started = None
+        self.state = "queued"
+        self.admitted = threading.Event()
+
+    def wait(self, timeout=None):
+        """Wait up to timeout seconds for a slot; True once admitted"""
+        if self.admitted.wait(timeout):
+            if self.state == "shed":
+                raise QueueTimeout("Request waited too long in the queue")
+            return True
+        if time.monotonic() - self.created > self.scheduler.max_queue_age:
+            if self.scheduler.shed(self):
+                raise QueueTimeout("Request waited too long in the queue")
+            # Admitted just before it could be shed
+            return self.admitted.is_set()
+        return False
+
+    @property
+    def position(self):
+        """1-based position in the queue, 0 once running"""
+        return self.scheduler.position(self)
+
+    def estimated_wait(self):
+        """Estimated seconds until this request gets a slot"""
+        return self.scheduler.estimate_wait(self.position)
+
+    @property
+    def queue_time(self):
+        """Seconds spent waiting for a slot"""
+        end = self.started or time.monotonic()
+        return end - self.created
+
+    def release(self):
+        """Give the slot back (safe to call more than once)"""
+        self.scheduler.release(self)
+
+class RequestScheduler:
+    """Bounded-concurrency gate with fair round-robin ordering across sessions"""
+    def __init__(self, max_concurrency=4, max_queue_age=60):
+        self.max_concurrency = max_concurrency
+        self.max_queue_age = max_queue_age
+        self.queues = OrderedDict()
+        self.running = 0
+        self.lock = threading.Lock()
+        self.avg_service_time = 10.0
+        self.stats = {"admitted": 0, "shed": 0, "peak_queue": 0}
+
+    def submit(self, session_id):
+        """Queue a request for a session and return its ticket"""
+        ticket = Ticket(self, session_id)
+        with self.lock:
+            self.queues.setdefault(session_id, deque()).append(ticket)
+            self.dispatch()
+            self.stats["peak_queue"] = max(self.stats["peak_queue"], self.queued_count())
+        return ticket
+
+    @contextmanager
+    def slot(self, session_id, poll=0.5):
+        """Block until admitted, run the body, then release the slot"""
+        ticket = self.submit(session_id)
+        try:
+            while not ticket.wait(poll):
+                pass
+            yield ticket
+        finally:
+            ticket.release()
+
+    def dispatch(self):
+        # Caller holds the lock. Sessions take turns: one request from the
+        # session at the head, then that session moves to the back.
+        now = time.monotonic()
+        while self.running < self.max_concurrency and self.queues:
+            session_id, queue = next(iter(self.queues.items()))
+            ticket = queue.popleft()
+            if queue:
+                self.queues.move_to_end(session_id)
+            else:
+                del self.queues[session_id]
+
+            if now - ticket.created > self.max_queue_age:
+                ticket.state = "shed"
+                self.stats["shed"] += 1
+                ticket.admitted.set()
+                continue
+
+            ticket.state = "running"
+            ticket.started = now
+            self.running += 1
+            self.stats["admitted"] += 1
+            ticket.admitted.set()
+
+    def release(self, ticket):
+        """Free a running slot, or drop a ticket that is still queued"""
+        with self.lock:
+            if ticket.state == "running":
+                self.running -= 1
+                # Exponentially weighted average feeds the wait estimate
+                service_time = time.monotonic() - ticket.started
+                self.avg_service_time = 0.8 * self.avg_service_time + 0.2 * service_time
+            elif ticket.state == "queued":
+                self.remove(ticket)
+            ticket.state = "done"
+            self.dispatch()
+
+    def shed(self, ticket):
+        """Drop a ticket that has waited too long; False if it was already admitted"""
+        with self.lock:
+            if ticket.state != "queued":
+                return False
+            self.remove(ticket)
+            ticket.state = "shed"
+            self.stats["shed"] += 1
+            return True
+
+    def remove(self, ticket):
+        # Caller holds the lock
+        queue = self.queues.get(ticket.session_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self.queues[ticket.session_id]
+
+    def ordered_tickets(self):
+        # Caller holds the lock. The order dispatch() would admit tickets in.
+        queues = [list(queue) for queue in self.queues.values()]
+        order = []
+        for round_index in range(max((len(queue) for queue in queues), default=0)):
+            order.extend(queue[round_index] for queue in queues if round_index < len(queue))
+        return order
+
+    def position(self, ticket):
+        """1-based queue position of a ticket, 0 if it is not waiting"""
+        with self.lock:
+            if ticket.state != "queued":
+                return 0
+            return self.ordered_tickets().index(ticket) + 1
+
+    def estimate_wait(self, position):
+        """Seconds until a ticket at this position is admitted"""
+        if position <= 0:
+            return 0.0
+        return math.ceil(position / self.max_concurrency) * self.avg_service_time
+
+    def queued_count(self):
+        # Caller holds the lock
+        return sum(len(queue) for queue in self.queues.values())
+
+    def is_idle(self):
+        """True when nothing is running or waiting"""
+        with self.lock:
+            return self.running == 0 and not self.queues
+
+    def snapshot(self):
+        """Current load for display"""
+        with self.lock:
+            return {
+                "running": self.running,
+                "queued": self.queued_count(),
+                "max_concurrency": self.max_concurrency,
+                "avg_service_time": self.avg_service_time,
+                **self.stats
+            }
+
+# One scheduler per Ollama endpoint, shared by every session in the process
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(key, max_concurrency=4, max_queue_age=60):
+    """Return the shared scheduler for an endpoint"""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = RequestScheduler(max_concurrency, max_queue_age)
+            _schedulers[key] = scheduler
+        return scheduler
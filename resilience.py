@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import deque
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None when empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+class LatencyTracker:
+    """Recent time-to-first-token and slowest inter-token gap per request for one endpoint"""
+    def __init__(self, window=200, min_samples=10):
+        self.ttfts = deque(maxlen=window)
+        self.gaps = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+
+    def observe(self, ttft, max_gap):
+        """Record one completed generation"""
+        with self.lock:
+            self.ttfts.append(ttft)
+            self.gaps.append(max_gap)
+
+    def ttft_percentile(self, pct):
+        """TTFT percentile, or None until there are enough samples"""
+        with self.lock:
+            samples = list(self.ttfts)
+        if len(samples) < self.min_samples:
+            return None
+        return percentile(samples, pct)
+
+    def read_timeout(self, floor, ceiling, multiplier=3.0):
+        """Socket read timeout: a multiple of the slowest normal wait, within [floor, ceiling]
+
+        A streamed read waits for either the first token or the next one, so
+        the bound comes from the p99 of both.
+        """
+        with self.lock:
+            ttfts, gaps = list(self.ttfts), list(self.gaps)
+        if len(ttfts) < self.min_samples:
+            return ceiling
+        slowest = max(percentile(ttfts, 99), percentile(gaps, 99))
+        return min(ceiling, max(floor, slowest * multiplier))
+
+class CircuitBreaker:
+    """Closed until repeated failures, then open (fail fast) until a half-open trial succeeds"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def allows(self):
+        """True if a request may be sent now"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return not self.trial_running
+
+    def before_request(self):
+        """Claim a request; the first one after the cooldown is the half-open trial"""
+        with self.lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                self.trial_running = True
+
+    def record(self, ok):
+        """ok=True closes the circuit, False counts a failure, None (cancelled) gives no verdict"""
+        with self.lock:
+            if self.state == self.HALF_OPEN:
+                self.trial_running = False
+            if ok is None:
+                return
+            if ok:
+                self.state = self.CLOSED
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.failures = 0
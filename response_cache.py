@@ -0,0 +1,197 @@
+import atexit
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from tokenizer import tokenize
+
+def normalize_question(question):
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return " ".join(re.findall(r"[a-z0-9]+", question.lower()))
+
+def question_vector(question):
+    """Sparse term-frequency vector of content words, with naive plural folding"""
+    return dict(Counter(tokenize(question)))
+
+def numeric_terms(vector):
+    """Terms of a question vector containing digits"""
+    return {term for term in vector if any(char.isdigit() for char in term)}
+
+def cosine_similarity(a, b):
+    """Cosine similarity between two sparse vectors"""
+    if not a or not b:
+        return 0.0
+    dot = sum(weight * b.get(term, 0) for term, weight in a.items())
+    norm = math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values()))
+    return dot / norm
+
+class ResponseCache:
+    """LRU/TTL cache of generated answers keyed by model and normalized question
+
+    With a path, changes are written to disk at most once per save_delay
+    seconds by a background timer, and once more at exit.
+    """
+    def __init__(self, max_entries=500, ttl=24 * 3600, similarity_threshold=0.85, path=None, save_delay=2.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.path = path
+        self.save_delay = save_delay
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Serializes writers; a save never runs on the answering thread
+        self.save_lock = threading.Lock()
+        self.save_timer = None
+        self.dirty = False
+        self.stats = {"lookups": 0, "hits": 0, "seconds_saved": 0.0}
+        if path:
+            self.load()
+            atexit.register(self.flush)
+
+    def lookup(self, model, question, fingerprint):
+        """Return the cached entry for a question (or a near-duplicate), or None"""
+        key = (model, normalize_question(question))
+        vector = question_vector(question)
+        numbers = numeric_terms(vector)
+        now = time.time()
+
+        with self.lock:
+            self.stats["lookups"] += 1
+            entry = self.entries.get(key)
+            if entry is None:
+                # Fall back to the most similar question for the same model;
+                # a 10-day and a 12-day itinerary are never the same question
+                best_score = self.similarity_threshold
+                for candidate_key, candidate in self.entries.items():
+                    if candidate_key[0] != model or numeric_terms(candidate["vector"]) != numbers:
+                        continue
+                    score = cosine_similarity(vector, candidate["vector"])
+                    if score >= best_score:
+                        best_score, key, entry = score, candidate_key, candidate
+
+            if entry is None:
+                return None
+
+            # Expired, or generated with a different model/context
+            if now - entry["created"] > self.ttl or entry["fingerprint"] != fingerprint:
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            entry["hits"] += 1
+            self.stats["hits"] += 1
+            self.stats["seconds_saved"] += entry["generation_time"]
+            return entry
+
+    def store(self, model, question, fingerprint, response, generation_time):
+        """Cache a generated answer, evicting the least recently used entries"""
+        key = (model, normalize_question(question))
+        with self.lock:
+            self.entries[key] = {
+                "question": question,
+                "vector": question_vector(question),
+                "fingerprint": fingerprint,
+                "response": response,
+                "generation_time": generation_time,
+                "created": time.time(),
+                "hits": 0
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        if self.path:
+            self.schedule_save()
+
+    def clear(self):
+        """Drop every cached answer"""
+        with self.lock:
+            self.entries.clear()
+        if self.path:
+            self.schedule_save()
+
+    def hit_rate(self):
+        """Fraction of lookups answered from the cache"""
+        if not self.stats["lookups"]:
+            return 0.0
+        return self.stats["hits"] / self.stats["lookups"]
+
+    def schedule_save(self):
+        """Mark the cache changed and save it save_delay seconds after the first unsaved change"""
+        with self.lock:
+            self.dirty = True
+            if self.save_timer is not None:
+                return
+            self.save_timer = threading.Timer(self.save_delay, self.flush)
+            self.save_timer.daemon = True
+            self.save_timer.start()
+
+    def flush(self):
+        """Write pending changes now, if there are any"""
+        with self.lock:
+            self.save_timer = None
+            if not self.dirty:
+                return
+            self.dirty = False
+        try:
+            self.save()
+        except OSError:
+            # Try again with the next change
+            with self.lock:
+                self.dirty = True
+            raise
+
+    def save(self):
+        """Write the cache to disk atomically"""
+        with self.save_lock:
+            with self.lock:
+                data = [
+                    {"model": model, "key": key, **entry}
+                    for (model, key), entry in self.entries.items()
+                ]
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+
+    def load(self):
+        """Load a previously saved cache, skipping expired entries"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self.lock:
+            for item in data:
+                if now - item["created"] > self.ttl:
+                    continue
+                key = (item.pop("model"), item.pop("key"))
+                self.entries[key] = item
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+# Shared by every session in the process (see ollama_client for why this works)
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_response_cache(path=None, **settings):
+    """Return the process-wide response cache for a persistence path"""
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = ResponseCache(path=path, **settings)
+            _caches[path] = cache
+        return cache
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import threading
+
+def request_key(path, payload):
+    """Stable key for an Ollama request: endpoint path plus the full payload"""
+    body = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(f"{path}\n{body}".encode()).hexdigest()
+
+class Flight:
+    """One in-flight generation whose token stream can be shared"""
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.final = None
+        # Why the request failed, when it did
+        self.error = None
+        self.followers = 0
+        self.cond = threading.Condition()
+
+    def publish(self, token):
+        """Append a token and wake up followers"""
+        with self.cond:
+            self.tokens.append(token)
+            self.cond.notify_all()
+
+    def fail(self, message):
+        """Record why the request failed; finish() then ends the stream without a final chunk"""
+        with self.cond:
+            self.error = message
+            self.cond.notify_all()
+
+    def finish(self, final=None):
+        """Mark the stream complete; final is Ollama's last chunk, or None on failure"""
+        with self.cond:
+            self.final = final
+            self.done = True
+            self.cond.notify_all()
+
+    def follow(self):
+        """Yield every token from the start, then new ones as they arrive"""
+        index = 0
+        try:
+            while True:
+                with self.cond:
+                    while index >= len(self.tokens) and not self.done:
+                        self.cond.wait()
+                    pending = self.tokens[index:]
+                    finished = self.done
+                index += len(pending)
+                yield from pending
+                if finished and index >= len(self.tokens):
+                    return
+        finally:
+            with self.cond:
+                self.followers -= 1
+
+class SingleFlight:
+    """Deduplicates identical concurrent requests into a single flight"""
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.stats = {"flights": 0, "coalesced": 0}
+
+    def join(self, key):
+        """Return (flight, is_leader); the leader must run and finish the flight"""
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                self.stats["coalesced"] += 1
+                with flight.cond:
+                    flight.followers += 1
+                return flight, False
+            flight = Flight()
+            self.flights[key] = flight
+            self.stats["flights"] += 1
+            return flight, True
+
+    def forget(self, key, flight):
+        """Stop offering a finished flight to new requests"""
+        with self.lock:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+
+    def abandon(self, key, flight):
+        """Withdraw a flight its leader no longer wants; False if other requests still follow it"""
+        with self.lock:
+            with flight.cond:
+                if flight.followers:
+                    return False
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+            return True
+
+# Shared by every session in the process
+_single_flight = SingleFlight()
+
+def get_single_flight():
+    """Return the process-wide single-flight registry"""
+    return _single_flight
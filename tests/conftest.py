@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+from fake_ollama import FakeOllamaConfig, FakeOllamaServer
+
+@pytest.fixture
+def fake_ollama():
+    """Start fake Ollama servers with FakeOllamaConfig settings; all are stopped afterwards"""
+    servers = []
+
+    def start(**settings):
+        settings.setdefault("jitter", 0)
+        settings.setdefault("prompt_eval_rate", 1e6)
+        server = FakeOllamaServer(config=FakeOllamaConfig(**settings)).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+def wait_for(condition, timeout=3.0, interval=0.02):
+    """Poll until condition() is true; returns its last value"""
+    deadline = time.monotonic() + timeout
+    while True:
+        value = condition()
+        if value or time.monotonic() > deadline:
+            return value
+        time.sleep(interval)
@@ -0,0 +1,106 @@
+import threading
+
+from conftest import wait_for
+from chatbot_engine import JapanTourismChatbot
+from generation_profiles import GenerationProfiles
+
+def chatbot(server, **settings):
+    return JapanTourismChatbot(server.url, model="llama2", hedge_percentile=None, **settings)
+
+def test_closing_the_stream_stops_decoding(fake_ollama):
+    server = fake_ollama(token_rate=100, ttft=0, response_tokens=200)
+    bot = chatbot(server)
+    stream = bot.generate_response_stream("What is onsen etiquette?", use_cache=False)
+    for _ in zip(range(5), stream):
+        pass
+    stream.close()
+
+    assert wait_for(lambda: server.stats["cancelled_tokens"])
+    assert server.stats["cancelled_tokens"] > 150
+    assert bot.last_stats["cancelled"]
+    assert bot.scheduler.snapshot()["running"] == 0
+    assert bot.metrics.totals()["requests"]["cancelled"] >= 1
+
+def test_a_new_question_supersedes_the_running_one(fake_ollama):
+    server = fake_ollama(token_rate=100, ttft=0, response_tokens=200)
+    bot = chatbot(server)
+    old = bot.generate_response_stream("Do I need cash in Japan?", use_cache=False)
+    for _ in zip(range(5), old):
+        pass
+    answer = bot.generate_response("How do I get from Tokyo to Kyoto?", use_cache=False)
+
+    assert answer and not bot.last_stats.get('cancelled')
+    assert wait_for(lambda: server.stats["cancelled_tokens"])
+    old.close()
+    assert bot.scheduler.snapshot()["running"] == 0
+
+def test_reset_conversation_cancels_and_nothing_is_cached(fake_ollama):
+    server = fake_ollama(token_rate=100, ttft=0, response_tokens=200)
+    bot = chatbot(server)
+    question = "Guide to Kyoto temples and gardens"
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(answer=bot.generate_response(question, use_cache=False)))
+    thread.start()
+    assert wait_for(lambda: bot.generation is not None and bot.generation.tokens > 3)
+    bot.reset_conversation()
+    thread.join(3)
+
+    assert not thread.is_alive()
+    assert bot.last_stats["cancelled"]
+    assert bot.response_cache.lookup(bot.model, question, bot.context_fingerprint()) is None
+
+def test_cancel_while_queued_never_reaches_ollama(fake_ollama):
+    server = fake_ollama(token_rate=50, ttft=0, response_tokens=200)
+    busy = chatbot(server, max_concurrency=1)
+    waiting = chatbot(server, max_concurrency=1)
+    running = busy.generate_response_stream("Plan a 7-day Tokyo itinerary", use_cache=False)
+    next(running)
+
+    thread = threading.Thread(target=waiting.generate_response, args=("Best time to visit Japan?",),
+                              kwargs={"use_cache": False})
+    thread.start()
+    assert wait_for(lambda: waiting.scheduler.snapshot()["queued"] == 1)
+    assert waiting.cancel_generation()
+    thread.join(3)
+    running.close()
+
+    assert not thread.is_alive()
+    assert server.stats["requests"] == 1
+    assert wait_for(lambda: waiting.scheduler.is_idle())
+
+def test_a_shared_answer_outlives_its_leader(fake_ollama):
+    server = fake_ollama(token_rate=200, ttft=0, response_tokens=100)
+    leader, follower = chatbot(server), chatbot(server)
+    question = "Traditional Japanese food to try"
+    stream = leader.generate_response_stream(question, use_cache=False)
+    next(stream)
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(answer=follower.generate_response(question, use_cache=False)))
+    thread.start()
+    assert wait_for(lambda: leader.single_flight.flights and
+                    next(iter(leader.single_flight.flights.values())).followers)
+    stream.close()
+    thread.join(5)
+
+    assert follower.last_stats["coalesced"] and follower.last_stats["eval_count"] == 100
+    assert server.stats["cancelled_tokens"] == 0
+    assert not leader.single_flight.flights
+
+def test_spared_tokens_are_only_estimated_from_enough_answers(fake_ollama):
+    server = fake_ollama(token_rate=100, ttft=0, response_tokens=200)
+    bot = chatbot(server)
+    bot.profiles = GenerationProfiles.from_file()
+    question = "What is onsen etiquette?"
+
+    def cancel():
+        stream = bot.generate_response_stream(question, use_cache=False)
+        for _ in zip(range(5), stream):
+            pass
+        stream.close()
+        return bot.last_stats
+
+    assert "cancelled_tokens" not in cancel()
+    profile = bot.profiles.profiles[bot.last_stats["profile"]]
+    for _ in range(bot.profiles.min_samples):
+        bot.profiles.observe(profile, 80, profile.num_predict, "stop")
+    assert cancel()["cancelled_tokens"] == 80 - bot.last_stats["eval_count"]
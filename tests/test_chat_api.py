@@ -0,0 +1,109 @@
+import asyncio
+import threading
+
+import pytest
+
+from conftest import wait_for
+from chat_api import ChatService, HTTPError, read_request
+
+class Request:
+    """Empty request body for handlers called directly"""
+    def json(self):
+        return {}
+
+def dedicated_threads():
+    """Threads other than the loop's shared executor pool"""
+    return sum(1 for thread in threading.enumerate() if not thread.name.startswith("asyncio"))
+
+def service(server, **settings):
+    return ChatService(server.url, "llama2", hedge_percentile=None, **settings)
+
+async def collect(events):
+    return [event async for event in events]
+
+async def parse(raw):
+    reader = asyncio.StreamReader()
+    reader.feed_data(raw)
+    reader.feed_eof()
+    return await read_request(reader, 1)
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_invalid_content_length_is_a_bad_request(length):
+    with pytest.raises(HTTPError) as error:
+        asyncio.run(parse(f"POST /sessions HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode()))
+    assert error.value.status == 400
+
+def test_identical_messages_share_one_ollama_request(fake_ollama):
+    server = fake_ollama(ttft=0.3, response_tokens=20)
+    chat = service(server)
+
+    async def run():
+        sessions = [(await chat.create_session(Request()))[1]["session_id"] for _ in range(2)]
+        return await asyncio.gather(*[
+            collect(chat.answer(chat.session(session_id), "What is kaiseki?", use_cache=False))
+            for session_id in sessions
+        ])
+
+    first, second = asyncio.run(run())
+    assert first[-1][0] == second[-1][0] == "done"
+    assert first[-1][1]["answer"] == second[-1][1]["answer"]
+    assert server.stats["requests"] == 1
+
+def test_a_failed_request_ends_with_an_error_event(fake_ollama):
+    server = fake_ollama(error_rate=1.0)
+    chat = service(server)
+
+    async def run():
+        session_id = (await chat.create_session(Request()))[1]["session_id"]
+        session = chat.session(session_id)
+        return await collect(chat.answer(session, "Where can I ski in Nagano?", use_cache=False)), session
+
+    events, session = asyncio.run(run())
+    assert [event for event, _ in events] == ["error"]
+    assert events[0][1]["error"].startswith("Error: 500")
+    assert not session.chatbot.conversation_history
+
+def test_evicting_a_session_cancels_its_answer(fake_ollama):
+    server = fake_ollama(ttft=0, token_rate=50, response_tokens=500)
+    chat = service(server, session_ttl=0.2)
+
+    async def run():
+        session_id = (await chat.create_session(Request()))[1]["session_id"]
+        events = []
+        async def read():
+            async for event in chat.answer(chat.session(session_id), "Describe Osaka street food", use_cache=False):
+                events.append(event)
+        task = asyncio.create_task(read())
+        while not events:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.3)
+        await chat.create_session(Request())
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return session_id
+
+    session_id = asyncio.run(run())
+    assert session_id not in chat.sessions
+    assert chat.stats["cancelled"] == 1
+    assert wait_for(lambda: server.stats["cancelled_tokens"])
+
+def test_queued_messages_do_not_hold_threads(fake_ollama):
+    server = fake_ollama(ttft=0, token_rate=50, response_tokens=100)
+    chat = service(server, max_concurrency=1)
+
+    async def run():
+        sessions = [(await chat.create_session(Request()))[1]["session_id"] for _ in range(6)]
+        before = dedicated_threads()
+        tasks = [asyncio.create_task(collect(chat.answer(chat.session(session_id), f"Question {index} about Kyoto",
+                                                         use_cache=False)))
+                 for index, session_id in enumerate(sessions)]
+        while chat.default_chatbot.scheduler.snapshot()["queued"] < 5:
+            await asyncio.sleep(0.05)
+        threads = dedicated_threads() - before
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return threads
+
+    # The running answer's relay and its Ollama connection, not one per message
+    assert asyncio.run(run()) <= 3
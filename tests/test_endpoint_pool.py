@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from endpoint_pool import EndpointPool, HedgedRequest, NoEndpointAvailable, EndpointError
+from resilience import CircuitBreaker
+
+PAYLOAD = {"model": "llama2", "prompt": "Best time to visit Japan?", "stream": True}
+
+def collect(request):
+    return [chunk for chunk in request.chunks()]
+
+def test_circuit_breaker_opens_and_recovers_after_a_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record(False)
+    assert breaker.allows()
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allows()
+
+    time.sleep(0.06)
+    assert breaker.allows()
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one trial at a time
+    assert not breaker.allows()
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_cancelled_requests_give_no_verdict():
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record(None)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_least_loaded_endpoint_is_chosen(fake_ollama):
+    servers = [fake_ollama(), fake_ollama()]
+    pool = EndpointPool([server.url for server in servers])
+    first = pool.acquire("llama2")
+    second = pool.acquire("llama2")
+    assert first is not second
+    pool.release(first)
+    pool.release(second)
+    with pytest.raises(NoEndpointAvailable):
+        pool.acquire("no-such-model")
+
+def test_streams_a_whole_answer(fake_ollama):
+    server = fake_ollama(token_rate=1000, ttft=0, response_tokens=20)
+    pool = EndpointPool([server.url])
+    chunks = collect(HedgedRequest(pool, "llama2", "/api/generate", PAYLOAD))
+    assert chunks[-1]["done"] and chunks[-1]["eval_count"] == 20
+    assert pool.endpoints[0].outstanding == 0
+
+def test_hedges_to_a_second_endpoint_when_the_first_is_slow(fake_ollama):
+    slow = fake_ollama(token_rate=1000, ttft=2.0, response_tokens=10)
+    fast = fake_ollama(token_rate=1000, ttft=0, response_tokens=10)
+    pool = EndpointPool([slow.url, fast.url])
+    slow_endpoint, fast_endpoint = pool.endpoints
+    for _ in range(10):
+        slow_endpoint.latency.observe(0.05, 0.01)
+    # Make the slow endpoint the primary
+    fast_endpoint.outstanding += 1
+    request = HedgedRequest(pool, "llama2", "/api/generate", PAYLOAD, hedge_percentile=95)
+    start = time.perf_counter()
+    chunks = collect(request)
+    fast_endpoint.outstanding -= 1
+
+    assert time.perf_counter() - start < 1.5
+    assert chunks[-1]["done"]
+    assert request.stats["hedged"] and request.stats["hedge_won"]
+    assert request.stats["endpoint"] == fast.url
+
+def test_fails_over_when_an_endpoint_errors(fake_ollama):
+    broken = fake_ollama(error_rate=1.0)
+    healthy = fake_ollama(token_rate=1000, ttft=0, response_tokens=5)
+    pool = EndpointPool([broken.url, healthy.url])
+    pool.endpoints[1].outstanding += 1
+    request = HedgedRequest(pool, "llama2", "/api/generate", PAYLOAD, hedge_percentile=None)
+    chunks = collect(request)
+    pool.endpoints[1].outstanding -= 1
+    assert chunks[-1]["done"]
+    assert request.stats["failed_over"]
+    assert broken.stats["errors"] == 1
+
+def test_raises_once_every_attempt_fails(fake_ollama):
+    broken = fake_ollama(error_rate=1.0)
+    pool = EndpointPool([broken.url], failure_threshold=2)
+    for _ in range(2):
+        with pytest.raises(EndpointError):
+            collect(HedgedRequest(pool, "llama2", "/api/generate", PAYLOAD, hedge_percentile=None))
+    assert pool.endpoints[0].breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(NoEndpointAvailable):
+        pool.acquire("llama2")
@@ -0,0 +1,31 @@
+import pytest
+
+from chatbot_engine import JapanTourismChatbot
+from generation_profiles import GenerationProfiles
+
+@pytest.fixture(scope="module")
+def bot():
+    # Profiles are chosen without contacting Ollama
+    return JapanTourismChatbot("http://127.0.0.1:9", model="llama2")
+
+@pytest.mark.parametrize("question, profile", [
+    ("Plan a 7-day Tokyo itinerary", "planned"),
+    ("Best time to visit Japan?", "medium"),
+    ("How to use JR Pass?", "medium"),
+    ("Traditional Japanese food to try", "medium"),
+    ("Cherry blossom viewing spots", "medium"),
+    ("Cultural etiquette tips", "medium"),
+    ("Budget for 2 weeks in Japan", "long"),
+    ("Day trip from Tokyo", "planned"),
+    ("Do I need cash in Japan?", "short"),
+    ("How do I get from Tokyo to Kyoto?", "short")
+])
+def test_profiles_follow_the_question_type(bot, question, profile):
+    assert bot.profile_for(question).name == profile
+
+def test_a_plan_never_raises_the_answer_cap():
+    profiles = GenerationProfiles.from_file()
+
+    assert profiles.select("Is the JR Pass worth it?", 0, planned=True).name == "short"
+    assert profiles.select("Plan a week in Kyoto", 2.0, planned=True).name == "planned"
+    assert profiles.select("Plan a week in Kyoto", 2.0).name == "long"
@@ -0,0 +1,20 @@
+from conftest import wait_for
+from metrics import RequestMetrics
+
+def test_the_prometheus_file_follows_the_last_request(tmp_path):
+    path = tmp_path / "metrics.prom"
+    metrics = RequestMetrics(str(path), export_interval=0.1)
+
+    metrics.record("llama2", "ok", {"total_time": 1.2, "eval_count": 40})
+    assert wait_for(path.exists)
+    metrics.record("llama2", "ok", {"total_time": 0.8, "eval_count": 30})
+    assert wait_for(lambda: 'outcome="ok"} 2' in path.read_text())
+
+def test_coalesced_answers_do_not_count_tokens_twice():
+    metrics = RequestMetrics()
+
+    metrics.record("llama2", "ok", {"total_time": 1.2, "eval_count": 40})
+    metrics.record("llama2", "coalesced", {"total_time": 1.3, "eval_count": 40})
+    totals = metrics.totals()
+    assert totals["requests"] == {"ok": 1, "coalesced": 1}
+    assert totals["tokens"] == {"eval_count": 40}
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from request_scheduler import RequestScheduler, QueueTimeout
+
+def test_admits_up_to_max_concurrency_then_queues():
+    scheduler = RequestScheduler(max_concurrency=2)
+    tickets = [scheduler.submit(f"s{index}") for index in range(3)]
+    assert [ticket.wait(0) for ticket in tickets] == [True, True, False]
+    assert tickets[2].position == 1
+    tickets[0].release()
+    assert tickets[2].wait(0)
+    assert scheduler.snapshot()["running"] == 2
+
+def test_sessions_take_turns():
+    scheduler = RequestScheduler(max_concurrency=1)
+    running = scheduler.submit("busy")
+    first = [scheduler.submit("a"), scheduler.submit("a"), scheduler.submit("a")]
+    other = scheduler.submit("b")
+    # One request from "a", then "b" gets its turn before a's second
+    assert [ticket.position for ticket in first + [other]] == [1, 3, 4, 2]
+    running.release()
+    first[0].release()
+    assert other.wait(0)
+
+def test_release_is_idempotent_and_drops_queued_tickets():
+    scheduler = RequestScheduler(max_concurrency=1)
+    running = scheduler.submit("a")
+    queued = scheduler.submit("b")
+    queued.release()
+    assert scheduler.snapshot()["queued"] == 0
+    running.release()
+    running.release()
+    assert scheduler.snapshot()["running"] == 0
+    assert scheduler.is_idle()
+
+def test_sheds_requests_older_than_max_queue_age():
+    scheduler = RequestScheduler(max_concurrency=1, max_queue_age=0.05)
+    scheduler.submit("a")
+    queued = scheduler.submit("b")
+    time.sleep(0.1)
+    with pytest.raises(QueueTimeout):
+        queued.wait(0)
+    assert scheduler.snapshot()["shed"] == 1
+
+def test_slot_never_exceeds_concurrency_under_load():
+    scheduler = RequestScheduler(max_concurrency=3)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def worker(index):
+        with scheduler.slot(f"s{index % 5}", poll=0.01):
+            with lock:
+                active.append(index)
+                peak.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.remove(index)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(30)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) <= 3
+    assert scheduler.snapshot()["admitted"] == 30
+    assert scheduler.is_idle()
@@ -0,0 +1,28 @@
+from chatbot_engine import JapanTourismChatbot, QUICK_QUESTIONS
+from response_cache import ResponseCache
+
+def test_near_duplicates_share_an_answer():
+    cache = ResponseCache()
+    cache.store("llama2", "Plan a 10 day itinerary for Japan", "ctx", "Ten days...", 4.0)
+
+    assert cache.lookup("llama2", "Plan a 10 day Japan itinerary please", "ctx")["response"] == "Ten days..."
+
+def test_different_numbers_are_different_questions():
+    cache = ResponseCache()
+    cache.store("llama2", "Plan a 10 day itinerary for Japan", "ctx", "Ten days...", 4.0)
+
+    assert cache.lookup("llama2", "Plan a 12 day itinerary for Japan", "ctx") is None
+    assert cache.lookup("llama2", "Plan a 10-day itinerary for Japan", "ctx") is not None
+
+def test_a_quick_question_mid_conversation_is_not_shared(fake_ollama):
+    server = fake_ollama(ttft=0, token_rate=1000, response_tokens=20)
+    bot = JapanTourismChatbot(server.url, model="llama2", hedge_percentile=None)
+    bot.response_cache = ResponseCache()
+    bot.add_to_history("I'm travelling with my grandmother Keiko", "Lovely, how can I help?")
+    question = QUICK_QUESTIONS[0]
+    bot.generate_response(question, use_cache=False)
+
+    assert bot.response_cache.lookup(bot.model, question, bot.context_fingerprint()) is None
+    bot.reset_conversation()
+    bot.generate_response(question, use_cache=False)
+    assert bot.response_cache.lookup(bot.model, question, bot.context_fingerprint()) is not None
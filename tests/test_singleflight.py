@@ -0,0 +1,46 @@
+import threading
+
+from singleflight import SingleFlight, request_key
+
+def test_request_key_ignores_payload_key_order():
+    assert request_key("/api/chat", {"a": 1, "b": 2}) == request_key("/api/chat", {"b": 2, "a": 1})
+    assert request_key("/api/chat", {"a": 1}) != request_key("/api/generate", {"a": 1})
+
+def test_followers_get_every_token_from_the_start():
+    registry = SingleFlight()
+    flight, leader = registry.join("k")
+    assert leader
+    flight.publish("a ")
+    follower_flight, follower_leader = registry.join("k")
+    assert follower_flight is flight and not follower_leader
+
+    received = []
+    thread = threading.Thread(target=lambda: received.extend(flight.follow()))
+    thread.start()
+    flight.publish("b ")
+    flight.finish({"done": True})
+    thread.join(2)
+    assert received == ["a ", "b "]
+    assert registry.stats == {"flights": 1, "coalesced": 1}
+
+def test_forgotten_flight_starts_a_new_one():
+    registry = SingleFlight()
+    flight, _ = registry.join("k")
+    flight.finish({"done": True})
+    registry.forget("k", flight)
+    assert registry.join("k")[1]
+
+def test_abandon_refuses_while_followed():
+    registry = SingleFlight()
+    flight, _ = registry.join("k")
+    registry.join("k")
+    follower = flight.follow()
+    flight.publish("a ")
+    assert next(follower) == "a "
+    assert not registry.abandon("k", flight)
+
+    follower.close()
+    assert flight.followers == 0
+    assert registry.abandon("k", flight)
+    # Abandoned flights are not offered to new requests
+    assert registry.join("k")[0] is not flight
@@ -0,0 +1,26 @@
+import pytest
+
+from travel_planner import MAX_DAYS, get_travel_planner
+
+@pytest.mark.parametrize("question, days", [
+    ("Plan a 5-day trip to Kyoto and Osaka", 5),
+    ("3-day trip to Hiroshima", 3),
+    ("Plan a 5 day trip to Kyoto and Osaka", 5),
+    ("Plan a 400-day trip in Tokyo", MAX_DAYS)
+])
+def test_a_trip_length_is_not_a_day_trip(question, days):
+    planner = get_travel_planner()
+    request = planner.parse(question)
+
+    assert not request["day_trip"] and request["days"] == days
+    assert planner.plan_text(question).startswith(f"{days}-day itinerary")
+
+@pytest.mark.parametrize("question", ["Day trip from Tokyo", "Take a day trip from Kyoto", "Best day trips from Osaka"])
+def test_day_trip_questions(question):
+    assert get_travel_planner().plan_text(question).startswith("Day trips from")
+
+def test_a_very_long_trip_is_planned_for_max_days():
+    plan = get_travel_planner().plan_text("Tokyo and Kyoto 1000000 days")
+
+    assert plan.startswith(f"{MAX_DAYS}-day itinerary")
+    assert "1,000,000 days" in plan and len(plan) < 5000
@@ -0,0 +1,22 @@
+import re
+
+# Words that carry no topic: dropped from cache vectors and search terms
+STOPWORDS = {
+    "a", "an", "the", "to", "in", "on", "of", "for", "and", "or", "is", "are", "be", "at",
+    "i", "me", "my", "we", "you", "your", "what", "how", "do", "does", "can", "should",
+    "please", "tell", "about", "with", "some", "any", "there", "it", "its", "from", "by"
+}
+
+WORD = re.compile(r"[a-z0-9]+")
+HYPHENATED_WORD = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+def fold_plural(word):
+    """Naive plural folding: temples -> temple, but not pass or bus"""
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def tokenize(text, stopwords=STOPWORDS, hyphenated=False):
+    """Lowercase word tokens without stopwords, with naive plural folding"""
+    pattern = HYPHENATED_WORD if hyphenated else WORD
+    return [fold_plural(word) for word in pattern.findall(text.lower()) if word not in stopwords]
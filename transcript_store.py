@@ -0,0 +1,82 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    stats TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, id);
+"""
+
+class TranscriptStore:
+    """Append-only SQLite store of chat messages, so transcripts live on disk instead of in RAM"""
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        # Streamlit reruns a session's script on different threads
+        self.connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock:
+            # WAL lets readers proceed while a message is being written
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(SCHEMA)
+
+    def append(self, session_id, role, content, stats=None):
+        """Store one message and return it as a display dict"""
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO messages (session_id, role, content, stats, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, role, content, json.dumps(stats) if stats else None, time.time())
+            )
+        return {"id": cursor.lastrowid, "role": role, "content": content, "stats": stats}
+
+    def recent(self, session_id, limit, before_id=None):
+        """The last `limit` messages (before a message ID if given), oldest first"""
+        query = "SELECT id, role, content, stats FROM messages WHERE session_id = ?"
+        params = [session_id]
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return [{
+            "id": row["id"],
+            "role": row["role"],
+            "content": row["content"],
+            "stats": json.loads(row["stats"]) if row["stats"] else None
+        } for row in reversed(rows)]
+
+    def count(self, session_id, before_id=None):
+        """Number of stored messages in a session (before a message ID if given)"""
+        query = "SELECT COUNT(*) FROM messages WHERE session_id = ?"
+        params = [session_id]
+        if before_id is not None:
+            query += " AND id < ?"
+            params.append(before_id)
+        with self.lock:
+            return self.connection.execute(query, params).fetchone()[0]
+
+# One store per database file, shared by every session in the process
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_transcript_store(path):
+    """Return the shared store for a database file"""
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = TranscriptStore(path)
+            _stores[path] = store
+        return store
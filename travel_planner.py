@@ -0,0 +1,405 @@
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import re
+import threading
+from functools import lru_cache
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "travel_graph.json")
+
+# Route criterion -> connection fields compared in order
+CRITERIA = {
+    "fastest": ("minutes", "fare"),
+    "cheapest": ("fare", "minutes"),
+    "pass": ("pass_fare", "minutes")
+}
+
+DURATION = re.compile(r"\b(\d+|a|one|two|three)\s*-?\s*(day|night|week)s?\b", re.IGNORECASE)
+NUMBER_WORDS = {"a": 1, "one": 1, "two": 2, "three": 3}
+# Longer trips are planned for their first MAX_DAYS days, keeping the prompt small
+MAX_DAYS = 30
+PLANNING = re.compile(r"\b(plan|planning|itinerary|trip|worth|pass)\b", re.IGNORECASE)
+ROUTE = re.compile(r"\bfrom\b.+\bto\b|\bget (to|from)\b|\bhow (long|far)\b|\btravel time\b", re.IGNORECASE)
+DAY_TRIP = re.compile(r"\bday[ -]trips?\b", re.IGNORECASE)
+BUDGET_LEVELS = [
+    ("budget", re.compile(r"\b(on a budget|cheap|cheapest|backpack\w*|shoestring)\b", re.IGNORECASE)),
+    ("luxury", re.compile(r"\b(luxury|luxurious|high-end)\b", re.IGNORECASE))
+]
+
+def format_minutes(minutes):
+    """90 -> "1h30m", 45 -> "45 min\""""
+    if minutes < 60:
+        return f"{minutes} min"
+    return f"{minutes // 60}h{minutes % 60:02d}m"
+
+def format_yen(amount):
+    return f"{amount:,} yen"
+
+class TravelGraph:
+    """Cities and intercity connections with every shortest route precomputed at load
+
+    Each connection has a travel time, a ticket fare and a pass_fare: what a
+    JR Pass holder still pays (0 when fully covered, a supplement for Nozomi,
+    the full fare for private railways and buses).
+    """
+    def __init__(self, path=DEFAULT_PATH):
+        with open(path, "rb") as f:
+            raw = f.read()
+        data = json.loads(raw)
+        self.version = hashlib.sha1(raw).hexdigest()[:12]
+        self.cities = data["cities"]
+        self.jr_pass = {int(days): price for days, price in data["jr_pass"].items()}
+        self.daily_budget = data["daily_budget"]
+
+        # Connections run both ways
+        self.adjacency = {city: [] for city in self.cities}
+        for connection in data["connections"]:
+            self.adjacency[connection["from"]].append(connection)
+            self.adjacency[connection["to"]].append(dict(connection, **{"from": connection["to"], "to": connection["from"]}))
+
+        self.routes = {criterion: {city: self.shortest_paths(city, fields) for city in self.cities}
+                       for criterion, fields in CRITERIA.items()}
+
+        # One pattern for every alias, longest first so "mount fuji" beats "fuji"
+        self.aliases = {alias: city for city, info in self.cities.items() for alias in info["aliases"]}
+        alternatives = "|".join(re.escape(alias) for alias in sorted(self.aliases, key=len, reverse=True))
+        self.city_pattern = re.compile(rf"\b({alternatives})\b", re.IGNORECASE)
+
+    def shortest_paths(self, source, fields):
+        """Dijkstra from one city, comparing summed fields in order; returns {city: route}"""
+        best = {source: tuple(0 for _ in fields)}
+        legs = {source: []}
+        heap = [(best[source], source)]
+        while heap:
+            cost, city = heapq.heappop(heap)
+            if cost > best[city]:
+                continue
+            for connection in self.adjacency[city]:
+                candidate = tuple(total + connection[field] for total, field in zip(cost, fields))
+                if connection["to"] not in best or candidate < best[connection["to"]]:
+                    best[connection["to"]] = candidate
+                    legs[connection["to"]] = legs[city] + [connection]
+                    heapq.heappush(heap, (candidate, connection["to"]))
+        return {city: self.summarize(source, city, path) for city, path in legs.items()}
+
+    def summarize(self, source, target, legs):
+        return {
+            "from": source,
+            "to": target,
+            "legs": legs,
+            "mode": " + ".join(leg["mode"] for leg in legs),
+            "minutes": sum(leg["minutes"] for leg in legs),
+            "fare": sum(leg["fare"] for leg in legs),
+            "pass_fare": sum(leg["pass_fare"] for leg in legs)
+        }
+
+    def route(self, source, target, criterion="fastest"):
+        """Precomputed best route between two cities"""
+        return self.routes[criterion][source][target]
+
+    def find_cities(self, text):
+        """City IDs mentioned in a text, in order of first mention"""
+        found = [self.aliases[match.group(1).lower()] for match in self.city_pattern.finditer(text)]
+        return list(dict.fromkeys(found))
+
+    def name(self, city):
+        return self.cities[city]["name"]
+
+class TravelPlanner:
+    """Route, day-trip and itinerary answers computed from the travel graph in milliseconds
+
+    The computed facts go into the prompt, so the model only writes the prose
+    around them instead of laying out routes and quoting fares itself.
+    """
+    def __init__(self, graph, day_trip_minutes=150):
+        self.graph = graph
+        self.day_trip_minutes = day_trip_minutes
+
+    def parse(self, question):
+        """Cities, trip length in days (or None), budget level and whether it asks for day trips"""
+        days = None
+        match = DURATION.search(question)
+        day_trip = DAY_TRIP.search(question)
+        # "5-day trip" is the trip's length; only "a day trip" asks for day trips
+        if day_trip and match and match.start(2) == day_trip.start() and match.group(1).lower() != "a":
+            day_trip = None
+        if match:
+            number = match.group(1).lower()
+            # A run of digits too long to be a trip is not worth converting exactly
+            count = NUMBER_WORDS.get(number) or (int(number) if len(number) <= 6 else 10 ** 6)
+            unit = match.group(2).lower()
+            days = count * 7 if unit == "week" else count + 1 if unit == "night" else count
+        budget = next((level for level, pattern in BUDGET_LEVELS if pattern.search(question)), "mid-range")
+        return {
+            "cities": self.graph.find_cities(question),
+            "days": min(days, MAX_DAYS) if days else None,
+            "requested_days": days,
+            "budget": budget,
+            "day_trip": bool(day_trip)
+        }
+
+    def plan_text(self, question):
+        """Computed facts for a route, day-trip or itinerary question, or None if it is none of these"""
+        request = self.parse(question)
+        cities = tuple(request["cities"])
+        if not cities:
+            return None
+        if request["day_trip"]:
+            kind = "day_trips"
+        elif not request["days"] and len(cities) == 2 and ROUTE.search(question):
+            kind = "routes"
+        elif request["days"] or (len(cities) > 1 and PLANNING.search(question)):
+            kind = "itinerary"
+        else:
+            return None
+        return self.format_plan(kind, cities, request["days"], request["requested_days"], request["budget"])
+
+    @lru_cache(maxsize=256)
+    def format_plan(self, kind, cities, days, requested_days, budget):
+        """Plan text for a parsed request; cached by the request, not the question's wording"""
+        if kind == "day_trips":
+            return self.format_day_trips(cities[0], self.day_trips(cities[0]))
+        if kind == "routes":
+            return self.format_routes(cities[0], cities[1])
+        return self.format_itinerary(self.itinerary(list(cities), days, budget, requested_days))
+
+    def day_trips(self, base, max_minutes=None):
+        """Fastest round trips from a base, nearest first
+
+        Day-trip destinations count within max_minutes each way, other cities
+        only within half of that.
+        """
+        max_minutes = max_minutes or self.day_trip_minutes
+        trips = []
+        for city, info in self.graph.cities.items():
+            route = self.graph.route(base, city)
+            if city != base and route["minutes"] <= (max_minutes if info["day_trip"] else max_minutes / 2):
+                trips.append({
+                    "city": city,
+                    "route": route,
+                    "pass_route": self.graph.route(base, city, "pass")
+                })
+        return sorted(trips, key=lambda trip: trip["route"]["minutes"])
+
+    def order_stops(self, cities):
+        """Order overnight stops after the first to minimize total travel time, returning to the first"""
+        start, rest = cities[0], cities[1:]
+        def travel_time(order):
+            stops = [start, *order, start]
+            return sum(self.graph.route(a, b)["minutes"] for a, b in zip(stops, stops[1:]))
+        return [start, *min(itertools.permutations(rest), key=travel_time)] if rest else [start]
+
+    def itinerary(self, cities, days=None, budget="mid-range", requested_days=None):
+        """Day-by-day plan over the mentioned cities, returning to the first one
+
+        Day-trip cities (Nara, Nikko, Fuji) are visited from the nearest
+        overnight base. Spare days go to each base up to its suggested stay,
+        then to extra day trips from the bases, then to the bases in order.
+        A trip longer than MAX_DAYS is planned for its first MAX_DAYS days.
+        """
+        graph = self.graph
+        bases = [city for city in cities if not graph.cities[city]["day_trip"]] or cities[:1]
+        trips = [city for city in cities if city not in bases]
+        bases = self.order_stops(bases)
+        notes = []
+        requested_days = requested_days or days
+        days = min(days or sum(graph.cities[city]["suggested_days"] for city in cities), MAX_DAYS)
+        if requested_days and requested_days > days:
+            notes.append(f"Only the first {days} of the {requested_days:,} days asked for are planned here.")
+
+        stay = {city: graph.cities[city]["min_days"] for city in bases}
+        trips_from = {city: [] for city in bases}
+        for trip in trips:
+            trips_from[min(bases, key=lambda base: graph.route(base, trip)["minutes"])].append(trip)
+
+        # Shrink to fit a short trip: bases to one day each, then drop day trips
+        while sum(stay.values()) + sum(map(len, trips_from.values())) > days:
+            longest = max(bases, key=lambda city: stay[city])
+            if stay[longest] > 1:
+                stay[longest] -= 1
+                continue
+            dropped = next((base for base in reversed(bases) if trips_from[base]), None)
+            if dropped is None:
+                notes.append(f"{days} {'day is' if days == 1 else 'days are'} too short for {len(bases)} stops, "
+                             f"so this plan is {len(bases)} days long instead.")
+                break
+            notes.append(f"Not enough days for the day trip to {graph.name(trips_from[dropped].pop())}.")
+
+        spare = days - sum(stay.values()) - sum(map(len, trips_from.values()))
+        for city in bases:
+            extra = min(spare, max(0, graph.cities[city]["suggested_days"] - stay[city]))
+            stay[city] += extra
+            spare -= extra
+        planned = set(bases) | set(trips)
+        for base in bases:
+            for trip in self.day_trips(base):
+                if spare and trip["city"] not in planned and graph.cities[trip["city"]]["day_trip"]:
+                    trips_from[base].append(trip["city"])
+                    planned.add(trip["city"])
+                    spare -= 1
+        for index in range(max(spare, 0)):
+            stay[bases[index % len(bases)]] += 1
+
+        # Arrival day, then the base's day trips, then its remaining days
+        schedule = []
+        legs = []
+        for index, base in enumerate(bases):
+            travel = graph.route(bases[index - 1], base) if index else None
+            schedule.append({"city": base, "trip": None, "travel": travel})
+            schedule += [{"city": base, "trip": trip, "travel": graph.route(base, trip)} for trip in trips_from[base]]
+            schedule += [{"city": base, "trip": None, "travel": None} for _ in range(stay[base] - 1)]
+        for day, entry in enumerate(schedule, 1):
+            entry["day"] = day
+            if entry["travel"]:
+                legs.append((day, entry["travel"]["from"], entry["travel"]["to"]))
+                if entry["trip"]:
+                    legs.append((day, entry["trip"], entry["city"]))
+        if len(bases) > 1 and schedule:
+            legs.append((len(schedule), bases[-1], bases[0]))
+
+        ticketing = self.best_ticketing(legs, len(schedule))
+        daily = graph.daily_budget[budget]
+        return {
+            "bases": bases,
+            "days": len(schedule),
+            "schedule": schedule,
+            "return": graph.route(bases[-1], bases[0]) if len(bases) > 1 else None,
+            "ticketing": ticketing,
+            "budget": budget,
+            "daily_budget": daily,
+            "total": daily * len(schedule) + ticketing["best_cost"],
+            "notes": notes
+        }
+
+    def best_ticketing(self, legs, days):
+        """Cheapest of individual tickets and each JR Pass over each window of consecutive days
+
+        legs is a list of (day, from, to). Inside a pass window each leg takes
+        the route that costs a pass holder least; outside it, the fastest
+        route's ticket is bought.
+        """
+        graph = self.graph
+        tickets = sum(graph.route(a, b)["fare"] for _, a, b in legs)
+        best = {"tickets": tickets, "best_cost": tickets, "pass_days": None, "start_day": None, "covered": {}}
+        for pass_days, price in sorted(graph.jr_pass.items()):
+            # Ticket value the pass replaces in its best window; it pays off once that exceeds the price
+            best["covered"][pass_days] = 0
+            for start in range(1, max(1, days - pass_days + 1) + 1):
+                inside = [(a, b) for day, a, b in legs if start <= day < start + pass_days]
+                if not inside:
+                    continue
+                extra = sum(graph.route(a, b, "pass")["pass_fare"] for a, b in inside)
+                outside = sum(graph.route(a, b)["fare"] for day, a, b in legs if not start <= day < start + pass_days)
+                best["covered"][pass_days] = max(best["covered"][pass_days], tickets - outside - extra)
+                if price + extra + outside < best["best_cost"]:
+                    best.update(best_cost=price + extra + outside, pass_days=pass_days, start_day=start)
+        best["savings"] = tickets - best["best_cost"]
+        return best
+
+    def describe_route(self, route):
+        return f"{route['mode']}, {format_minutes(route['minutes'])}, {format_yen(route['fare'])}"
+
+    def format_routes(self, source, target):
+        """Fastest, cheapest and JR Pass options between two cities"""
+        graph = self.graph
+        lines = [f"Routes from {graph.name(source)} to {graph.name(target)}:"]
+        seen = set()
+        for label, criterion in (("Fastest", "fastest"), ("Cheapest", "cheapest"), ("With a JR Pass", "pass")):
+            route = graph.route(source, target, criterion)
+            if route["mode"] in seen:
+                continue
+            seen.add(route["mode"])
+            line = f"- {label}: {self.describe_route(route)}"
+            if criterion == "pass":
+                line += f" (pass holders pay {format_yen(route['pass_fare'])})"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def format_day_trips(self, base, trips):
+        """Day-trip options from a base with times and round-trip fares"""
+        graph = self.graph
+        if not trips:
+            return None
+        lines = [f"Day trips from {graph.name(base)} (each way; round trip is double):"]
+        for trip in trips:
+            route, pass_route = trip["route"], trip["pass_route"]
+            line = (f"- {graph.name(trip['city'])}: {self.describe_route(route)} "
+                    f"(round trip {format_yen(2 * route['fare'])}")
+            if pass_route["pass_fare"] < route["fare"]:
+                line += f"; with a JR Pass {format_yen(2 * pass_route['pass_fare'])} via {pass_route['mode']}"
+            lines.append(line + f") - {', '.join(graph.cities[trip['city']]['highlights'])}")
+        return "\n".join(lines)
+
+    def format_itinerary(self, plan):
+        """Day-by-day plan, ticketing and budget as prompt facts"""
+        graph = self.graph
+        route = " -> ".join(graph.name(city) for city in plan["bases"])
+        if plan["return"]:
+            route += f", returning to {graph.name(plan['bases'][0])}"
+        lines = [f"{plan['days']}-day itinerary: {route}"]
+        # Changes to the requested length come first, so they are not missed
+        lines.extend(plan["notes"])
+        described = set()
+        schedule = plan["schedule"]
+        index = 0
+        while index < len(schedule):
+            entry = schedule[index]
+            index += 1
+            city = entry["city"]
+            if not entry["trip"] and not entry["travel"] and city in described:
+                # A run of free days in one city is one line
+                last = entry
+                while (index < len(schedule) and schedule[index]["city"] == city
+                       and not schedule[index]["trip"] and not schedule[index]["travel"]):
+                    last = schedule[index]
+                    index += 1
+                days = f"Days {entry['day']}-{last['day']}" if last is not entry else f"Day {entry['day']}"
+                lines.append(f"{days}: {graph.name(city)} - free to explore")
+                continue
+            line = f"Day {entry['day']}: {graph.name(entry['city'])}"
+            if entry["trip"]:
+                line += f" - day trip to {graph.name(entry['trip'])} ({self.describe_route(entry['travel'])} each way)"
+                city = entry["trip"]
+            elif entry["travel"]:
+                line += f" - travel from {graph.name(entry['travel']['from'])} ({self.describe_route(entry['travel'])})"
+            # Highlights once per city, on its first day
+            if city not in described:
+                described.add(city)
+                line += f"; highlights: {', '.join(graph.cities[city]['highlights'])}"
+            lines.append(line)
+        if plan["return"]:
+            lines.append(f"Last day: return to {graph.name(plan['bases'][0])} ({self.describe_route(plan['return'])})")
+
+        ticketing = plan["ticketing"]
+        if ticketing["tickets"]:
+            lines.append(f"Intercity tickets bought individually: {format_yen(ticketing['tickets'])}")
+            if ticketing["pass_days"]:
+                lines.append(
+                    f"Best option: {ticketing['pass_days']}-day JR Pass ({format_yen(graph.jr_pass[ticketing['pass_days']])}) "
+                    f"activated on day {ticketing['start_day']}, plus {format_yen(ticketing['best_cost'] - graph.jr_pass[ticketing['pass_days']])} "
+                    f"in supplements and tickets outside it - saves {format_yen(ticketing['savings'])}"
+                )
+            else:
+                pass_days, price = min(graph.jr_pass.items())
+                lines.append(
+                    f"Best option: individual tickets - a {pass_days}-day JR Pass ({format_yen(price)}) would replace "
+                    f"at most {format_yen(ticketing['covered'][pass_days])} of these tickets, so it does not pay off"
+                )
+        lines.append(
+            f"Estimated cost per person: {format_yen(plan['total'])} "
+            f"({plan['budget']} {format_yen(plan['daily_budget'])}/day for {plan['days']} days plus intercity transport, excluding flights)"
+        )
+        return "\n".join(lines)
+
+_planner = None
+_planner_lock = threading.Lock()
+
+def get_travel_planner():
+    """Return the process-wide travel planner"""
+    global _planner
+    with _planner_lock:
+        if _planner is None:
+            _planner = TravelPlanner(TravelGraph())
+        return _planner